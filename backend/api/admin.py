@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Note, OCRResult, NoteSummary
+from .models import Note, OCRResult, OCRPage, NoteSummary, Job, CacheEntry, NotionPageSync
 
 
 @admin.register(Note)
@@ -11,13 +11,21 @@ class NoteAdmin(admin.ModelAdmin):
     ordering = ['-uploaded_at']
 
 
+class OCRPageInline(admin.TabularInline):
+    model = OCRPage
+    fields = ['page_number', 'source', 'dpi', 'confidence', 'text']
+    readonly_fields = ['page_number', 'source', 'dpi', 'confidence', 'text']
+    extra = 0
+
+
 @admin.register(OCRResult)
 class OCRResultAdmin(admin.ModelAdmin):
     list_display = ['note', 'processed_at', 'get_note_user']
     list_filter = ['processed_at', 'note__user']
     search_fields = ['note__name', 'note__user__username', 'extracted_text']
-    readonly_fields = ['processed_at']
+    readonly_fields = ['processed_at', 'stats']
     ordering = ['-processed_at']
+    inlines = [OCRPageInline]
     
     def get_note_user(self, obj):
         return obj.note.user.username
@@ -37,3 +45,30 @@ class NoteSummaryAdmin(admin.ModelAdmin):
         return obj.note.user.username
     get_note_user.short_description = 'User'
     get_note_user.admin_order_field = 'note__user__username'
+
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'note', 'attempts', 'lease_owner', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['note__name', 'user__username', 'lease_owner', 'error']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'updated_at']
+    ordering = ['-created_at']
+
+
+@admin.register(NotionPageSync)
+class NotionPageSyncAdmin(admin.ModelAdmin):
+    list_display = ['note', 'page_id', 'workspace_id', 'synced_at']
+    search_fields = ['note__name', 'note__user__username', 'page_id']
+    readonly_fields = ['synced_at', 'blocks']
+    ordering = ['-synced_at']
+
+
+@admin.register(CacheEntry)
+class CacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['namespace', 'key', 'size_bytes', 'hits', 'created_at', 'last_used_at']
+    list_filter = ['namespace']
+    search_fields = ['key']
+    readonly_fields = ['created_at', 'last_used_at', 'hits', 'size_bytes']
+    ordering = ['-last_used_at']
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+    
+    def ready(self):
+        # Models load lazily; inference processes may opt in to loading them at start-up
+        if settings.MODEL_WARMUP_ON_READY:
+            from .model_utils import start_background_warmup
+            start_background_warmup(
+                ocr='ocr' in settings.MODEL_WARMUP_ON_READY,
+                llm='llm' in settings.MODEL_WARMUP_ON_READY
+            )
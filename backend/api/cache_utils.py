@@ -0,0 +1,166 @@
+"""
+Content-addressed cache utility functions.
+
+Entries are keyed by a SHA-256 of the input content together with whatever
+settings influence the output, so identical inputs reuse the stored result
+no matter which user they came from. Each namespace is evicted by total size
+(least recently used first) and by age.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.db import IntegrityError
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import CacheEntry
+
+
+def make_cache_key(*parts):
+    """
+    Build a cache key from an ordered list of parts.
+
+    Args:
+        *parts: Strings, bytes, or JSON-serializable values
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif isinstance(part, str):
+            data = part.encode('utf-8')
+        else:
+            data = json.dumps(part, sort_keys=True, default=str).encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    Hash a file's content without loading it into memory at once.
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: Hex SHA-256 digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_get(namespace, key):
+    """
+    Look up a cache entry and mark it as recently used.
+
+    Args:
+        namespace (str): Cache namespace
+        key (str): Cache key from make_cache_key
+
+    Returns:
+        CacheEntry or None: The entry, or None on a miss
+    """
+    entry = CacheEntry.objects.filter(namespace=namespace, key=key).first()
+    if entry is not None:
+        CacheEntry.objects.filter(id=entry.id).update(
+            hits=F('hits') + 1,
+            last_used_at=timezone.now()
+        )
+    return entry
+
+
+def cache_set(namespace, key, value, meta=None, max_bytes=None, max_age_seconds=None):
+    """
+    Store a value in the cache, then evict the namespace down to its limits.
+
+    Args:
+        namespace (str): Cache namespace
+        key (str): Cache key from make_cache_key
+        value (str): Cached text
+        meta (dict, optional): JSON-serializable data stored alongside
+        max_bytes (int, optional): Size limit of the namespace
+        max_age_seconds (int, optional): Entries unused for longer are dropped
+
+    Returns:
+        CacheEntry or None: The stored entry, or None if a concurrent writer won
+    """
+    meta = meta or {}
+    size_bytes = len(value.encode('utf-8')) + len(json.dumps(meta, default=str))
+
+    try:
+        entry, _ = CacheEntry.objects.update_or_create(
+            namespace=namespace,
+            key=key,
+            defaults={
+                'value': value,
+                'meta': meta,
+                'size_bytes': size_bytes,
+                'last_used_at': timezone.now(),
+            }
+        )
+    except IntegrityError:
+        # Another process stored the same key first; its value is equivalent
+        entry = None
+
+    evict_cache(namespace, max_bytes=max_bytes, max_age_seconds=max_age_seconds)
+    return entry
+
+
+def evict_cache(namespace, max_bytes=None, max_age_seconds=None):
+    """
+    Evict entries of a namespace by age and by total size.
+
+    Args:
+        namespace (str): Cache namespace
+        max_bytes (int, optional): Keep the namespace at or below this size
+        max_age_seconds (int, optional): Drop entries unused for longer than this
+
+    Returns:
+        int: Number of entries deleted
+    """
+    entries = CacheEntry.objects.filter(namespace=namespace)
+    deleted = 0
+
+    if max_age_seconds:
+        cutoff = timezone.now() - timedelta(seconds=max_age_seconds)
+        deleted += entries.filter(last_used_at__lt=cutoff).delete()[0]
+
+    if max_bytes:
+        total = entries.aggregate(total=Sum('size_bytes'))['total'] or 0
+        if total > max_bytes:
+            to_free = total - max_bytes
+            stale_ids = []
+            for entry_id, size_bytes in entries.order_by('last_used_at').values_list('id', 'size_bytes'):
+                stale_ids.append(entry_id)
+                to_free -= size_bytes
+                if to_free <= 0:
+                    break
+            # Delete in batches to stay under database parameter limits
+            for start in range(0, len(stale_ids), 500):
+                deleted += CacheEntry.objects.filter(id__in=stale_ids[start:start + 500]).delete()[0]
+
+    return deleted
+
+
+def cache_delete(namespace, key):
+    """
+    Drop a cache entry, if it exists.
+
+    Args:
+        namespace (str): Cache namespace
+        key (str): Cache key from make_cache_key
+
+    Returns:
+        bool: Whether an entry was deleted
+    """
+    return CacheEntry.objects.filter(namespace=namespace, key=key).delete()[0] > 0
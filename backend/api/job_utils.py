@@ -0,0 +1,372 @@
+"""
+Background job queue utility functions.
+
+Jobs live in the database so any number of `run_worker` processes, on any
+number of machines sharing the database, can drain the same queue. A worker
+claims a job by atomically moving it to `running` under a lease; if the worker
+dies the lease expires and another worker picks the job up again.
+
+Jobs enqueued with a concurrency key, such as the Notion exports of one
+workspace, are not claimed while as many jobs with the same key are running
+as their concurrency limit allows.
+"""
+
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+def get_worker_id():
+    """
+    Build an identifier for the current worker process.
+
+    Returns:
+        str: Identifier made of host name and process id
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_job(kind, note=None, user=None, payload=None, concurrency_key='', concurrency_limit=0):
+    """
+    Add a job to the queue.
+
+    Args:
+        kind (str): One of the Job.KIND_* values
+        note: Note model instance the job operates on (optional)
+        user: User the job belongs to (optional, defaults to the note owner)
+        payload (dict, optional): Extra arguments for the job handler
+        concurrency_key (str, optional): Resource shared with other jobs
+        concurrency_limit (int, optional): Jobs with the same key that may
+                                           run at once (0 for no limit)
+
+    Returns:
+        Job: The queued job
+    """
+    if user is None and note is not None:
+        user = note.user
+
+    return Job.objects.create(
+        kind=kind,
+        note=note,
+        user=user,
+        payload=payload or {},
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        concurrency_key=concurrency_key if concurrency_limit else '',
+        concurrency_limit=concurrency_limit if concurrency_key else 0,
+    )
+
+
+def get_active_job(note, kind):
+    """
+    Get the queued or running job of a given kind for a note, if any.
+
+    Args:
+        note: Note model instance
+        kind (str): One of the Job.KIND_* values
+
+    Returns:
+        Job or None: The oldest unfinished job
+    """
+    return Job.objects.filter(
+        note=note,
+        kind=kind,
+        status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING]
+    ).order_by('created_at').first()
+
+
+def _claimable_filter(now):
+    """Jobs that are ready to run, or running under a lease that has expired."""
+    return (
+        Q(status=Job.STATUS_QUEUED, available_at__lte=now) |
+        Q(status=Job.STATUS_RUNNING, lease_expires_at__lt=now, attempts__lt=F('max_attempts'))
+    )
+
+
+def _live_filter(now):
+    """Jobs running under a lease that has not expired."""
+    return Q(status=Job.STATUS_RUNNING, lease_expires_at__gte=now)
+
+
+def _saturated_keys(now):
+    """Concurrency keys whose running jobs have reached their limit."""
+    running = (
+        Job.objects.filter(_live_filter(now))
+        .exclude(concurrency_key='')
+        .values('concurrency_key', 'concurrency_limit')
+        .annotate(running=Count('id'))
+    )
+    return {row['concurrency_key'] for row in running if row['running'] >= row['concurrency_limit']}
+
+
+def _release_job(job_id, worker_id):
+    """Undo a claim that took a concurrency key over its limit."""
+    Job.objects.filter(id=job_id, status=Job.STATUS_RUNNING, lease_owner=worker_id).update(
+        status=Job.STATUS_QUEUED,
+        lease_owner='',
+        lease_expires_at=None,
+        attempts=F('attempts') - 1,
+        started_at=None,
+    )
+
+
+def _within_limit(job, now):
+    """Whether a claimed job is among the first `concurrency_limit` live jobs of its key."""
+    first = (
+        Job.objects.filter(_live_filter(now), concurrency_key=job.concurrency_key)
+        .order_by('started_at', 'id')
+        .values_list('id', flat=True)[:job.concurrency_limit]
+    )
+    return job.id in first
+
+
+def claim_job(worker_id, kinds=None, lease_seconds=None):
+    """
+    Claim the oldest available job under a lease.
+
+    The claim is a conditional UPDATE, so when several workers race for the
+    same row exactly one of them wins and the others move on to the next
+    candidate. Jobs whose concurrency key is at its limit are skipped; if
+    workers racing for the same key take it over the limit, the claims past
+    the limit are released again.
+
+    Args:
+        worker_id (str): Identifier of the claiming worker
+        kinds (list, optional): Only claim jobs of these kinds
+        lease_seconds (int, optional): Lease duration, defaults to JOB_LEASE_SECONDS
+
+    Returns:
+        Job or None: The claimed job, or None if the queue is empty
+    """
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    now = timezone.now()
+
+    candidates = Job.objects.filter(_claimable_filter(now))
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+    saturated = _saturated_keys(now)
+    if saturated:
+        candidates = candidates.exclude(concurrency_key__in=saturated)
+
+    for job_id in candidates.order_by('created_at').values_list('id', flat=True)[:20]:
+        claimed = Job.objects.filter(_claimable_filter(now), id=job_id).update(
+            status=Job.STATUS_RUNNING,
+            lease_owner=worker_id,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+            started_at=now,
+            updated_at=now,
+        )
+        if claimed:
+            job = Job.objects.get(id=job_id)
+            if job.concurrency_limit and not _within_limit(job, now):
+                _release_job(job_id, worker_id)
+                continue
+            return job
+
+    return None
+
+
+def extend_lease(job, worker_id, lease_seconds=None):
+    """
+    Extend the lease of a running job (heartbeat).
+
+    Args:
+        job: Job model instance
+        worker_id (str): Identifier of the worker holding the lease
+        lease_seconds (int, optional): New lease duration from now
+
+    Returns:
+        bool: False if the lease was lost to another worker
+    """
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    now = timezone.now()
+    return bool(Job.objects.filter(
+        id=job.id,
+        status=Job.STATUS_RUNNING,
+        lease_owner=worker_id
+    ).update(lease_expires_at=now + timedelta(seconds=lease_seconds), updated_at=now))
+
+
+def complete_job(job, worker_id, result=None):
+    """
+    Mark a job as done.
+
+    Args:
+        job: Job model instance
+        worker_id (str): Identifier of the worker holding the lease
+        result (dict, optional): Handler output to store on the job
+
+    Returns:
+        bool: False if the lease had already been lost
+    """
+    now = timezone.now()
+    return bool(Job.objects.filter(
+        id=job.id,
+        status=Job.STATUS_RUNNING,
+        lease_owner=worker_id
+    ).update(
+        status=Job.STATUS_DONE,
+        result=result or {},
+        error='',
+        lease_expires_at=None,
+        finished_at=now,
+        updated_at=now,
+    ))
+
+
+def fail_job(job, worker_id, error):
+    """
+    Record a failed attempt, re-queueing the job with backoff if attempts remain.
+
+    Args:
+        job: Job model instance (with `attempts` as claimed)
+        worker_id (str): Identifier of the worker holding the lease
+        error (str): Error description
+
+    Returns:
+        bool: False if the lease had already been lost
+    """
+    now = timezone.now()
+    update = {
+        'error': error,
+        'lease_expires_at': None,
+        'updated_at': now,
+    }
+
+    if job.attempts < job.max_attempts:
+        update['status'] = Job.STATUS_QUEUED
+        update['available_at'] = now + timedelta(
+            seconds=settings.JOB_RETRY_BACKOFF_SECONDS * job.attempts
+        )
+    else:
+        update['status'] = Job.STATUS_FAILED
+        update['finished_at'] = now
+
+    return bool(Job.objects.filter(
+        id=job.id,
+        status=Job.STATUS_RUNNING,
+        lease_owner=worker_id
+    ).update(**update))
+
+
+def fail_abandoned_jobs():
+    """
+    Fail running jobs whose lease expired after their last allowed attempt.
+
+    Returns:
+        int: Number of jobs marked as failed
+    """
+    now = timezone.now()
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        lease_expires_at__lt=now,
+        attempts__gte=F('max_attempts')
+    ).update(
+        status=Job.STATUS_FAILED,
+        error='Lease expired after the last attempt',
+        lease_expires_at=None,
+        finished_at=now,
+        updated_at=now,
+    )
+
+
+def handle_ocr_job(job):
+    """Run OCR for the job's note."""
+    from .ocr_utils import process_note_ocr
+    ocr_result = process_note_ocr(job.note, force=job.payload.get('force', False), raise_errors=True)
+    return {'ocr_result_id': ocr_result.id, 'stats': ocr_result.stats}
+
+
+def handle_ocr_page_job(job):
+    """Run OCR again for one page of the job's note."""
+    from .ocr_utils import reocr_page
+    page = reocr_page(job.note, job.payload['page_number'])
+    return {'ocr_page_id': page.id, 'page_number': page.page_number}
+
+
+def handle_summary_job(job):
+    """Generate the summary for the job's note."""
+    from .summary_utils import process_note_summary
+    summary = process_note_summary(
+        job.note,
+        force=job.payload.get('force', False),
+        tier=job.payload.get('tier'),
+        engine=job.payload.get('engine'),
+        raise_errors=True
+    )
+    return {'summary_id': summary.id}
+
+
+def handle_notion_export_job(job):
+    """Export the job's note to its owner's Notion workspace."""
+    from .notion_utils import export_note_summary
+    return export_note_summary(
+        job.note,
+        parent_id=job.payload.get('parent_id'),
+        new_page=job.payload.get('new_page', False)
+    )
+
+
+def ocr_job_fallback(job, error):
+    """Give a note whose OCR failed for good an error placeholder result."""
+    from .ocr_utils import save_ocr_fallback
+    save_ocr_fallback(job.note, error)
+
+
+def summary_job_fallback(job, error):
+    """Give a note whose summary failed for good an error placeholder summary."""
+    from .summary_utils import save_summary_fallback
+    save_summary_fallback(job.note, error)
+
+
+JOB_HANDLERS = {
+    Job.KIND_OCR: handle_ocr_job,
+    Job.KIND_OCR_PAGE: handle_ocr_page_job,
+    Job.KIND_SUMMARY: handle_summary_job,
+    Job.KIND_NOTION_EXPORT: handle_notion_export_job,
+}
+
+# Run once a job has failed its last attempt
+JOB_FALLBACKS = {
+    Job.KIND_OCR: ocr_job_fallback,
+    Job.KIND_SUMMARY: summary_job_fallback,
+}
+
+
+def run_job(job, worker_id):
+    """
+    Execute a claimed job and record the outcome.
+
+    Args:
+        job: Job model instance claimed by this worker
+        worker_id (str): Identifier of the worker holding the lease
+
+    Returns:
+        bool: True if the job completed successfully
+    """
+    handler = JOB_HANDLERS.get(job.kind)
+    if handler is None:
+        fail_job(job, worker_id, f"Unknown job kind: {job.kind}")
+        return False
+
+    try:
+        result = handler(job)
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+        if fail_job(job, worker_id, f"{str(e)}\n{traceback.format_exc()}") and job.attempts >= job.max_attempts:
+            fallback = JOB_FALLBACKS.get(job.kind)
+            if fallback is not None:
+                try:
+                    fallback(job, e)
+                except Exception as fallback_error:
+                    print(f"Job {job.id} ({job.kind}) fallback failed: {str(fallback_error)}")
+        return False
+
+    return complete_job(job, worker_id, result)
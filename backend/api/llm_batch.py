@@ -0,0 +1,394 @@
+"""
+Batched multi-sequence decoding.
+
+A BatchEngine decodes several generations together: every decode step
+evaluates the next token of each running sequence, plus pending prompt tokens
+of newly admitted ones, in a single llama_decode call. Token generation on CPU
+is bound by memory bandwidth, so reading the weights once per step for the
+whole batch instead of once per sequence raises aggregate throughput. New
+requests are admitted as soon as a sequence slot and enough KV cache are free
+(continuous batching), without waiting for the running batch to finish.
+
+The engine runs on its own llama.cpp context (n_seq_max = number of slots)
+created from the model of a Llama object, which also supplies the tokenizer.
+Sampling (repeat penalty, top-k, top-p, min-p, temperature) is done here in
+NumPy, in the order llama-cpp-python applies them, so batched and single
+generations draw from the same distribution. This module must not import
+Django models or settings.
+"""
+
+import codecs
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+# Marks the end of a sequence's token queue
+_END = object()
+
+# Llama.__call__ defaults, used when a request does not set them
+DEFAULT_MAX_TOKENS = 16
+DEFAULT_TEMPERATURE = 0.8
+DEFAULT_TOP_K = 40
+DEFAULT_TOP_P = 0.95
+DEFAULT_MIN_P = 0.05
+DEFAULT_REPEAT_PENALTY = 1.0
+# Llama's last_n_tokens_size: tokens the repeat penalty looks back on
+REPEAT_LAST_N = 64
+
+
+def sample_token(logits, temperature, top_k, top_p, rng, min_p=0.0, repeat_penalty=1.0, recent=()):
+    """
+    Pick the next token from a row of logits.
+
+    The samplers run in llama-cpp-python's order: repeat penalty, top-k,
+    top-p and min-p on the unscaled probabilities, then temperature.
+
+    Args:
+        logits (numpy.ndarray): Logits over the vocabulary
+        temperature (float): Softmax temperature; 0 or less picks the argmax
+        top_k (int): Keep only the k most likely tokens (0 = all)
+        top_p (float): Keep the smallest set of tokens with this total probability
+        rng (numpy.random.Generator): Random source
+        min_p (float): Drop tokens below this fraction of the top probability
+        repeat_penalty (float): Penalty of the tokens in `recent` (1.0 = none)
+        recent (list): Last REPEAT_LAST_N tokens of the sequence
+
+    Returns:
+        int: Token id
+    """
+    if repeat_penalty != 1.0 and len(recent):
+        ids = np.unique(np.asarray(recent))
+        values = logits[ids]
+        logits = logits.copy()
+        logits[ids] = np.where(values > 0, values / repeat_penalty, values * repeat_penalty)
+
+    if temperature <= 0:
+        return int(np.argmax(logits))
+
+    if 0 < top_k < len(logits):
+        candidates = np.argpartition(logits, -top_k)[-top_k:]
+    else:
+        candidates = np.arange(len(logits))
+
+    values = logits[candidates]
+    order = np.argsort(-values)
+    candidates, values = candidates[order], values[order]
+    probs = np.exp(values - values[0])
+    probs /= probs.sum()
+
+    keep = len(candidates)
+    if top_p < 1.0:
+        keep = min(keep, int(np.searchsorted(np.cumsum(probs), top_p)) + 1)
+    if min_p > 0:
+        # Probabilities are sorted, so the tokens that pass form a prefix
+        keep = min(keep, max(1, int(np.count_nonzero(probs >= min_p * probs[0]))))
+
+    candidates = candidates[:keep]
+    probs = np.exp((values[:keep] - values[0]) / temperature)
+    return int(rng.choice(candidates, p=probs / probs.sum()))
+
+
+class _Sequence:
+    """One generation inside the batch."""
+
+    def __init__(self, tokens, kwargs):
+        self.prompt_tokens = len(tokens)
+        # Tokens to evaluate in the next steps: the prompt, then each sampled token
+        self.pending = list(tokens)
+        self.pos = 0
+        self.seq_id = None
+        self.max_tokens = kwargs.get('max_tokens') or DEFAULT_MAX_TOKENS
+        self.temperature = kwargs.get('temperature', DEFAULT_TEMPERATURE)
+        self.top_k = kwargs.get('top_k', DEFAULT_TOP_K)
+        self.top_p = kwargs.get('top_p', DEFAULT_TOP_P)
+        self.min_p = kwargs.get('min_p', DEFAULT_MIN_P)
+        self.repeat_penalty = kwargs.get('repeat_penalty', DEFAULT_REPEAT_PENALTY)
+        # Tokens the repeat penalty applies to, prompt included
+        self.recent = list(tokens[-REPEAT_LAST_N:])
+        # Prompt and generated tokens, the context each new token is detokenized in
+        self.tokens = list(tokens)
+        stop = kwargs.get('stop') or []
+        self.stop = [stop] if isinstance(stop, str) else list(stop)
+        self.generated = 0
+        # Holds back the bytes of a character split across tokens
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self.text = ''
+        self.sent = 0
+        self.submitted_at = time.monotonic()
+        self.admitted_at = None
+        self.out = queue.Queue()
+        self.cancelled = threading.Event()
+
+    @property
+    def reserved(self):
+        """KV cache cells this sequence may use."""
+        return self.prompt_tokens + self.max_tokens
+
+    def add_piece(self, piece):
+        """
+        Append the bytes of a sampled token and queue the text that is final.
+
+        Bytes of a character that continues in the next token, and text
+        that could still turn into a stop string, are held back.
+
+        Returns:
+            bool: True if a stop string was generated
+        """
+        text = self.decoder.decode(piece)
+        if not text:
+            return False
+        self.text += text
+
+        for stop in self.stop:
+            index = self.text.find(stop, self.sent)
+            if index != -1:
+                # The stop string and anything after it are never sent
+                self.text = self.text[:index]
+                self.flush()
+                return True
+
+        hold = max((len(stop) - 1 for stop in self.stop), default=0)
+        self.flush(len(self.text) - hold)
+        return False
+
+    def flush(self, end=None):
+        """Queue the text up to `end` (default: all of it) that was not sent yet."""
+        end = len(self.text) if end is None else end
+        if end > self.sent:
+            self.out.put(self.text[self.sent:end])
+            self.sent = end
+
+
+class BatchEngine:
+    """
+    Decodes up to `n_seq` generations together on one llama.cpp context.
+
+    Thread-safe: any number of threads may call generate() at once, which is
+    how LLMScheduler workers share one engine.
+
+    Args:
+        llm (Llama): Loaded model; only its weights and tokenizer are used
+        n_seq (int): Sequence slots decoded together
+        n_ctx (int): KV cache cells shared by all slots; a request is admitted
+                     only when its prompt plus max_tokens fit in what is left
+        n_batch (int): Maximum tokens evaluated per decode step
+        n_threads (int, optional): CPU threads for decoding
+    """
+
+    def __init__(self, llm, n_seq, n_ctx, n_batch=512, n_threads=None):
+        import llama_cpp
+
+        self._llama_cpp = llama_cpp
+        self.llm = llm
+        self.n_seq = max(1, n_seq)
+        self.n_ctx = n_ctx
+        self.n_batch = n_batch
+
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = n_ctx
+        params.n_batch = n_batch
+        params.n_ubatch = n_batch
+        params.n_seq_max = self.n_seq
+        if n_threads:
+            params.n_threads = params.n_threads_batch = n_threads
+        init_context = getattr(llama_cpp, 'llama_init_from_model', None) or llama_cpp.llama_new_context_with_model
+        self._ctx = init_context(llm.model, params)
+        if not self._ctx:
+            raise RuntimeError("Failed to create the batch decoding context")
+        self._seq_rm = getattr(llama_cpp, 'llama_kv_self_seq_rm', None) or llama_cpp.llama_kv_cache_seq_rm
+        self._batch = llama_cpp.llama_batch_init(n_batch, 0, 1)
+        self._n_vocab = llm.n_vocab()
+        self._eos = llm.token_eos()
+        self._rng = np.random.default_rng()
+
+        self._incoming = queue.Queue()
+        self._waiting = []
+        self._active = []
+        self._free = list(range(self.n_seq))
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._counts = {'steps': 0, 'tokens': 0, 'sequences': 0}
+
+    def generate(self, prompt, prefix, kwargs, info):
+        """
+        Stream one completion decoded in the shared batch.
+
+        Args:
+            prompt (str): Prompt to complete
+            prefix (str or None): Ignored; sequences share no KV cache, so
+                                  LLM_PREFIX_CACHE has no effect in batch mode
+            kwargs (dict): max_tokens, stop, temperature, top_k, top_p,
+                           min_p, repeat_penalty
+            info (dict): Filled with 'wait_seconds', the time spent waiting
+                         for a sequence slot
+
+        Yields:
+            str: Generated text, in pieces as tokens complete
+        """
+        tokens = self.llm.tokenize(prompt.encode('utf-8'))
+        seq = _Sequence(tokens, kwargs)
+        if seq.reserved > self.n_ctx:
+            raise ValueError(f"Prompt of {seq.prompt_tokens} tokens plus max_tokens does not fit in the batch context ({self.n_ctx})")
+
+        self._start()
+        self._incoming.put(seq)
+        try:
+            while True:
+                item = seq.out.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            seq.cancelled.set()
+            if seq.admitted_at is not None:
+                info['wait_seconds'] = seq.admitted_at - seq.submitted_at
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='llm-batch', daemon=True)
+                self._thread.start()
+
+    def _admit(self):
+        """Move waiting requests into free slots, oldest first, while the KV cache has room."""
+        block = not self._active and not self._waiting
+        while True:
+            try:
+                seq = self._incoming.get(block=block)
+            except queue.Empty:
+                break
+            if seq is None:
+                self._closed = True
+                return
+            self._waiting.append(seq)
+            block = False
+
+        while self._waiting and self._free:
+            seq = self._waiting[0]
+            if seq.cancelled.is_set():
+                self._waiting.pop(0)
+                seq.out.put(_END)
+                continue
+            if self._reserved + seq.reserved > self.n_ctx:
+                break
+            self._waiting.pop(0)
+            seq.seq_id = self._free.pop(0)
+            seq.admitted_at = time.monotonic()
+            self._reserved += seq.reserved
+            self._active.append(seq)
+
+    def _finish(self, seq, error=None):
+        """Release a sequence's slot and KV cache and end its token stream."""
+        self._active.remove(seq)
+        self._seq_rm(self._ctx, seq.seq_id, -1, -1)
+        self._free.append(seq.seq_id)
+        self._reserved -= seq.reserved
+        with self._lock:
+            self._counts['sequences'] += 1
+        if error is not None:
+            seq.out.put(error)
+        else:
+            seq.flush()
+        seq.out.put(_END)
+
+    def _step(self):
+        """Evaluate one batch: the next token of every decoding sequence, then prompt tokens."""
+        batch = self._batch
+        n = 0
+        outputs = []
+        # Sequences with one pending token are decoding; put them first so
+        # long prompts never delay them
+        for seq in sorted(self._active, key=lambda s: len(s.pending)):
+            take = min(len(seq.pending), self.n_batch - n)
+            if take <= 0:
+                break
+            for i in range(take):
+                batch.token[n] = seq.pending[i]
+                batch.pos[n] = seq.pos + i
+                batch.n_seq_id[n] = 1
+                batch.seq_id[n][0] = seq.seq_id
+                batch.logits[n] = False
+                n += 1
+            seq.pending = seq.pending[take:]
+            seq.pos += take
+            if not seq.pending:
+                batch.logits[n - 1] = True
+                outputs.append((seq, n - 1))
+        batch.n_tokens = n
+
+        result = self._llama_cpp.llama_decode(self._ctx, batch)
+        if result != 0:
+            error = RuntimeError(f"llama_decode failed ({result})")
+            for seq in list(self._active):
+                self._finish(seq, error)
+            return
+
+        for seq, index in outputs:
+            logits = np.ctypeslib.as_array(self._llama_cpp.llama_get_logits_ith(self._ctx, index), shape=(self._n_vocab,))
+            token = sample_token(
+                logits, seq.temperature, seq.top_k, seq.top_p, self._rng,
+                min_p=seq.min_p, repeat_penalty=seq.repeat_penalty, recent=seq.recent
+            )
+            seq.generated += 1
+            seq.recent = seq.recent[1 - REPEAT_LAST_N:] + [token]
+            if token == self._eos:
+                self._finish(seq)
+                continue
+            # Detokenized after the previous tokens, like Llama's own streaming,
+            # so tokenizers that drop a leading space on its own keep it
+            stopped = seq.add_piece(self.llm.detokenize([token], prev_tokens=seq.tokens))
+            seq.tokens.append(token)
+            if stopped or seq.generated >= seq.max_tokens:
+                self._finish(seq)
+                continue
+            seq.pending = [token]
+
+        with self._lock:
+            self._counts['steps'] += 1
+            self._counts['tokens'] += len(outputs)
+
+    def _run(self):
+        """Decode loop: admit requests, drop cancelled ones, decode one step."""
+        while not self._closed:
+            self._admit()
+            for seq in [s for s in self._active if s.cancelled.is_set()]:
+                self._finish(seq)
+            if self._active:
+                self._step()
+
+        for seq in self._waiting + list(self._active):
+            seq.out.put(RuntimeError("Batch engine closed"))
+            seq.out.put(_END)
+        self._llama_cpp.llama_batch_free(self._batch)
+        self._llama_cpp.llama_free(self._ctx)
+
+    def close(self):
+        """Stop the decode loop and free the context."""
+        self._incoming.put(None)
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        else:
+            self._llama_cpp.llama_batch_free(self._batch)
+            self._llama_cpp.llama_free(self._ctx)
+
+    def get_stats(self):
+        """
+        Report decoding counters.
+
+        Returns:
+            dict: Decode 'steps', sampled 'tokens', finished 'sequences' and
+                  the average number of tokens sampled per step
+        """
+        with self._lock:
+            counts = dict(self._counts)
+        counts['tokens_per_step'] = round(counts['tokens'] / counts['steps'], 2) if counts['steps'] else None
+        return counts
@@ -0,0 +1,331 @@
+"""
+Pool of LLM inference processes shared by every web and job worker.
+
+`manage.py run_llm_pool` starts a fixed number of inference processes, each
+with its own Llama context and thread budget. llama.cpp memory-maps the GGUF
+file read-only, so the processes share one copy of the weights through the
+page cache and each one only adds its own KV cache. The pool process queues
+the requests of all clients (gunicorn workers, `run_worker` processes) in one
+LLMScheduler, which hands each request to the next free inference process.
+
+Clients talk to the pool over a local socket with multiprocessing.connection,
+see RemoteEngine. Messages are (kind, value) tuples:
+
+    client -> pool:  ('generate', {prompt, prefix, kwargs}), ('cancel', None),
+                     ('stats', None)
+    pool -> client:  ('token', text)..., then ('end', info) or ('error', message);
+                     ('stats', dict)
+
+The pool uses the same messages with its inference processes. Like ocr_pool,
+this module must not import Django models or settings.
+"""
+
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from .llm_scheduler import LLMScheduler, LocalEngine
+
+
+def parse_pool_address(address):
+    """
+    Parse an LLM pool address.
+
+    Args:
+        address (str): 'host:port', or the path of a Unix socket
+
+    Returns:
+        tuple or str: Address for multiprocessing.connection
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+
+def _write_stream(conn, tokens, cancel):
+    """
+    Send tokens to the reader until the stream ends.
+
+    A 'cancel' message from the reader calls cancel(); the remaining tokens
+    are consumed without being sent so the stream still ends cleanly.
+    """
+    cancelled = False
+    for token in tokens:
+        if not cancelled and conn.poll():
+            kind, _ = conn.recv()
+            if kind == 'cancel':
+                cancel()
+                cancelled = True
+        if not cancelled:
+            conn.send(('token', token))
+
+
+class _ConnectionEngine:
+    """Engine whose generations run on the other end of a connection."""
+
+    _conn = None
+
+    def _read_stream(self, info):
+        """
+        Yield the tokens of the generation in progress on the connection.
+
+        Closing the generator early asks the other end to stop and waits for
+        the end of the stream, so the connection can be reused.
+        """
+        finished = False
+        try:
+            while True:
+                try:
+                    kind, value = self._conn.recv()
+                except (EOFError, OSError):
+                    finished = True
+                    self._conn = None
+                    raise ConnectionError("LLM pool connection lost")
+                if kind == 'token':
+                    yield value
+                elif kind == 'end':
+                    finished = True
+                    info.update(value)
+                    return
+                else:
+                    finished = True
+                    raise RuntimeError(value)
+        finally:
+            if not finished:
+                self._conn.send(('cancel', None))
+                while self._conn.recv()[0] not in ('end', 'error'):
+                    pass
+
+
+def _serve_process(conn, llama_kwargs):
+    """Inference process body: load one Llama context and serve generations from the pool."""
+    try:
+        from llama_cpp import Llama
+        start = time.monotonic()
+        engine = LocalEngine(Llama(**llama_kwargs))
+    except Exception as e:
+        conn.send(('error', str(e)))
+        return
+    conn.send(('ready', time.monotonic() - start))
+
+    while True:
+        try:
+            kind, value = conn.recv()
+        except EOFError:
+            return
+        if kind != 'generate':
+            # A cancel that arrived after its generation had ended
+            continue
+
+        info = {}
+        tokens = engine.generate(value['prompt'], value['prefix'], value['kwargs'], info)
+        try:
+            _write_stream(conn, tokens, tokens.close)
+        except Exception as e:
+            conn.send(('error', str(e)))
+            continue
+        conn.send(('end', info))
+
+
+class ProcessEngine(_ConnectionEngine):
+    """
+    Engine backed by an inference process of the pool.
+
+    If the process dies, it is started again on the next generation.
+
+    Args:
+        llama_kwargs (dict): Arguments for the process's Llama constructor
+    """
+
+    def __init__(self, llama_kwargs):
+        self.llama_kwargs = llama_kwargs
+        self.restarts = 0
+        self._spawn()
+
+    def _spawn(self):
+        context = multiprocessing.get_context('spawn')
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_serve_process, args=(child_conn, self.llama_kwargs), name='llm-pool-process', daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def _respawn(self):
+        """Replace a dead inference process and wait for it to load the model."""
+        if self._conn is not None:
+            self._conn.close()
+        self.process.join(timeout=5)
+        print(f"LLM pool process {self.process.pid} exited with code {self.process.exitcode}, restarting it")
+        self.restarts += 1
+        self._spawn()
+        self.wait_ready()
+
+    def wait_ready(self):
+        """
+        Wait until the process has loaded its model.
+
+        Returns:
+            float: Seconds the process spent loading the model
+        """
+        try:
+            kind, value = self._conn.recv()
+        except (EOFError, OSError):
+            kind, value = 'error', f"process exited with code {self.process.exitcode}"
+        if kind != 'ready':
+            self._conn = None
+            raise RuntimeError(f"LLM pool process failed to load the model: {value}")
+        return value
+
+    def generate(self, prompt, prefix, kwargs, info):
+        """Stream one completion from the process (see LocalEngine.generate)."""
+        message = ('generate', {'prompt': prompt, 'prefix': prefix, 'kwargs': kwargs})
+        if self._conn is None or not self.process.is_alive():
+            self._respawn()
+        try:
+            self._conn.send(message)
+        except OSError:
+            # The process died since the last generation
+            self._respawn()
+            self._conn.send(message)
+        yield from self._read_stream(info)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class RemoteEngine(_ConnectionEngine):
+    """
+    Engine that forwards generations to a running LLM pool.
+
+    The connection is opened on first use and opened again if the pool was
+    restarted in between.
+
+    Args:
+        address: Pool address from parse_pool_address
+        authkey (bytes): Shared secret of the pool
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+
+    def generate(self, prompt, prefix, kwargs, info):
+        """Stream one completion from the pool (see LocalEngine.generate)."""
+        message = ('generate', {'prompt': prompt, 'prefix': prefix, 'kwargs': kwargs})
+        try:
+            if self._conn is None:
+                self._conn = Client(self.address, authkey=self.authkey)
+            self._conn.send(message)
+        except OSError:
+            # Stale connection to a pool that has been restarted
+            self._conn = Client(self.address, authkey=self.authkey)
+            self._conn.send(message)
+        yield from self._read_stream(info)
+
+
+def request_pool_stats(address, authkey):
+    """
+    Ask a running LLM pool for its queue metrics.
+
+    Args:
+        address: Pool address from parse_pool_address
+        authkey (bytes): Shared secret of the pool
+
+    Returns:
+        dict: LLMScheduler.get_stats() of the pool
+    """
+    with Client(address, authkey=authkey) as conn:
+        conn.send(('stats', None))
+        return conn.recv()[1]
+
+
+class LLMPoolServer:
+    """
+    Inference processes plus the socket that clients reach them through.
+
+    Args:
+        address: Address to listen on, from parse_pool_address
+        authkey (bytes): Shared secret clients must present
+        processes (int): Number of inference processes
+        llama_kwargs (dict): Arguments for each process's Llama constructor
+    """
+
+    def __init__(self, address, authkey, processes, llama_kwargs):
+        self.address = address
+        self.authkey = authkey
+        self.processes = max(1, processes)
+        self.llama_kwargs = llama_kwargs
+        self.engines = []
+        self.scheduler = None
+        self._listener = None
+
+    def start(self):
+        """
+        Start the inference processes and wait for them to load the model.
+
+        Returns:
+            list: Seconds each process spent loading the model
+        """
+        self.engines = [ProcessEngine(self.llama_kwargs) for _ in range(self.processes)]
+        timings = [engine.wait_ready() for engine in self.engines]
+        self.scheduler = LLMScheduler(self.engines.__getitem__, workers=self.processes)
+        return timings
+
+    def serve_forever(self):
+        """Accept clients until close() is called, one thread per connection."""
+        self._listener = Listener(self.address, authkey=self.authkey)
+        while True:
+            try:
+                conn = self._listener.accept()
+            except multiprocessing.AuthenticationError as e:
+                print(f"Rejected LLM pool client: {str(e)}")
+                continue
+            except OSError:
+                # Listener closed
+                return
+            thread = threading.Thread(target=self._serve_client, args=(conn,), name='llm-pool-client', daemon=True)
+            thread.start()
+
+    def _serve_client(self, conn):
+        """Client thread body: run the client's generations through the shared scheduler."""
+        with conn:
+            while True:
+                try:
+                    kind, value = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                if kind == 'stats':
+                    conn.send(('stats', self.scheduler.get_stats()))
+                    continue
+                if kind != 'generate':
+                    continue
+
+                request = self.scheduler.submit(value['prompt'], prefix=value['prefix'], **value['kwargs'])
+                try:
+                    _write_stream(conn, request.tokens(), request.cancel)
+                except (EOFError, OSError):
+                    request.cancel()
+                    return
+                except Exception as e:
+                    conn.send(('error', str(e)))
+                    continue
+                conn.send(('end', {
+                    'prefix_tokens_reused': request.prefix_tokens_reused,
+                    'prefix_seconds_saved': request.prefix_seconds_saved,
+                    'wait_seconds': request.wait_seconds or 0.0,
+                }))
+
+    def close(self):
+        """Stop accepting clients and shut the inference processes down."""
+        if self._listener is not None:
+            self._listener.close()
+        for engine in self.engines:
+            engine.close()
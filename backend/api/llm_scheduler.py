@@ -0,0 +1,355 @@
+"""
+Single-flight scheduler for LLM generations.
+
+The scheduler owns the inference engines of the process: each engine (a
+local Llama context, or a connection to the LLM pool, see llm_pool.py)
+belongs to one worker thread, and generation requests wait in a FIFO queue
+until a worker is free, so concurrent requests never share a context or
+fight over its threads. Identical in-flight jobs (e.g. two people opening the
+same note) can be coalesced into one run whose events are delivered to every
+caller.
+
+Requests may name a constant prompt prefix. A local engine evaluates a
+prefix once, keeps the resulting context state, and restores it before
+requests with the same prefix, so llama.cpp's prefix matching only evaluates
+the request-specific rest of the prompt.
+
+This module must not import Django models or settings.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+
+# Marks the end of a request's token queue
+_END = object()
+# Tells a worker thread to exit
+_STOP = object()
+
+# Prefix states kept per worker context
+MAX_PREFIX_STATES = 4
+
+
+class LocalEngine:
+    """
+    Runs generations on one Llama context, reusing evaluated prompt prefixes.
+
+    Engines are used by one thread at a time. Any object with the same
+    generate() method can serve as an engine.
+
+    Args:
+        llm (Llama): The context
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        # prefix -> (tokens, saved state, evaluation seconds)
+        self._states = {}
+
+    def _prime_prefix(self, prefix):
+        """
+        Make the context start with the evaluated prefix.
+
+        The first time a prefix is seen it is evaluated and the context
+        state saved; afterwards the state is restored unless the context
+        still starts with the prefix from the previous request.
+
+        Args:
+            prefix (str): Constant start of the prompt
+
+        Returns:
+            tuple: (tokens reused, seconds of prompt evaluation saved)
+        """
+        llm = self.llm
+        entry = self._states.get(prefix)
+        if entry is None:
+            tokens = llm.tokenize(prefix.encode('utf-8'))
+            start = time.monotonic()
+            llm.reset()
+            llm.eval(tokens)
+            if len(self._states) >= MAX_PREFIX_STATES:
+                self._states.pop(next(iter(self._states)))
+            self._states[prefix] = (tokens, llm.save_state(), time.monotonic() - start)
+            return 0, 0.0
+
+        tokens, state, eval_seconds = entry
+        if llm.n_tokens < len(tokens) or list(llm.input_ids[:len(tokens)]) != tokens:
+            llm.load_state(state)
+        return len(tokens), eval_seconds
+
+    def generate(self, prompt, prefix, kwargs, info):
+        """
+        Stream one completion.
+
+        Args:
+            prompt (str): Prompt to complete
+            prefix (str or None): Constant start of the prompt
+            kwargs (dict): Arguments for the Llama call (max_tokens, stop, ...)
+            info (dict): Filled with 'prefix_tokens_reused' and
+                         'prefix_seconds_saved' before the generator finishes
+
+        Yields:
+            str: Generated text, one token at a time
+        """
+        if prefix:
+            info['prefix_tokens_reused'], info['prefix_seconds_saved'] = self._prime_prefix(prefix)
+        for response in self.llm(prompt, stream=True, **kwargs):
+            yield response["choices"][0]["text"]
+
+
+class LLMRequest:
+    """A queued generation; its tokens are buffered until they are read."""
+
+    def __init__(self, prompt, kwargs, prefix=None):
+        self.prompt = prompt
+        self.kwargs = kwargs
+        self.prefix = prefix
+        self.submitted_at = time.monotonic()
+        self.wait_seconds = None
+        # Set by the worker before the end of the token stream
+        self.prefix_tokens_reused = 0
+        self.prefix_seconds_saved = 0.0
+        self._tokens = queue.Queue()
+        self._cancelled = threading.Event()
+
+    def tokens(self):
+        """
+        Yield the generated tokens, blocking until each is available.
+
+        Yields:
+            str: Generated text, one token at a time
+        """
+        while True:
+            token = self._tokens.get()
+            if token is _END:
+                return
+            if isinstance(token, Exception):
+                raise token
+            yield token
+
+    def cancel(self):
+        """Stop the generation (or skip it if it has not started yet)."""
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+
+class _Flight:
+    """Events of one coalesced run, replayed to every follower."""
+
+    def __init__(self):
+        self.events = []
+        self.error = None
+        self.done = False
+        self.condition = threading.Condition()
+
+
+class LLMScheduler:
+    """
+    Queue of generation requests served by a fixed set of engines.
+
+    Args:
+        loader (callable): Called as loader(index) in worker thread `index`
+                           to create that worker's engine (e.g. LocalEngine)
+        workers (int): Number of worker threads (and engines)
+    """
+
+    def __init__(self, loader, workers=1):
+        self._loader = loader
+        self._workers = max(1, workers)
+        self._requests = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._flights = {}
+        self._waits = deque(maxlen=100)
+        self._counts = {'requests': 0, 'coalesced': 0, 'prefix_tokens_reused': 0, 'prefix_seconds_saved': 0.0}
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self._workers:
+                index = len(self._threads)
+                thread = threading.Thread(target=self._work, args=(index,), name=f'llm-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self, index):
+        """Worker thread body: serve queued requests on this worker's engine."""
+        engine = None
+        while True:
+            request = self._requests.get()
+            if request is _STOP:
+                return
+            if request.is_cancelled():
+                request._tokens.put(_END)
+                continue
+
+            request.wait_seconds = time.monotonic() - request.submitted_at
+            with self._lock:
+                self._busy += 1
+                self._waits.append(request.wait_seconds)
+
+            info = {}
+            try:
+                if engine is None:
+                    engine = self._loader(index)
+                tokens = engine.generate(request.prompt, request.prefix, request.kwargs, info)
+                try:
+                    for token in tokens:
+                        if request.is_cancelled():
+                            break
+                        request._tokens.put(token)
+                finally:
+                    tokens.close()
+            except Exception as e:
+                request._tokens.put(e)
+            finally:
+                request.prefix_tokens_reused = info.get('prefix_tokens_reused', 0)
+                request.prefix_seconds_saved = info.get('prefix_seconds_saved', 0.0)
+                # Time spent queued in the LLM pool, for remote engines
+                request.wait_seconds += info.get('wait_seconds', 0.0)
+                with self._lock:
+                    self._busy -= 1
+                    self._counts['prefix_tokens_reused'] += request.prefix_tokens_reused
+                    self._counts['prefix_seconds_saved'] += request.prefix_seconds_saved
+                request._tokens.put(_END)
+
+    def submit(self, prompt, prefix=None, **kwargs):
+        """
+        Queue a streaming generation.
+
+        Args:
+            prompt (str): Prompt to complete
+            prefix (str, optional): Constant start of the prompt whose
+                                    evaluated state is reused across requests
+            **kwargs: Arguments for the Llama call (max_tokens, stop, ...)
+
+        Returns:
+            LLMRequest: Handle to read the tokens from, or cancel
+        """
+        self._start_workers()
+        request = LLMRequest(prompt, kwargs, prefix=prefix)
+        with self._lock:
+            self._counts['requests'] += 1
+        self._requests.put(request)
+        return request
+
+    def stream(self, prompt, prefix=None, **kwargs):
+        """
+        Queue a generation and yield its tokens; closing the generator cancels it.
+
+        Args:
+            prompt (str): Prompt to complete
+            prefix (str, optional): Constant start of the prompt, see submit
+            **kwargs: Arguments for the Llama call (max_tokens, stop, ...)
+
+        Yields:
+            str: Generated text, one token at a time
+        """
+        request = self.submit(prompt, prefix=prefix, **kwargs)
+        try:
+            yield from request.tokens()
+        finally:
+            request.cancel()
+
+    def single_flight(self, key, producer):
+        """
+        Run producer() at most once at a time per key and follow its events.
+
+        The first caller for a key starts producer() in a background thread;
+        callers arriving while it runs join the same run. Every caller gets
+        all of the run's events from the beginning, and the run finishes even
+        if its callers stop reading.
+
+        Args:
+            key (str): Identity of the job, e.g. note and input hash
+            producer (callable): Returns an iterator of events
+
+        Returns:
+            generator: The run's events
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                thread = threading.Thread(
+                    target=self._run_flight, args=(key, flight, producer), name='llm-flight', daemon=True
+                )
+                thread.start()
+            else:
+                self._counts['coalesced'] += 1
+
+        return self._follow(flight)
+
+    def _run_flight(self, key, flight, producer):
+        try:
+            for event in producer():
+                with flight.condition:
+                    flight.events.append(event)
+                    flight.condition.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    def _follow(self, flight):
+        index = 0
+        while True:
+            with flight.condition:
+                while index >= len(flight.events) and not flight.done:
+                    flight.condition.wait()
+                if index < len(flight.events):
+                    event = flight.events[index]
+                elif flight.error is not None:
+                    raise flight.error
+                else:
+                    return
+            index += 1
+            yield event
+
+    def close(self):
+        """
+        Stop the worker threads, releasing their engines.
+
+        Requests queued before the call are served first. The caller must
+        make sure no requests are submitted meanwhile; a later submit()
+        starts new workers, which load their engines again.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._requests.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def get_stats(self):
+        """
+        Report queue and worker metrics.
+
+        Returns:
+            dict: Workers started and busy, 'queue_depth', coalesced runs in
+                  flight, request counters, prompt prefix reuse and the queue
+                  wait time over the last 100 requests
+        """
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                'workers': len(self._threads),
+                'busy': self._busy,
+                'queue_depth': self._requests.qsize(),
+                'in_flight': len(self._flights),
+                'requests': self._counts['requests'],
+                'coalesced': self._counts['coalesced'],
+                'prefix_tokens_reused': self._counts['prefix_tokens_reused'],
+                'prefix_seconds_saved': round(self._counts['prefix_seconds_saved'], 3),
+                'wait_seconds_avg': round(sum(waits) / len(waits), 3) if waits else None,
+                'wait_seconds_max': round(max(waits), 3) if waits else None,
+            }
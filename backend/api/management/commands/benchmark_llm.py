@@ -0,0 +1,123 @@
+"""
+Measure aggregate generation throughput of batched decoding.
+
+Runs the same set of summary prompts through a BatchEngine at each batch size
+and reports generated tokens per second:
+
+    python manage.py benchmark_llm
+    python manage.py benchmark_llm --batch-sizes 1,4 --requests 16 --max-tokens 64
+    python manage.py benchmark_llm --model qwen2.5-3b
+"""
+
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.llm_batch import BatchEngine
+from api.summary_utils import MARKDOWN_PROMPT, N_THREADS, SAMPLING_PARAMS, get_llm, get_model_spec
+
+
+SAMPLE_TEXT = (
+    "Lecture 4: Memory hierarchy. Registers, caches (L1, L2, L3), main memory and disk. "
+    "Each level is larger and slower than the one above. Locality: programs reuse recently "
+    "used data (temporal) and data stored nearby (spatial). Cache lines are 64 bytes. "
+    "TODO: review write-back vs write-through before the quiz. Homework 3 due Friday."
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare LLM generation throughput at several batch sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-sizes',
+            default='1,2,4,8',
+            help='Comma-separated batch sizes to measure (default: 1,2,4,8).'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=8,
+            help='Generations per batch size, submitted at once (default: 8).'
+        )
+        parser.add_argument(
+            '--max-tokens',
+            type=int,
+            default=128,
+            help='Tokens generated per request (default: 128).'
+        )
+        parser.add_argument(
+            '--model',
+            help='LLM_MODELS entry to benchmark (defaults to LLM_DEFAULT_MODEL).'
+        )
+        parser.add_argument(
+            '--text-file',
+            help='Note text to summarize instead of the built-in sample.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            batch_sizes = [int(size) for size in options['batch_sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--batch-sizes must be a comma-separated list of integers')
+
+        text = SAMPLE_TEXT
+        if options['text_file']:
+            with open(options['text_file'], encoding='utf-8') as f:
+                text = f.read()
+
+        prompt = MARKDOWN_PROMPT.format(text=text)
+        max_tokens = options['max_tokens']
+        # Fixed-length outputs so every batch size does the same work
+        kwargs = {**SAMPLING_PARAMS, 'max_tokens': max_tokens, 'stop': []}
+
+        try:
+            model = get_model_spec(options['model'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        llm = get_llm(model)
+        prompt_tokens = len(llm.tokenize(prompt.encode('utf-8')))
+        self.stdout.write(
+            f"{model['name']}: {options['requests']} request(s) of {prompt_tokens} prompt + {max_tokens} generated tokens, {N_THREADS} threads"
+        )
+
+        baseline = None
+        for size in batch_sizes:
+            engine = BatchEngine(llm, n_seq=size, n_ctx=size * (prompt_tokens + max_tokens), n_threads=N_THREADS)
+            try:
+                seconds = self._run(engine, prompt, kwargs, options['requests'])
+                stats = engine.get_stats()
+            finally:
+                engine.close()
+
+            throughput = stats['tokens'] / seconds
+            baseline = baseline or throughput
+            self.stdout.write(
+                f"batch {size}: {stats['tokens']} tokens in {seconds:.1f}s = {throughput:.1f} tok/s "
+                f"(x{throughput / baseline:.2f}, {stats['tokens_per_step']} tokens/step)"
+            )
+
+    def _run(self, engine, prompt, kwargs, requests):
+        """Submit all requests at once and wait for the last one to finish."""
+        errors = []
+
+        def consume():
+            try:
+                for _ in engine.generate(prompt, None, kwargs, {}):
+                    pass
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=consume) for _ in range(requests)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.monotonic() - start
+
+        if errors:
+            raise CommandError(f"Generation failed: {errors[0]}")
+        return seconds
@@ -0,0 +1,147 @@
+"""
+Compare the in-process Markdown to Notion converter with the node tool.
+
+Converts the same document with api.notion_markdown and with
+notion-md/markdown_to_notion.js (@tryfabric/martian), both with one node
+process per conversion and through the long-lived `--batch` process of
+notion-md/convert.py, then reports the throughput of each and the blocks
+whose type or text differ:
+
+    python manage.py benchmark_notion_md
+    python manage.py benchmark_notion_md --file summary.md --iterations 500
+
+Without node or the notion-md dependencies, the output is compared with the
+saved notion-md/notion_blocks.json when converting the default example.md.
+"""
+
+import importlib.util
+import json
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.notion_markdown import block_outline, markdown_to_blocks
+
+
+NOTION_MD_DIR = settings.BASE_DIR.parent / 'notion-md'
+
+
+def _top_level_outline(blocks):
+    """(type, text of the block and its children) per top-level block."""
+    outline = []
+    for block_type, text, depth in block_outline(blocks):
+        if depth == 0:
+            outline.append([block_type, text])
+        elif outline and text:
+            outline[-1][1] = f"{outline[-1][1]}\n{text}".strip('\n')
+    return [tuple(entry) for entry in outline]
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput and output of the Python and node Markdown to Notion converters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=str(NOTION_MD_DIR / 'example.md'),
+            help='Markdown document to convert (default: notion-md/example.md).'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Conversions timed for the Python converter (default: 200).'
+        )
+        parser.add_argument(
+            '--node-iterations',
+            type=int,
+            default=10,
+            help='Conversions timed for the node tool (default: 10).'
+        )
+
+    def handle(self, *args, **options):
+        with open(options['file'], encoding='utf-8') as f:
+            markdown = f.read()
+
+        iterations = max(1, options['iterations'])
+        start = time.perf_counter()
+        for _ in range(iterations):
+            blocks = markdown_to_blocks(markdown)
+        seconds = time.perf_counter() - start
+        self.stdout.write(
+            f"python: {len(blocks)} top-level block(s), {seconds / iterations * 1000:.3f} ms/conversion "
+            f"({iterations / seconds:.0f} conversions/s)"
+        )
+
+        reference, source = self._run_node(options['file'], max(1, options['node_iterations']))
+        if reference is None:
+            saved = NOTION_MD_DIR / 'notion_blocks.json'
+            if options['file'] != str(NOTION_MD_DIR / 'example.md') or not saved.exists():
+                self.stdout.write("No node output to compare with")
+                return
+            with open(saved, encoding='utf-8') as f:
+                reference = json.load(f)
+            source = 'notion-md/notion_blocks.json'
+
+        self._compare(blocks, reference, source)
+
+    def _run_node(self, path, iterations):
+        """Time the node tool; returns (blocks, label), or (None, None) if it cannot run."""
+        command = ['node', str(NOTION_MD_DIR / 'markdown_to_notion.js'), path]
+        try:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = subprocess.run(command, cwd=NOTION_MD_DIR, capture_output=True, text=True, check=True)
+            seconds = time.perf_counter() - start
+        except (OSError, subprocess.CalledProcessError) as e:
+            lines = (getattr(e, 'stderr', None) or str(e)).strip().splitlines()
+            detail = next((line for line in lines if 'Error' in line), lines[-1])
+            self.stdout.write(f"node: unavailable ({detail})")
+            return None, None
+
+        blocks = json.loads(result.stdout)['blocks']
+        self.stdout.write(
+            f"node:   {len(blocks)} top-level block(s), {seconds / iterations * 1000:.3f} ms/conversion "
+            f"({iterations / seconds:.0f} conversions/s)"
+        )
+        self._run_node_batch(path, iterations)
+        return blocks, 'node'
+
+    def _run_node_batch(self, path, iterations):
+        """Time the same conversions through one long-lived node process."""
+        spec = importlib.util.spec_from_file_location('notion_md_convert', NOTION_MD_DIR / 'convert.py')
+        convert = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(convert)
+
+        with convert.BatchConverter() as converter:
+            try:
+                # The first conversion starts node and loads martian
+                converter.convert_file(path)
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    converter.convert_file(path)
+                seconds = time.perf_counter() - start
+            except convert.ConversionError as e:
+                self.stdout.write(f"node --batch: unavailable ({e})")
+                return
+        self.stdout.write(
+            f"node --batch: {seconds / iterations * 1000:.3f} ms/conversion ({iterations / seconds:.0f} conversions/s)"
+        )
+
+    def _compare(self, blocks, reference, source):
+        """Report the top-level blocks whose type or text differ from the reference."""
+        ours = _top_level_outline(blocks)
+        theirs = _top_level_outline(reference)
+        differences = [
+            (index, mine, other)
+            for index, (mine, other) in enumerate(zip(ours, theirs))
+            if mine != other
+        ]
+        matching = min(len(ours), len(theirs)) - len(differences)
+        self.stdout.write(f"output: {matching}/{max(len(ours), len(theirs))} top-level blocks match {source}")
+        for index, mine, other in differences[:10]:
+            self.stdout.write(f"  block {index}: python {mine!r} != {source} {other!r}")
+        if len(ours) != len(theirs):
+            self.stdout.write(f"  block count differs: python {len(ours)}, {source} {len(theirs)}")
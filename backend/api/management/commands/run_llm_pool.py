@@ -0,0 +1,74 @@
+"""
+Pool of LLM inference processes serving summaries to every web and job worker.
+
+Start one pool per machine and point the other processes at it with
+LLM_POOL_ADDRESS:
+
+    python manage.py run_llm_pool
+    python manage.py run_llm_pool --processes 4 --threads 4
+"""
+
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.llm_pool import LLMPoolServer, parse_pool_address
+from api.summary_utils import N_THREADS, get_llama_kwargs, get_pool_authkey
+
+
+class Command(BaseCommand):
+    help = 'Run LLM inference processes that share the memory-mapped model and serve generations over a local socket.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            default=settings.LLM_POOL_ADDRESS or '127.0.0.1:8765',
+            help='host:port or Unix socket path to listen on (defaults to LLM_POOL_ADDRESS).'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.LLM_POOL_PROCESSES,
+            help='Number of inference processes (defaults to LLM_POOL_PROCESSES).'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.LLM_POOL_THREADS,
+            help='CPU threads per process (defaults to LLM_POOL_THREADS, 0 = N_THREADS split evenly).'
+        )
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        threads = options['threads'] or N_THREADS // processes
+
+        server = LLMPoolServer(
+            parse_pool_address(options['address']),
+            get_pool_authkey(),
+            processes,
+            get_llama_kwargs(threads),
+        )
+
+        self.stdout.write(f"Starting {processes} LLM process(es) with {max(1, threads)} thread(s) each...")
+        try:
+            timings = server.start()
+        except RuntimeError as e:
+            server.close()
+            raise CommandError(str(e))
+        for index, seconds in enumerate(timings):
+            self.stdout.write(f"Process {index} loaded the model in {seconds:.1f}s")
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        self.stdout.write(self.style.SUCCESS(f"LLM pool listening on {options['address']}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        self.stdout.write("LLM pool stopped")
+
+    def _request_stop(self, signum, frame):
+        """Interrupt the accept loop so the pool shuts down cleanly."""
+        raise KeyboardInterrupt
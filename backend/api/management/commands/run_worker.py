@@ -0,0 +1,145 @@
+"""
+Worker process that drains the background job queue.
+
+Run as many of these as needed, on one or several machines sharing the
+database:
+
+    python manage.py run_worker
+    python manage.py run_worker --kind ocr
+    python manage.py run_worker --kind summary --concurrency 4
+    python manage.py run_worker --kind notion_export --concurrency 8
+"""
+
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from api.model_utils import warm_up_models
+from api.job_utils import (
+    claim_job,
+    extend_lease,
+    fail_abandoned_jobs,
+    get_worker_id,
+    run_job,
+)
+
+
+class Command(BaseCommand):
+    help = 'Claim and run queued OCR, summary and Notion export jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            action='append',
+            dest='kinds',
+            help='Only run jobs of this kind (repeatable). Defaults to all kinds.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling.'
+        )
+        parser.add_argument(
+            '--warmup',
+            action='store_true',
+            help='Load the models this worker needs before claiming jobs.'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Exit after running this many jobs (0 = no limit).'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Run up to this many jobs at once, so their generations share the LLM batch (LLM_BATCH_SIZE).'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        worker_id = get_worker_id()
+        kinds = options['kinds']
+        max_jobs = options['max_jobs']
+        concurrency = max(1, options['concurrency'])
+        jobs_run = 0
+
+        if options['warmup']:
+            timings = warm_up_models(
+                ocr=not kinds or 'ocr' in kinds,
+                llm=not kinds or 'summary' in kinds
+            )
+            for name, seconds in timings.items():
+                self.stdout.write(f"Loaded {name} in {seconds:.1f}s")
+        
+        self.stdout.write(f"Worker {worker_id} started (kinds: {', '.join(kinds) if kinds else 'all'})")
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job') as executor:
+            running = set()
+            while not self.stopping:
+                if len(running) >= concurrency:
+                    _, running = wait(running, return_when=FIRST_COMPLETED)
+                    continue
+
+                close_old_connections()
+                fail_abandoned_jobs()
+
+                job = claim_job(worker_id, kinds=kinds)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+                    continue
+
+                self.stdout.write(f"Running job {job.id} ({job.kind}, attempt {job.attempts}/{job.max_attempts})")
+                running.add(executor.submit(self._run_job, job, worker_id))
+
+                jobs_run += 1
+                if max_jobs and jobs_run >= max_jobs:
+                    break
+
+        self.stdout.write(f"Worker {worker_id} stopped after {jobs_run} job(s)")
+
+    def _run_job(self, job, worker_id):
+        """Job thread body: run one job and report the outcome."""
+        try:
+            ok = self._run_with_heartbeat(job, worker_id)
+            self.stdout.write(f"Job {job.id} {'done' if ok else 'failed'}")
+        finally:
+            connections.close_all()
+
+    def _run_with_heartbeat(self, job, worker_id):
+        """Run a job while a background thread keeps its lease alive."""
+        done = threading.Event()
+        interval = max(1, settings.JOB_LEASE_SECONDS // 3)
+
+        def heartbeat():
+            while not done.wait(interval):
+                try:
+                    if not extend_lease(job, worker_id):
+                        self.stderr.write(f"Lost lease on job {job.id}")
+                        return
+                finally:
+                    close_old_connections()
+
+        thread = threading.Thread(target=heartbeat, daemon=True)
+        thread.start()
+        try:
+            return run_job(job, worker_id)
+        finally:
+            done.set()
+            thread.join()
+
+    def _request_stop(self, signum, frame):
+        """Finish the running jobs, then exit."""
+        self.stdout.write("Stop requested, finishing running jobs...")
+        self.stopping = True
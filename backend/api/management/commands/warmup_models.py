@@ -0,0 +1,27 @@
+"""
+Load PaddleOCR and/or the LLaMA model and report how long each took.
+
+    python manage.py warmup_models
+    python manage.py warmup_models --only ocr
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.model_utils import warm_up_models
+
+
+class Command(BaseCommand):
+    help = 'Load the OCR and LLM models to check they are available and time their start-up.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=['ocr', 'llm'],
+            help='Load only this model.'
+        )
+
+    def handle(self, *args, **options):
+        only = options['only']
+        timings = warm_up_models(ocr=only in (None, 'ocr'), llm=only in (None, 'llm'))
+        for name, seconds in timings.items():
+            self.stdout.write(self.style.SUCCESS(f"{name}: loaded in {seconds:.1f}s"))
@@ -0,0 +1,387 @@
+"""
+Rule-based Markdown conversion of note text, without the LLM.
+
+Ported from the heuristic converter in Memoir_ML/MarkdownMaker.ipynb: headings,
+task lists, bullet and numbered lists, tables, quotes, code and math blocks,
+images and links are recognized with regexes, and spaCy part-of-speech tags
+tell headings and imperative tasks from ordinary sentences. spaCy is loaded
+on first use and all lines of a note are tagged in one `nlp.pipe` call; if it
+is not installed, the regex rules run alone.
+"""
+
+import re
+import threading
+
+from django.conf import settings
+
+
+RULES_ENGINE = 'rules'
+
+# Lines tagged per nlp.pipe batch
+NLP_BATCH_SIZE = 256
+
+
+def _marker_re(words):
+    """Match a status word at the start (after an optional bullet) or the end of a line."""
+    return re.compile(
+        rf"^(?:[-*+•]\s+)?(?:{words})(?!\w)[\s:\-]*|[\s:\-(\[]*(?<!\w)(?:{words})[\s.!)\]]*$",
+        re.I
+    )
+
+
+TODO_MARKER_RE = _marker_re(r"todo|to[- ]do|pending|in\s*progress")
+DONE_MARKER_RE = _marker_re(r"done|completed|finished|[✓✔]")
+TODO_HEADER_RE = re.compile(r"^\s*(todo|to[- ]do)\s*[:\-]*\s*$", re.I)
+CHECKBOX_RE = re.compile(r"^\s*[-*+]\s+\[( |x|X)\]\s+(.*)")
+BULLET_RE = re.compile(r"^\s*(?:[-*+•]|(\d+)[.)])\s+(.*)")
+MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+)")
+TITLE_CASE_RE = re.compile(r"^[A-Z][\w\s\-]{2,50}$")
+HR_RE = re.compile(r"^\s*(-{3,}|\*{3,}|_{3,})\s*$")
+FENCE_RE = re.compile(r"^\s*(```|\$\$)")
+TABLE_DIVIDER_RE = re.compile(r"^\s*\|?[\s:-]+\|")
+FOOTNOTE_RE = re.compile(r"^\[\^.+\]:")
+URL_RE = re.compile(r"(?<![(\[])(?P<url>https?://[^\s<>{}|\]^`]+)", re.I)
+IMAGE_LINE_RE = re.compile(r"^\s*image\s*:\s*(?P<alt>[^|]+?)\s*\|\s*(?P<url>\S+)", re.I)
+# Page markers written by ocr_utils.format_pages_text
+PAGE_MARKER_RE = re.compile(r"^--- Page \d+ \([^)]*\) ---$")
+# A printed line that continues the previous one
+SOFT_WRAP_RE = re.compile(r"^[a-z]")
+
+# Verbs that start a task even when the tagger misses the imperative
+TASK_VERBS = {
+    'add', 'allocate', 'build', 'buy', 'call', 'check', 'configure', 'create', 'deploy',
+    'design', 'develop', 'email', 'finish', 'fix', 'implement', 'install', 'prepare',
+    'read', 'remove', 'review', 'schedule', 'send', 'setup', 'submit', 'test', 'update',
+    'write',
+}
+
+_nlp = None
+_nlp_loaded = False
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """
+    Get the spaCy pipeline, loading SPACY_MODEL on first use.
+
+    Only the tagger, attribute ruler and lemmatizer are kept; the parser and
+    named entities are not needed to classify lines.
+
+    Returns:
+        Language or None: The pipeline, or None if spaCy or the model is missing
+    """
+    global _nlp, _nlp_loaded
+    if not _nlp_loaded:
+        with _nlp_lock:
+            if not _nlp_loaded:
+                try:
+                    import spacy
+                    _nlp = spacy.load(settings.SPACY_MODEL, disable=['parser', 'ner'])
+                except (ImportError, OSError) as e:
+                    print(f"spaCy unavailable, using regex rules only: {str(e)}")
+                _nlp_loaded = True
+    return _nlp
+
+
+def is_nlp_loaded():
+    """Check whether the spaCy pipeline has been loaded in this process."""
+    return _nlp is not None
+
+
+def get_structure_score(text):
+    """
+    Estimate how much of a note is already list- or outline-shaped.
+
+    This is the cheap classifier that decides whether a note can skip the
+    LLM: it only looks at line shapes, without spaCy or the tokenizer.
+    OCR text keeps one line per printed line, so soft-wrapped lines are
+    joined first: a line that starts in lowercase continues the line
+    before it unless that one ends a sentence.
+
+    Args:
+        text (str): Note text
+
+    Returns:
+        float: Share of non-blank lines, page markers aside, that are
+               headings, list items, tasks, table rows or short label-like
+               lines (0.0 to 1.0)
+    """
+    lines = []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line or PAGE_MARKER_RE.match(line):
+            continue
+        if lines and SOFT_WRAP_RE.match(line) and not lines[-1].endswith(('.', '!', '?', ':')):
+            lines[-1] = f"{lines[-1]} {line}"
+        else:
+            lines.append(line)
+    if not lines:
+        return 0.0
+
+    structured = 0
+    for line in lines:
+        if (
+            BULLET_RE.match(line)
+            or MD_HEADING_RE.match(line)
+            or TODO_MARKER_RE.search(line)
+            or DONE_MARKER_RE.search(line)
+            or '|' in line
+            or (line.isupper() and len(line) > 3)
+            or (len(line.split()) <= 6 and not line.endswith(('.', ',', ';')))
+        ):
+            structured += 1
+    return structured / len(lines)
+
+
+def is_simple_note(text, max_words, min_score):
+    """
+    Decide whether the rule-based engine is good enough for a note.
+
+    Args:
+        text (str): Note text
+        max_words (int): Longer notes always go to the LLM
+        min_score (float): Minimum get_structure_score
+
+    Returns:
+        bool: True for short notes that are mostly structured lines
+    """
+    words = len((text or '').split())
+    return 0 < words <= max_words and get_structure_score(text) >= min_score
+
+
+def _tag_lines(lines):
+    """Tag the distinct non-blank lines of a note in one nlp.pipe pass."""
+    nlp = get_nlp()
+    if nlp is None:
+        return {}
+
+    distinct = list(dict.fromkeys(line.strip() for line in lines if line.strip()))
+    docs = nlp.pipe(distinct, batch_size=NLP_BATCH_SIZE)
+    return dict(zip(distinct, docs))
+
+
+def _has_verb(doc):
+    return any(token.pos_ in ('VERB', 'AUX') for token in doc)
+
+
+def is_heading(line, doc=None):
+    """
+    Check whether a line is a heading.
+
+    Args:
+        line (str): Line of text
+        doc (Doc, optional): spaCy tags of the stripped line
+
+    Returns:
+        tuple: (is_heading, level)
+    """
+    stripped = line.strip()
+    if not stripped or len(stripped) > 120 or stripped.endswith(('.', ',', ';', '?', '!')):
+        return False, 0
+
+    match = MD_HEADING_RE.match(stripped)
+    if match:
+        return True, len(match.group(1))
+
+    if stripped.isupper() and len(stripped) > 3:
+        return True, 2
+
+    if TITLE_CASE_RE.match(stripped):
+        if doc is None:
+            # Without tags, only treat Title Case lines as headings
+            words = [word for word in stripped.split() if len(word) > 3]
+            return (bool(words) and all(word[0].isupper() for word in words)), 2
+        if len(doc) and doc[0].pos_ == 'VERB':
+            return False, 0
+        if not _has_verb(doc):
+            return True, 2
+
+    return False, 0
+
+
+def is_task(line, doc=None):
+    """
+    Check whether a line is a to-do item.
+
+    Args:
+        line (str): Line of text
+        doc (Doc, optional): spaCy tags of the stripped line
+
+    Returns:
+        tuple: (is_task, is_done)
+    """
+    stripped = line.strip()
+
+    if DONE_MARKER_RE.search(stripped):
+        return True, True
+
+    if TODO_MARKER_RE.search(stripped):
+        # A lone "Todo:" is the header of the tasks below it
+        if TODO_HEADER_RE.match(stripped):
+            return False, False
+        return True, False
+
+    if doc is not None and len(doc):
+        first = doc[0]
+        if first.pos_ == 'VERB' and (first.tag_ in ('VB', 'VBP') or first.lemma_.lower() in TASK_VERBS):
+            return True, False
+    elif stripped and stripped.split()[0].lower() in TASK_VERBS:
+        return True, False
+
+    return False, False
+
+
+def link_urls(text):
+    """Turn bare URLs into Markdown links."""
+    return URL_RE.sub(lambda m: f"[{m.group('url')}]({m.group('url')})", text)
+
+
+def clean_table_line(line):
+    cells = [cell.strip() for cell in line.strip().strip('|').split('|')]
+    return '| ' + ' | '.join(cells) + ' |'
+
+
+def _heading_text(text):
+    """Title-case shouted headings, keep the author's casing otherwise."""
+    return text.title() if text.isupper() else text
+
+
+def _parse_front_matter(lines, md_lines):
+    """Render a YAML front matter block; returns the index of the first body line."""
+    if len(lines) < 3 or lines[0].strip() != '---':
+        return 0
+
+    title = author = None
+    i = 1
+    while i < len(lines) and lines[i].strip() != '---':
+        line = lines[i].strip()
+        if line.lower().startswith('title:'):
+            title = line.split(':', 1)[1].strip().strip('"\'')
+        elif line.lower().startswith('author:'):
+            author = line.split(':', 1)[1].strip().strip('"\'')
+        i += 1
+    if i == len(lines):
+        # No closing marker: not front matter
+        return 0
+
+    if title:
+        md_lines.extend([f"# **{title}**", ""])
+    if author:
+        md_lines.extend([f"*{author}*", ""])
+    if title or author:
+        md_lines.extend(["---", ""])
+    return i + 1
+
+
+def transform_to_markdown(text):
+    """
+    Convert note text to Markdown with line rules.
+
+    Args:
+        text (str): Note text
+
+    Returns:
+        str: Markdown
+    """
+    lines = (text or '').strip().split('\n')
+    docs = _tag_lines(lines)
+    md_lines = []
+    i = _parse_front_matter(lines, md_lines)
+    under_todo_header = False
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        doc = docs.get(stripped)
+
+        if not stripped:
+            if md_lines and md_lines[-1].startswith('- ['):
+                # A blank line ends the tasks under a "Todo:" header
+                under_todo_header = False
+            md_lines.append("")
+            i += 1
+            continue
+
+        image = IMAGE_LINE_RE.match(line)
+        if image:
+            md_lines.extend([f"![{image.group('alt').strip()}]({image.group('url').strip()})", ""])
+            i += 1
+            continue
+
+        if HR_RE.match(line):
+            md_lines.extend(["---", ""])
+            under_todo_header = False
+            i += 1
+            continue
+
+        fence = FENCE_RE.match(line)
+        if fence:
+            md_lines.append(line)
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(fence.group(1)):
+                md_lines.append(lines[i])
+                i += 1
+            if i < len(lines):
+                md_lines.append(lines[i])
+                i += 1
+            md_lines.append("")
+            continue
+
+        if stripped.startswith('>') or FOOTNOTE_RE.match(stripped) or stripped.startswith('<'):
+            md_lines.append(stripped)
+            i += 1
+            continue
+
+        if '|' in line and not is_heading(line, doc)[0]:
+            rows = []
+            while i < len(lines) and '|' in lines[i]:
+                rows.append(clean_table_line(lines[i]))
+                i += 1
+            if len(rows) > 1 and not TABLE_DIVIDER_RE.match(rows[1]):
+                columns = rows[0].count('|') - 1
+                rows.insert(1, '|' + '|'.join([' --- '] * columns) + '|')
+            md_lines.extend(rows)
+            md_lines.append("")
+            continue
+
+        if TODO_HEADER_RE.match(stripped):
+            md_lines.extend([f"### {re.sub(r'[:-]+$', '', stripped).strip().title()}", ""])
+            under_todo_header = True
+            i += 1
+            continue
+
+        checkbox = CHECKBOX_RE.match(line)
+        if checkbox:
+            md_lines.append(f"- [{checkbox.group(1).lower()}] {link_urls(checkbox.group(2).strip())}")
+            i += 1
+            continue
+
+        task, done = is_task(line, doc)
+        if task or under_todo_header:
+            body = (DONE_MARKER_RE if done else TODO_MARKER_RE).sub('', stripped) if task else stripped
+            body = link_urls(BULLET_RE.sub(r'\2', body).strip('- ').strip())
+            if body:
+                md_lines.append(f"- [{'x' if done else ' '}] {body}")
+            i += 1
+            continue
+
+        bullet = BULLET_RE.match(line)
+        if bullet:
+            number = bullet.group(1)
+            md_lines.append(f"{number + '.' if number else '-'} {link_urls(bullet.group(2).strip())}")
+            i += 1
+            continue
+
+        heading, level = is_heading(line, doc)
+        if heading:
+            heading_text = MD_HEADING_RE.sub(r'\2', stripped)
+            md_lines.extend([f"{'#' * level} {link_urls(_heading_text(heading_text))}", ""])
+            under_todo_header = False
+            i += 1
+            continue
+
+        md_lines.extend([link_urls(stripped), ""])
+        i += 1
+
+    markdown = re.sub(r'\n{3,}', '\n\n', '\n'.join(md_lines)).strip()
+    return markdown + '\n' if markdown else ''
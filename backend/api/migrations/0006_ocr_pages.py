@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrresult',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict, help_text='Extraction statistics'),
+        ),
+        migrations.CreateModel(
+            name='OCRPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('source', models.CharField(choices=[('text', 'Text layer'), ('ocr', 'OCR')], help_text='How the text was extracted', max_length=16)),
+                ('text', models.TextField(blank=True, default='')),
+                ('ocr_result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='api.ocrresult')),
+            ],
+            options={
+                'ordering': ['page_number'],
+                'unique_together': {('ocr_result', 'page_number')},
+            },
+        ),
+    ]
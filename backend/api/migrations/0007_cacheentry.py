@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_ocr_pages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(help_text='Kind of cached content', max_length=32)),
+                ('key', models.CharField(help_text='SHA-256 of the content and settings that produced it', max_length=64)),
+                ('value', models.TextField(blank=True, default='')),
+                ('meta', models.JSONField(blank=True, default=dict)),
+                ('size_bytes', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Cache entries',
+                'indexes': [models.Index(fields=['namespace', 'last_used_at'], name='api_cacheen_namespa_ab3905_idx')],
+                'unique_together': {('namespace', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_cacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrpage',
+            name='confidence',
+            field=models.FloatField(blank=True, help_text='Mean OCR recognition score', null=True),
+        ),
+        migrations.AddField(
+            model_name='ocrpage',
+            name='dpi',
+            field=models.PositiveIntegerField(blank=True, help_text='Highest DPI the page was rendered at for OCR', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_ocr_page_dpi_confidence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrpage',
+            name='lines',
+            field=models.BinaryField(blank=True, default=b'', help_text='OCR lines (boxes in PDF points or image pixels, scores, texts) packed by ocr_utils.pack_ocr_lines'),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ocr', 'OCR'), ('ocr_page', 'OCR (single page)'), ('summary', 'Summary')], max_length=32),
+        ),
+    ]
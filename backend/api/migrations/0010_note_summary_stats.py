@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_ocr_page_lines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notesummary',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict, help_text='Generation statistics'),
+        ),
+    ]
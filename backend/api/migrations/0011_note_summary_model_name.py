@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_note_summary_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notesummary',
+            name='model_name',
+            field=models.CharField(blank=True, default='', help_text='LLM_MODELS entry that generated the summary', max_length=100),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_note_summary_model_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotionPageSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workspace_id', models.CharField(blank=True, default='', help_text='Notion workspace of the page', max_length=255)),
+                ('parent_id', models.CharField(blank=True, default='', help_text='Parent page, empty for the workspace', max_length=255)),
+                ('page_id', models.CharField(max_length=255)),
+                ('page_url', models.URLField(blank=True, default='', max_length=500)),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('blocks', models.JSONField(blank=True, default=list, help_text='[block id, content hash, type] of each top-level block, in page order')),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+                ('note', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notion_sync', to='api.note')),
+            ],
+            options={
+                'verbose_name': 'Notion page sync',
+            },
+        ),
+    ]
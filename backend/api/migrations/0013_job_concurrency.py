@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_notion_page_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='concurrency_key',
+            field=models.CharField(blank=True, default='', help_text='Jobs sharing a key run at most concurrency_limit at a time', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='concurrency_limit',
+            field=models.PositiveIntegerField(default=0, help_text='0 for no limit'),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ocr', 'OCR'), ('ocr_page', 'OCR (single page)'), ('summary', 'Summary'), ('notion_export', 'Notion export')], max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['concurrency_key', 'status'], name='api_job_concurr_03d84d_idx'),
+        ),
+    ]
@@ -0,0 +1,142 @@
+"""
+Model warm-up and readiness utility functions.
+
+PaddleOCR and the LLaMA model are loaded lazily by `ocr_utils.get_ocr()` and
+`summary_utils.get_llm()`, so management commands and tests never pay for
+them. Inference processes can load them ahead of the first request, either
+at app-ready time (MODEL_WARMUP_ON_READY) or with `manage.py warmup_models`.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+
+WARMUP_DISABLED = 'disabled'
+WARMUP_RUNNING = 'running'
+WARMUP_DONE = 'done'
+WARMUP_FAILED = 'failed'
+
+_warmup_state = {
+    'status': WARMUP_DISABLED,
+    'error': '',
+    'seconds': None,
+}
+_warmup_lock = threading.Lock()
+
+
+def warm_up_models(ocr=True, llm=True):
+    """
+    Load the requested models in the current process.
+
+    Args:
+        ocr (bool): Load PaddleOCR (and start the OCR pool workers if enabled)
+        llm (bool): Load the LLaMA model (and spaCy, unless SUMMARY_ENGINE is 'llm')
+
+    Returns:
+        dict: Seconds spent loading each model
+    """
+    timings = {}
+
+    if ocr:
+        from .ocr_utils import get_ocr
+        from .ocr_pool import get_ocr_pool, warm_up_ocr_pool
+
+        start = time.monotonic()
+        pool = get_ocr_pool(settings.OCR_POOL_SIZE, settings.OCR_WORKER_THREADS)
+        if pool is not None:
+            warm_up_ocr_pool(pool, settings.OCR_POOL_SIZE)
+        else:
+            get_ocr()
+        timings['ocr'] = time.monotonic() - start
+
+    if llm:
+        from .summary_utils import get_llm, get_tokenizer, get_pool_stats
+
+        start = time.monotonic()
+        if settings.LLM_POOL_ADDRESS:
+            # Generation runs in the LLM pool; only token counting is local
+            get_tokenizer()
+            stats = get_pool_stats()
+            if 'error' in stats:
+                raise RuntimeError(f"LLM pool unavailable: {stats['error']}")
+        else:
+            get_llm()
+        timings['llm'] = time.monotonic() - start
+
+        if settings.SUMMARY_ENGINE != 'llm':
+            from .markdown_utils import get_nlp
+
+            start = time.monotonic()
+            get_nlp()
+            timings['spacy'] = time.monotonic() - start
+
+    return timings
+
+
+def _run_warmup(ocr, llm):
+    """Warm-up thread body that records the outcome for the readiness endpoint."""
+    start = time.monotonic()
+    try:
+        warm_up_models(ocr=ocr, llm=llm)
+    except Exception as e:
+        print(f"Model warm-up failed: {str(e)}")
+        with _warmup_lock:
+            _warmup_state.update(status=WARMUP_FAILED, error=str(e))
+        return
+
+    with _warmup_lock:
+        _warmup_state.update(status=WARMUP_DONE, seconds=round(time.monotonic() - start, 2))
+
+
+def start_background_warmup(ocr=True, llm=True):
+    """
+    Load models in a daemon thread so start-up is not blocked.
+
+    Args:
+        ocr (bool): Load PaddleOCR
+        llm (bool): Load the LLaMA model
+
+    Returns:
+        bool: False if a warm-up was already started in this process
+    """
+    with _warmup_lock:
+        if _warmup_state['status'] != WARMUP_DISABLED:
+            return False
+        _warmup_state['status'] = WARMUP_RUNNING
+
+    thread = threading.Thread(target=_run_warmup, args=(ocr, llm), name='model-warmup', daemon=True)
+    thread.start()
+    return True
+
+
+def get_model_status():
+    """
+    Report which models are loaded in this process.
+
+    The process counts as ready when no warm-up was requested, or when the
+    requested warm-up has finished.
+
+    Returns:
+        dict: Loaded flags per model, warm-up state, LLM queue metrics (of
+              this process and of the LLM pool, if used) and overall readiness
+    """
+    from .ocr_utils import is_ocr_loaded
+    from .summary_utils import is_llm_loaded, get_scheduler_stats, get_pool_stats
+    from .markdown_utils import is_nlp_loaded
+
+    with _warmup_lock:
+        warmup = dict(_warmup_state)
+
+    return {
+        'ready': warmup['status'] in (WARMUP_DISABLED, WARMUP_DONE),
+        'models': {
+            'ocr': is_ocr_loaded(),
+            'llm': is_llm_loaded(),
+            'spacy': is_nlp_loaded(),
+        },
+        'warmup': warmup,
+        'llm_scheduler': get_scheduler_stats(),
+        'llm_pool': get_pool_stats(),
+    }
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import os
 
 
@@ -45,16 +46,53 @@ class OCRResult(models.Model):
     """Model for storing OCR results of notes."""
     note = models.OneToOneField(Note, on_delete=models.CASCADE, related_name='ocr_result')
     extracted_text = models.TextField()
+    stats = models.JSONField(default=dict, blank=True, help_text='Extraction statistics')
     processed_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"OCR for {self.note.name}"
 
 
+class OCRPage(models.Model):
+    """Model for storing the extracted text of a single page of a note."""
+    SOURCE_TEXT = 'text'
+    SOURCE_OCR = 'ocr'
+    SOURCE_CHOICES = [
+        (SOURCE_TEXT, 'Text layer'),
+        (SOURCE_OCR, 'OCR'),
+    ]
+
+    ocr_result = models.ForeignKey(OCRResult, on_delete=models.CASCADE, related_name='pages')
+    page_number = models.PositiveIntegerField()
+    source = models.CharField(max_length=16, choices=SOURCE_CHOICES, help_text='How the text was extracted')
+    text = models.TextField(blank=True, default='')
+    dpi = models.PositiveIntegerField(null=True, blank=True, help_text='Highest DPI the page was rendered at for OCR')
+    confidence = models.FloatField(null=True, blank=True, help_text='Mean OCR recognition score')
+    lines = models.BinaryField(
+        blank=True,
+        default=b'',
+        help_text='OCR lines (boxes in PDF points or image pixels, scores, texts) packed by ocr_utils.pack_ocr_lines'
+    )
+
+    class Meta:
+        ordering = ['page_number']
+        unique_together = [('ocr_result', 'page_number')]
+
+    def __str__(self):
+        return f"Page {self.page_number} of {self.ocr_result.note.name}"
+    
+    def get_lines(self):
+        """Unpack the stored OCR lines into parallel 'texts', 'scores' and 'boxes' lists."""
+        from .ocr_utils import unpack_ocr_lines
+        return unpack_ocr_lines(self.lines)
+
+
 class NoteSummary(models.Model):
     """Model for storing AI-generated summaries of notes."""
     note = models.OneToOneField(Note, on_delete=models.CASCADE, related_name='summary')
     summary_text = models.TextField()
+    stats = models.JSONField(default=dict, blank=True, help_text='Generation statistics')
+    model_name = models.CharField(max_length=100, blank=True, default='', help_text='LLM_MODELS entry that generated the summary')
     generated_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -81,3 +119,102 @@ class NotionIntegration(models.Model):
     def is_valid(self):
         """Check if the integration is valid (has access token)."""
         return bool(self.access_token)
+
+
+class NotionPageSync(models.Model):
+    """Notion page a note was exported to, with the blocks last sent to it."""
+    note = models.OneToOneField(Note, on_delete=models.CASCADE, related_name='notion_sync')
+    workspace_id = models.CharField(max_length=255, blank=True, default='', help_text='Notion workspace of the page')
+    parent_id = models.CharField(max_length=255, blank=True, default='', help_text='Parent page, empty for the workspace')
+    page_id = models.CharField(max_length=255)
+    page_url = models.URLField(max_length=500, blank=True, default='')
+    title = models.CharField(max_length=255, blank=True, default='')
+    blocks = models.JSONField(default=list, blank=True, help_text='[block id, content hash, type] of each top-level block, in page order')
+    synced_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Notion page sync'
+    
+    def __str__(self):
+        return f"Notion page {self.page_id} for {self.note.name}"
+
+
+class Job(models.Model):
+    """Model for background jobs drained by the `run_worker` management command."""
+    KIND_OCR = 'ocr'
+    KIND_OCR_PAGE = 'ocr_page'
+    KIND_SUMMARY = 'summary'
+    KIND_NOTION_EXPORT = 'notion_export'
+    KIND_CHOICES = [
+        (KIND_OCR, 'OCR'),
+        (KIND_OCR_PAGE, 'OCR (single page)'),
+        (KIND_SUMMARY, 'Summary'),
+        (KIND_NOTION_EXPORT, 'Notion export'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True, help_text='Handler arguments')
+    result = models.JSONField(default=dict, blank=True, help_text='Handler output')
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    available_at = models.DateTimeField(default=timezone.now, help_text='Earliest time the job may be claimed')
+    lease_owner = models.CharField(max_length=255, blank=True, default='', help_text='Worker holding the lease')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    concurrency_key = models.CharField(max_length=255, blank=True, default='', help_text='Jobs sharing a key run at most concurrency_limit at a time')
+    concurrency_limit = models.PositiveIntegerField(default=0, help_text='0 for no limit')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['status', 'lease_expires_at']),
+            models.Index(fields=['concurrency_key', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+
+    def is_finished(self):
+        """Check if the job has reached a terminal state."""
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+
+class CacheEntry(models.Model):
+    """Model for content-addressed cache entries shared across all users."""
+    namespace = models.CharField(max_length=32, help_text='Kind of cached content')
+    key = models.CharField(max_length=64, help_text='SHA-256 of the content and settings that produced it')
+    value = models.TextField(blank=True, default='')
+    meta = models.JSONField(default=dict, blank=True)
+    size_bytes = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = [('namespace', 'key')]
+        indexes = [
+            models.Index(fields=['namespace', 'last_used_at']),
+        ]
+        verbose_name_plural = 'Cache entries'
+
+    def __str__(self):
+        return f"{self.namespace}:{self.key[:12]}"
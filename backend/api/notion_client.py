@@ -0,0 +1,547 @@
+"""
+Notion API client for exports.
+
+Notion accepts at most MAX_BLOCKS_PER_REQUEST blocks per request, both as the
+children of a new page and in each level of nested children, nests blocks at
+most MAX_NESTING_DEPTH levels deep in one request, and limits each
+integration to about three requests per second, answering 429 with a
+Retry-After header when it is exceeded. NotionClient creates a page with the
+first batch of blocks and appends the rest in limit-sized batches, throttles
+its requests with a token bucket shared by all clients of the same
+integration, waits out Retry-After and retries transient errors with
+exponential backoff. Requests go through one pooled requests.Session, so
+consecutive calls reuse their HTTPS connection.
+
+Re-exports edit the page in place: sync_page compares the content hashes of
+the blocks sent last time with the new blocks and only appends, updates and
+deletes the blocks that changed. It reads the page's block list first, so
+blocks left behind by an earlier sync that failed partway are replaced
+rather than duplicated.
+
+The base URL is a parameter, so the client can run against a local stand-in
+server. Like the llm_* modules, this module must not import Django models or
+settings.
+"""
+
+import difflib
+import hashlib
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+
+NOTION_VERSION = '2022-06-28'
+MAX_BLOCKS_PER_REQUEST = 100
+# Levels of children below a block sent in one request
+MAX_NESTING_DEPTH = 2
+
+# Statuses Notion documents as safe to retry
+RETRY_STATUSES = {409, 500, 502, 503, 504}
+
+# Block types whose content can be replaced with PATCH /blocks/{id}
+UPDATABLE_TYPES = {
+    'paragraph', 'heading_1', 'heading_2', 'heading_3', 'bulleted_list_item',
+    'numbered_list_item', 'to_do', 'quote', 'code', 'equation', 'callout', 'toggle',
+}
+
+
+class NotionAPIError(Exception):
+    """A Notion request failed for good."""
+
+    def __init__(self, message, status=None, code=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class TokenBucket:
+    """
+    Rate limiter allowing `rate` requests per second with bursts of `capacity`.
+
+    Thread-safe; pause() holds every caller back, which is how a Retry-After
+    answer to one request slows down all requests of the integration.
+
+    Args:
+        rate (float): Requests per second
+        capacity (float, optional): Burst size, defaults to rate (at least 1)
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, sleeping until one is available.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                delay = self._paused_until - now
+                if delay <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds` and empty the bucket."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value (str or None): Seconds, or an HTTP date
+
+    Returns:
+        float or None: Seconds to wait, None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def split_nested_children(block, depth=0):
+    """
+    Trim a block to the nested children Notion accepts in one request.
+
+    Each level keeps at most MAX_BLOCKS_PER_REQUEST children, and blocks
+    MAX_NESTING_DEPTH levels down are sent without their children.
+
+    Args:
+        block (dict): Notion block, possibly with children under its type key
+        depth (int): Levels between the block and the one sent in the request
+
+    Returns:
+        tuple: (block to send, list of (path, children) to append once it
+               exists, where path holds the child indices leading from the
+               block to the parent of those children)
+    """
+    content = block.get(block.get('type'))
+    children = content.get('children') if isinstance(content, dict) else None
+    if not children:
+        return block, []
+
+    trimmed = dict(block)
+    if depth >= MAX_NESTING_DEPTH:
+        trimmed[block['type']] = {key: value for key, value in content.items() if key != 'children'}
+        return trimmed, [((), children)]
+
+    kept = []
+    deferred = []
+    if len(children) > MAX_BLOCKS_PER_REQUEST:
+        deferred.append(((), children[MAX_BLOCKS_PER_REQUEST:]))
+    for index, child in enumerate(children[:MAX_BLOCKS_PER_REQUEST]):
+        child, rest = split_nested_children(child, depth + 1)
+        kept.append(child)
+        deferred.extend(((index,) + path, grandchildren) for path, grandchildren in rest)
+
+    if not deferred:
+        return block, []
+    trimmed[block['type']] = dict(content, children=kept)
+    return trimmed, deferred
+
+
+def block_hash(block):
+    """
+    Hash the content of a block, including its nested children.
+
+    Args:
+        block (dict): Notion block
+
+    Returns:
+        str: Hex digest, equal for blocks that render the same
+    """
+    content = {key: value for key, value in block.items() if key != 'object'}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _has_children(block):
+    content = block.get(block.get('type'))
+    return isinstance(content, dict) and bool(content.get('children'))
+
+
+def _can_update(old_entry, block):
+    """Whether an old block can be patched into `block` in place."""
+    return old_entry[2] == block['type'] and block['type'] in UPDATABLE_TYPES and not _has_children(block)
+
+
+def plan_block_sync(old_blocks, blocks):
+    """
+    Work out the block operations that turn the old page into the new one.
+
+    Runs of unchanged blocks are kept. In a changed run, an old block is
+    updated in place when the new block has the same updatable type and no
+    children; the other old blocks are deleted and the other new blocks are
+    inserted. Notion can only insert a block after another one, so when new
+    blocks would have to go before the first remaining block, that block is
+    updated into the first new block and inserted again after the others, or
+    the whole page is rewritten when the types differ.
+
+    Args:
+        old_blocks (list): [block id, content hash, type] of each block on the
+                           page, in order
+        blocks (list): New top-level blocks
+
+    Returns:
+        list: ('keep', old_index, new_index), ('update', old_index, new_index),
+              ('delete', old_index, None) and ('insert', None, new_index)
+              operations in page order
+    """
+    new_hashes = [block_hash(block) for block in blocks]
+    operations = []
+    matcher = difflib.SequenceMatcher(a=[entry[1] for entry in old_blocks], b=new_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            operations.extend(('keep', i, j) for i, j in zip(range(i1, i2), range(j1, j2)))
+            continue
+        replaced = list(range(i1, i2))
+        for j in range(j1, j2):
+            block = blocks[j]
+            if replaced and _can_update(old_blocks[replaced[0]], block):
+                operations.append(('update', replaced.pop(0), j))
+            else:
+                operations.append(('insert', None, j))
+        operations.extend(('delete', i, None) for i in replaced)
+
+    first = next((op for op, _, _ in operations if op != 'delete'), None)
+    top = next((k for k, (op, _, _) in enumerate(operations) if op in ('keep', 'update')), None)
+    if first == 'insert' and top is not None:
+        _, i, j = operations[top]
+        if _can_update(old_blocks[i], blocks[0]):
+            # The top remaining block becomes the first new block and is re-inserted after it
+            head = [operation for operation in operations[:top] if operation[0] == 'delete']
+            inserts = [('insert', None, k) for k in range(1, j + 1)]
+            operations = head + [('update', i, 0)] + inserts + operations[top + 1:]
+        else:
+            operations = (
+                [('delete', i, None) for i in range(len(old_blocks))] +
+                [('insert', None, j) for j in range(len(blocks))]
+            )
+    return operations
+
+
+class NotionClient:
+    """
+    Client for one Notion integration token.
+
+    Args:
+        access_token (str): Integration access token
+        base_url (str): API root, e.g. https://api.notion.com/v1
+        session (requests.Session, optional): Pooled session to send requests with
+        limiter (TokenBucket, optional): Rate limiter shared by the token's clients
+        max_retries (int): Retries of a request after 429s and transient errors
+        backoff (float): First retry delay in seconds, doubled on each retry
+        timeout (float): Seconds to wait for each response
+    """
+
+    def __init__(self, access_token, base_url, session=None, limiter=None,
+                 max_retries=5, backoff=0.5, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Notion-Version': NOTION_VERSION,
+            'Content-Type': 'application/json',
+        }
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'throttled_seconds': 0.0}
+
+    def _retry_delay(self, attempt):
+        """Exponential backoff with jitter."""
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def request(self, method, path, payload=None):
+        """
+        Send one API request, retrying 429s and transient failures.
+
+        Args:
+            method (str): HTTP method
+            path (str): Path below the base URL, e.g. 'pages'
+            payload (dict, optional): JSON body
+
+        Returns:
+            dict: Decoded response
+
+        Raises:
+            NotionAPIError: On an error response, or once the retries are used up
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                self.stats['throttled_seconds'] += self.limiter.acquire()
+            self.stats['requests'] += 1
+            last = attempt == self.max_retries
+
+            try:
+                response = self.session.request(method, url, headers=self.headers, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last:
+                    raise NotionAPIError(f"Notion request failed: {str(e)}")
+                self.stats['retries'] += 1
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if response.status_code == 429:
+                self.stats['rate_limited'] += 1
+                if last:
+                    break
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                delay = self._retry_delay(attempt) if delay is None else delay
+                self.stats['retries'] += 1
+                if self.limiter is not None:
+                    self.limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last:
+                self.stats['retries'] += 1
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if not response.ok:
+                break
+            return response.json()
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {'message': response.text}
+        raise NotionAPIError(
+            f"Notion API error {response.status_code}: {body.get('message', response.text)}",
+            status=response.status_code,
+            code=body.get('code'),
+        )
+
+    def append_blocks(self, block_id, blocks, after=None):
+        """
+        Append blocks to a page or block, MAX_BLOCKS_PER_REQUEST at a time.
+
+        Nested children over the limits of split_nested_children are
+        appended to their parent block once it has been created.
+
+        Args:
+            block_id (str): Page or block ID
+            blocks (list): Notion blocks
+            after (str, optional): Insert after this child block instead of at the end
+
+        Returns:
+            list: IDs of the created blocks, in order
+        """
+        created_ids = []
+        for start in range(0, len(blocks), MAX_BLOCKS_PER_REQUEST):
+            batch, overflow = [], []
+            for block in blocks[start:start + MAX_BLOCKS_PER_REQUEST]:
+                block, rest = split_nested_children(block)
+                batch.append(block)
+                overflow.append(rest)
+
+            payload = {'children': batch}
+            if after:
+                payload['after'] = after
+            # Notion answers with the blocks it created
+            created = self.request('PATCH', f'blocks/{block_id}/children', payload).get('results', [])
+            for block, rest in zip(created, overflow):
+                if rest:
+                    self._append_deferred(block['id'], rest)
+            created_ids.extend(block['id'] for block in created)
+            if after and created_ids:
+                after = created_ids[-1]
+        return created_ids
+
+    def _append_deferred(self, block_id, deferred):
+        """Append the children split_nested_children left out of a created block."""
+        # Notion only returns the IDs of the top-level blocks it created, so
+        # the nested ones are listed, once per parent
+        ids = {(): block_id}
+        for path, children in deferred:
+            for depth in range(len(path)):
+                parent = path[:depth]
+                if parent + (path[depth],) not in ids:
+                    for index, child in enumerate(self.list_children(ids[parent])):
+                        ids[parent + (index,)] = child['id']
+            self.append_blocks(ids[path], children)
+
+    def list_children(self, block_id, limit=None):
+        """
+        List the children of a page or block, MAX_BLOCKS_PER_REQUEST at a time.
+
+        Args:
+            block_id (str): Page or block ID
+            limit (int, optional): Stop after this many children
+
+        Returns:
+            list: Child blocks as returned by Notion, with their 'id', 'type'
+                  and 'has_children', in order
+        """
+        children = []
+        cursor = None
+        while limit is None or len(children) < limit:
+            page_size = MAX_BLOCKS_PER_REQUEST if limit is None else min(MAX_BLOCKS_PER_REQUEST, limit - len(children))
+            path = f'blocks/{block_id}/children?page_size={page_size}'
+            if cursor:
+                path += f'&start_cursor={cursor}'
+            response = self.request('GET', path)
+            children.extend(response.get('results', []))
+            cursor = response.get('next_cursor')
+            if not response.get('has_more') or not cursor:
+                break
+        return children
+
+    def update_block(self, block_id, block):
+        """Replace the content of an existing block."""
+        content = {key: value for key, value in block[block['type']].items() if key != 'children'}
+        return self.request('PATCH', f'blocks/{block_id}', {block['type']: content})
+
+    def delete_block(self, block_id):
+        """Move a block to the trash."""
+        return self.request('DELETE', f'blocks/{block_id}')
+
+    def rename_page(self, page_id, title):
+        """Change the title of a page."""
+        return self.request('PATCH', f'pages/{page_id}', {'properties': {'title': [{'text': {'content': title}}]}})
+
+    def sync_page(self, page_id, old_blocks, blocks):
+        """
+        Bring a page's blocks in line with `blocks`, sending only the changes.
+
+        The page's current blocks are listed first. Blocks missing from the
+        page are dropped from `old_blocks`, and blocks that are not in it,
+        such as the ones inserted by a sync that failed before it returned,
+        are planned as changed so they are reused or deleted.
+
+        Args:
+            page_id (str): Page created by create_page or a previous sync
+            old_blocks (list): [block id, content hash, type] of the page's
+                               top-level blocks, as returned last time
+            blocks (list): New top-level blocks
+
+        Returns:
+            tuple: (new [block id, content hash, type] list, counts of the
+                   'kept', 'updated', 'inserted' and 'deleted' blocks)
+        """
+        known = {entry[0]: entry for entry in old_blocks}
+        old_blocks = []
+        for child in self.list_children(page_id):
+            # No content hash matches a block that is not in old_blocks
+            entry = known.get(child['id'], [child['id'], '', child['type']])
+            if child.get('has_children'):
+                # Updating a block in place would leave its children behind
+                entry = [entry[0], entry[1], '']
+            old_blocks.append(entry)
+
+        counts = {'kept': 0, 'updated': 0, 'inserted': 0, 'deleted': 0}
+        synced = []
+        pending = []
+        # Block the next insertions go after; None appends to the end
+        anchor = None
+
+        def insert_pending():
+            nonlocal anchor
+            if pending:
+                ids = self.append_blocks(page_id, [blocks[j] for j in pending], after=anchor)
+                synced.extend([block_id, block_hash(blocks[j]), blocks[j]['type']] for block_id, j in zip(ids, pending))
+                counts['inserted'] += len(pending)
+                anchor = ids[-1] if ids else anchor
+                pending.clear()
+
+        for op, i, j in plan_block_sync(old_blocks, blocks):
+            if op == 'insert':
+                pending.append(j)
+            elif op == 'delete':
+                try:
+                    self.delete_block(old_blocks[i][0])
+                except NotionAPIError as e:
+                    # Already deleted in Notion
+                    if e.status != 404:
+                        raise
+                counts['deleted'] += 1
+            else:
+                insert_pending()
+                block_id = old_blocks[i][0]
+                if op == 'update':
+                    self.update_block(block_id, blocks[j])
+                    counts['updated'] += 1
+                else:
+                    counts['kept'] += 1
+                synced.append([block_id, block_hash(blocks[j]), blocks[j]['type']])
+                anchor = block_id
+        insert_pending()
+
+        return synced, counts
+
+    def create_page(self, title, blocks, parent_id=None, return_ids=False):
+        """
+        Create a page holding any number of blocks.
+
+        The page is created with the first batch of blocks, up to the first
+        block whose nested children are over the limits, and the remaining
+        blocks are appended in batches.
+
+        Args:
+            title (str): Page title
+            blocks (list): Notion blocks
+            parent_id (str, optional): Parent page ID, defaults to the workspace
+            return_ids (bool): Also return the IDs of the created top-level
+                               blocks; those of the first batch are listed
+                               with one more request
+
+        Returns:
+            dict: Created page, as returned by Notion, or a (page, block IDs)
+                  tuple with `return_ids`
+        """
+        first = []
+        for block in blocks[:MAX_BLOCKS_PER_REQUEST]:
+            if split_nested_children(block)[1]:
+                break
+            first.append(block)
+
+        payload = {
+            'properties': {'title': [{'text': {'content': title}}]},
+            'children': first,
+        }
+        if parent_id:
+            payload['parent'] = {'type': 'page_id', 'page_id': parent_id}
+        else:
+            payload['parent'] = {'type': 'workspace', 'workspace': True}
+
+        page = self.request('POST', 'pages', payload)
+        ids = []
+        if return_ids and first:
+            # Notion does not return the blocks a page is created with
+            ids = [child['id'] for child in self.list_children(page['id'], limit=len(first))]
+        if len(first) < len(blocks):
+            ids.extend(self.append_blocks(page['id'], blocks[len(first):]))
+        return (page, ids) if return_ids else page
@@ -0,0 +1,366 @@
+"""
+Markdown to Notion block conversion.
+
+A single pass over the lines of a Markdown document builds Notion blocks
+directly: headings, paragraphs, fenced code, `$$` math, quotes, tables,
+dividers, images, bulleted and numbered lists nested by indentation, and task
+lists. Inline text is split into rich text runs carrying bold, italic,
+strikethrough, code, link and equation annotations. The output follows the
+shape produced by @tryfabric/martian (notion-md/markdown_to_notion.js), so
+the two can be compared with `manage.py benchmark_notion_md`.
+
+Like notion_client, this module must not import Django models or settings.
+"""
+
+import re
+
+
+# Notion rejects text objects longer than this
+MAX_TEXT_LENGTH = 2000
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+FENCE_RE = re.compile(r'^(\s*)(`{3,}|~{3,})\s*([\w+#.-]*)')
+MATH_FENCE_RE = re.compile(r'^\s*\$\$(.*)$')
+DIVIDER_RE = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+LIST_RE = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+TASK_RE = re.compile(r'^\[([ xX])\]\s+(.*)$')
+QUOTE_RE = re.compile(r'^\s*>\s?(.*)$')
+IMAGE_RE = re.compile(r'^\s*!\[([^\]]*)\]\((\S+?)(?:\s+"[^"]*")?\)\s*$')
+TABLE_DIVIDER_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+
+INLINE_RE = re.compile(
+    r'(?P<code>`+)(?P<code_text>.+?)(?P=code)'
+    r'|\$(?P<equation>[^$\s](?:[^$\n]*?[^$\s])?)\$(?!\d)'
+    r'|!\[(?P<image_alt>[^\]]*)\]\((?P<image_url>[^)\s]+)[^)]*\)'
+    r'|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)(?:\s+"[^"]*")?\)'
+    r'|<(?P<autolink>https?://[^>\s]+)>'
+    r'|(?P<strong>\*\*|__)(?P<strong_text>.+?)(?P=strong)'
+    r'|~~(?P<strike_text>.+?)~~'
+    r'|(?<![^\W_])\*(?P<em_text>[^*\s](?:[^*]*[^*\s])?)\*(?![^\W_])'
+    r'|(?<!\w)_(?P<em2_text>[^_\s](?:[^_]*[^_\s])?)_(?!\w)'
+    r'|\\(?P<escaped>[\\`*_{}\[\]()#+\-.!|$~>])'
+)
+
+# Fence languages spelled differently in Notion
+CODE_LANGUAGES = {
+    'js': 'javascript', 'jsx': 'javascript', 'ts': 'typescript', 'tsx': 'typescript',
+    'py': 'python', 'rb': 'ruby', 'sh': 'shell', 'zsh': 'shell', 'console': 'shell',
+    'yml': 'yaml', 'md': 'markdown', 'cpp': 'c++', 'cs': 'c#', 'csharp': 'c#',
+    'kt': 'kotlin', 'rs': 'rust', 'golang': 'go', 'tex': 'latex', 'text': 'plain text',
+    'plaintext': 'plain text', 'txt': 'plain text', '': 'plain text',
+}
+
+NOTION_CODE_LANGUAGES = {
+    'abap', 'arduino', 'bash', 'basic', 'c', 'clojure', 'coffeescript', 'c++', 'c#', 'css',
+    'dart', 'diff', 'docker', 'elixir', 'elm', 'erlang', 'flow', 'fortran', 'f#', 'gherkin',
+    'glsl', 'go', 'graphql', 'groovy', 'haskell', 'html', 'java', 'javascript', 'json',
+    'julia', 'kotlin', 'latex', 'less', 'lisp', 'livescript', 'lua', 'makefile', 'markdown',
+    'markup', 'matlab', 'mermaid', 'nix', 'objective-c', 'ocaml', 'pascal', 'perl', 'php',
+    'plain text', 'powershell', 'prolog', 'protobuf', 'python', 'r', 'reason', 'ruby', 'rust',
+    'sass', 'scala', 'scheme', 'scss', 'shell', 'sql', 'swift', 'typescript', 'vb.net',
+    'verilog', 'vhdl', 'visual basic', 'webassembly', 'xml', 'yaml',
+}
+
+
+def _annotations(bold=False, italic=False, strikethrough=False, code=False):
+    return {
+        'bold': bold,
+        'strikethrough': strikethrough,
+        'underline': False,
+        'italic': italic,
+        'code': code,
+        'color': 'default',
+    }
+
+
+def _text(content, annotations, url=None):
+    """Text rich text objects for content, split at MAX_TEXT_LENGTH."""
+    items = []
+    for start in range(0, max(len(content), 1), MAX_TEXT_LENGTH):
+        text = {'content': content[start:start + MAX_TEXT_LENGTH]}
+        if url:
+            text['link'] = {'type': 'url', 'url': url}
+        items.append({'type': 'text', 'annotations': dict(annotations), 'text': text})
+    return items
+
+
+def _parse_inline(text, annotations, url, out):
+    """Append the rich text runs of `text` to `out`, nesting annotations."""
+    position = 0
+    for match in INLINE_RE.finditer(text):
+        if match.start() > position:
+            out.append((text[position:match.start()], annotations, url))
+        position = match.end()
+        groups = match.groupdict()
+
+        if groups['code'] is not None:
+            code_text = groups['code_text']
+            if len(code_text) > 1 and code_text[0] == code_text[-1] == ' ':
+                code_text = code_text[1:-1]
+            out.append((code_text, dict(annotations, code=True), url))
+        elif groups['equation'] is not None:
+            out.append((None, dict(annotations), groups['equation']))
+        elif groups['image_url'] is not None:
+            out.append((groups['image_alt'] or groups['image_url'], annotations, groups['image_url']))
+        elif groups['link_url'] is not None:
+            _parse_inline(groups['link_text'], annotations, groups['link_url'], out)
+        elif groups['autolink'] is not None:
+            out.append((groups['autolink'], annotations, groups['autolink']))
+        elif groups['strong_text'] is not None:
+            _parse_inline(groups['strong_text'], dict(annotations, bold=True), url, out)
+        elif groups['strike_text'] is not None:
+            _parse_inline(groups['strike_text'], dict(annotations, strikethrough=True), url, out)
+        elif groups['em_text'] is not None or groups['em2_text'] is not None:
+            _parse_inline(groups['em_text'] or groups['em2_text'], dict(annotations, italic=True), url, out)
+        else:
+            out.append((groups['escaped'], annotations, url))
+
+    if position < len(text):
+        out.append((text[position:], annotations, url))
+
+
+def to_rich_text(text):
+    """
+    Convert inline Markdown to Notion rich text.
+
+    Args:
+        text (str): Inline Markdown
+
+    Returns:
+        list: Rich text objects; adjacent runs with the same annotations
+              and link are merged
+    """
+    runs = []
+    _parse_inline(text, _annotations(), None, runs)
+
+    merged = []
+    for content, annotations, target in runs:
+        if content is None:
+            merged.append([None, annotations, target])
+        elif merged and merged[-1][0] is not None and merged[-1][1] == annotations and merged[-1][2] == target:
+            merged[-1][0] += content
+        elif content:
+            merged.append([content, annotations, target])
+
+    rich_text = []
+    for content, annotations, target in merged:
+        if content is None:
+            rich_text.append({'type': 'equation', 'annotations': annotations, 'equation': {'expression': target}})
+        else:
+            rich_text.extend(_text(content, annotations, target))
+    return rich_text or _text('', _annotations())
+
+
+def _block(block_type, **content):
+    return {'object': 'block', 'type': block_type, block_type: content}
+
+
+def _code_language(language):
+    language = language.lower()
+    language = CODE_LANGUAGES.get(language, language)
+    return language if language in NOTION_CODE_LANGUAGES else 'plain text'
+
+
+def _split_row(line):
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    return [cell.strip().replace('\\|', '|') for cell in re.split(r'(?<!\\)\|', line)]
+
+
+def _table(rows):
+    width = max(len(row) for row in rows)
+    return _block(
+        'table',
+        table_width=width,
+        has_column_header=True,
+        has_row_header=False,
+        children=[
+            _block('table_row', cells=[to_rich_text(cell) for cell in row + [''] * (width - len(row))])
+            for row in rows
+        ],
+    )
+
+
+def _is_block_start(line, next_line):
+    """Whether a line opens a block other than a paragraph continuation."""
+    return bool(
+        HEADING_RE.match(line) or FENCE_RE.match(line) or MATH_FENCE_RE.match(line)
+        or DIVIDER_RE.match(line) or LIST_RE.match(line) or QUOTE_RE.match(line)
+        or IMAGE_RE.match(line)
+        or ('|' in line and next_line is not None and TABLE_DIVIDER_RE.match(next_line))
+    )
+
+
+def markdown_to_blocks(markdown):
+    """
+    Convert a Markdown document to Notion blocks in one pass over its lines.
+
+    Args:
+        markdown (str): Markdown text
+
+    Returns:
+        list: Notion blocks; nested list items are in their parent's children
+    """
+    lines = (markdown or '').replace('\r\n', '\n').split('\n')
+    blocks = []
+    # Open list items as (indent, block), innermost last
+    list_stack = []
+    i = 0
+
+    def add(block, indent=None):
+        """Attach a block to the open list item it is indented under, or the page."""
+        while list_stack and (indent is None or list_stack[-1][0] >= indent):
+            list_stack.pop()
+        if list_stack:
+            parent = list_stack[-1][1]
+            parent[parent['type']].setdefault('children', []).append(block)
+        else:
+            blocks.append(block)
+
+    while i < len(lines):
+        line = lines[i]
+        next_line = lines[i + 1] if i + 1 < len(lines) else None
+        indent = len(line) - len(line.lstrip())
+        nested = indent if list_stack and indent > list_stack[0][0] else None
+
+        if not line.strip():
+            i += 1
+            continue
+
+        fence = FENCE_RE.match(line)
+        if fence:
+            marker = fence.group(2)
+            body = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(marker):
+                body.append(lines[i][len(fence.group(1)):] if lines[i].startswith(fence.group(1)) else lines[i])
+                i += 1
+            i += 1
+            while body and not body[-1].strip():
+                body.pop()
+            add(_block(
+                'code',
+                rich_text=_text('\n'.join(body), _annotations()),
+                language=_code_language(fence.group(3)),
+            ), nested)
+            continue
+
+        math = MATH_FENCE_RE.match(line)
+        if math:
+            rest = math.group(1)
+            if rest.rstrip().endswith('$$'):
+                expression = rest.rstrip()[:-2]
+                i += 1
+            else:
+                body = [rest]
+                i += 1
+                while i < len(lines) and '$$' not in lines[i]:
+                    body.append(lines[i])
+                    i += 1
+                if i < len(lines):
+                    body.append(lines[i][:lines[i].index('$$')])
+                    i += 1
+                expression = '\n'.join(body)
+            add(_block('equation', expression=expression.strip()), nested)
+            continue
+
+        heading = HEADING_RE.match(line)
+        if heading:
+            level = min(len(heading.group(1)), 3)
+            add(_block(f'heading_{level}', rich_text=to_rich_text(heading.group(2))))
+            i += 1
+            continue
+
+        if DIVIDER_RE.match(line):
+            add(_block('divider'))
+            i += 1
+            continue
+
+        image = IMAGE_RE.match(line)
+        if image:
+            content = {'type': 'external', 'external': {'url': image.group(2)}}
+            if image.group(1):
+                content['caption'] = to_rich_text(image.group(1))
+            add(_block('image', **content), nested)
+            i += 1
+            continue
+
+        if '|' in line and next_line is not None and TABLE_DIVIDER_RE.match(next_line):
+            rows = [_split_row(line)]
+            i += 2
+            while i < len(lines) and '|' in lines[i] and lines[i].strip():
+                rows.append(_split_row(lines[i]))
+                i += 1
+            add(_table(rows), nested)
+            continue
+
+        if QUOTE_RE.match(line):
+            quoted = []
+            while i < len(lines) and QUOTE_RE.match(lines[i]):
+                quoted.append(QUOTE_RE.match(lines[i]).group(1))
+                i += 1
+            add(_block('quote', rich_text=to_rich_text('\n'.join(quoted))), nested)
+            continue
+
+        item = LIST_RE.match(line)
+        if item:
+            marker, text = item.group(2), item.group(3)
+            task = TASK_RE.match(text) if not marker[0].isdigit() else None
+            if task:
+                block = _block('to_do', rich_text=to_rich_text(task.group(2)), checked=task.group(1) != ' ')
+            elif marker[0].isdigit():
+                block = _block('numbered_list_item', rich_text=to_rich_text(text))
+            else:
+                block = _block('bulleted_list_item', rich_text=to_rich_text(text))
+            add(block, indent)
+            list_stack.append((indent, block))
+            i += 1
+            continue
+
+        # Paragraph: consecutive lines until a blank line or another block
+        paragraph = [line.strip()]
+        i += 1
+        while i < len(lines) and lines[i].strip():
+            following = lines[i + 1] if i + 1 < len(lines) else None
+            if _is_block_start(lines[i], following):
+                break
+            paragraph.append(lines[i].strip())
+            i += 1
+        add(_block('paragraph', rich_text=to_rich_text('\n'.join(paragraph))), nested)
+
+    return blocks
+
+
+def block_outline(blocks):
+    """
+    Summarize blocks as (type, plain text, depth) tuples, for comparisons.
+
+    Args:
+        blocks (list): Notion blocks
+
+    Returns:
+        list: One tuple per block and nested block, in document order
+    """
+    outline = []
+
+    def visit(items, depth):
+        for block in items:
+            content = block.get(block['type'], {})
+            rich_text = content.get('rich_text') or []
+            if block['type'] == 'equation':
+                text = content.get('expression', '')
+            elif block['type'] == 'table_row':
+                text = ' | '.join(''.join(item.get('plain_text') or item.get('text', {}).get('content', '') for item in cell) for cell in content.get('cells', []))
+            else:
+                text = ''.join(
+                    item['equation']['expression'] if item['type'] == 'equation' else item['text']['content']
+                    for item in rich_text
+                )
+            outline.append((block['type'], text, depth))
+            visit(content.get('children') or [], depth + 1)
+
+    visit(blocks, 0)
+    return outline
@@ -4,9 +4,31 @@ Notion OAuth2 and API utility functions.
 
 import requests
 import json
-import re
+import threading
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
 from django.conf import settings
-from .models import NotionIntegration
+from .models import NoteSummary, NotionIntegration, NotionPageSync
+from .cache_utils import make_cache_key, cache_get, cache_set
+from .notion_client import NotionAPIError, NotionClient, TokenBucket, block_hash
+from .notion_markdown import markdown_to_blocks
+from .summary_utils import is_failed_summary, process_note_summary
+
+
+# Connections kept open to the Notion API per process
+NOTION_POOL_SIZE = 10
+# Rate limiters kept per process; the least recently used one is dropped first
+NOTION_MAX_LIMITERS = 256
+
+NOTION_BLOCKS_CACHE = 'notion-blocks'
+# Bump when notion_markdown output changes, to drop cached conversions
+NOTION_BLOCKS_VERSION = '1'
+
+_session = None
+# Rate limiter of each access token, by token hash, shared by all exports of
+# the integration; least recently used first
+_limiters = OrderedDict()
+_client_lock = threading.Lock()
 
 
 def get_notion_authorization_url():
@@ -56,31 +78,69 @@ def exchange_code_for_token(code):
         raise Exception(f"Failed to exchange code for token: {response.text}")
 
 
-def get_notion_workspace_info(access_token):
+def get_notion_session():
     """
-    Get workspace information from Notion.
+    Get the pooled HTTP session used for Notion API requests.
+    
+    Returns:
+        requests.Session: Session shared by all Notion clients of the process
+    """
+    global _session
+    with _client_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount('https://', HTTPAdapter(pool_maxsize=NOTION_POOL_SIZE))
+            _session.mount('http://', HTTPAdapter(pool_maxsize=NOTION_POOL_SIZE))
+        return _session
+
+
+def get_notion_client(access_token):
+    """
+    Build a Notion API client for an integration.
+    
+    Clients of the same access token share one rate limiter, so concurrent
+    exports of a user stay under NOTION_RATE_LIMIT together. Limiters are
+    keyed by a hash of the token and at most NOTION_MAX_LIMITERS are kept.
     
     Args:
         access_token (str): Notion access token
         
     Returns:
-        dict: Workspace information
+        NotionClient: Client using the pooled session
     """
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Notion-Version': '2022-06-28',
-        'Content-Type': 'application/json'
-    }
+    session = get_notion_session()
+    key = make_cache_key(access_token)
+    with _client_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = TokenBucket(settings.NOTION_RATE_LIMIT)
+            while len(_limiters) > NOTION_MAX_LIMITERS:
+                _limiters.popitem(last=False)
+        _limiters.move_to_end(key)
     
-    response = requests.get(
-        f"{settings.NOTION_API_BASE_URL}/users/me",
-        headers=headers
+    return NotionClient(
+        access_token,
+        settings.NOTION_API_BASE_URL,
+        session=session,
+        limiter=limiter,
+        max_retries=settings.NOTION_MAX_RETRIES,
     )
+
+
+def get_notion_workspace_info(access_token):
+    """
+    Get workspace information from Notion.
     
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(f"Failed to get workspace info: {response.text}")
+    Args:
+        access_token (str): Notion access token
+        
+    Returns:
+        dict: Workspace information
+    """
+    try:
+        return get_notion_client(access_token).request('GET', 'users/me')
+    except Exception as e:
+        raise Exception(f"Failed to get workspace info: {str(e)}")
 
 
 def markdown_to_notion_blocks(markdown_text):
@@ -91,91 +151,35 @@ def markdown_to_notion_blocks(markdown_text):
         markdown_text (str): Markdown text to convert
         
     Returns:
-        list: List of Notion blocks
+        list: List of Notion blocks, as built by notion_markdown.markdown_to_blocks
+    """
+    return markdown_to_blocks(markdown_text)
+
+
+def get_summary_blocks(summary):
     """
-    blocks = []
-    lines = markdown_text.split('\n')
+    Get the Notion blocks of a summary, converting its Markdown on a cache miss.
     
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Handle headings
-        if line.startswith('#'):
-            level = len(line) - len(line.lstrip('#'))
-            if level > 3:
-                level = 3  # Notion supports up to 3 heading levels
-            
-            text = line.lstrip('#').strip()
-            blocks.append({
-                "object": "block",
-                "type": f"heading_{level}",
-                f"heading_{level}": {
-                    "rich_text": [{"type": "text", "text": {"content": text}}]
-                }
-            })
-        
-        # Handle bullet points
-        elif line.startswith('- ') or line.startswith('* '):
-            text = line[2:].strip()
-            blocks.append({
-                "object": "block",
-                "type": "bulleted_list_item",
-                "bulleted_list_item": {
-                    "rich_text": [{"type": "text", "text": {"content": text}}]
-                }
-            })
-        
-        # Handle numbered lists
-        elif re.match(r'^\d+\.\s', line):
-            text = re.sub(r'^\d+\.\s', '', line).strip()
-            blocks.append({
-                "object": "block",
-                "type": "numbered_list_item",
-                "numbered_list_item": {
-                    "rich_text": [{"type": "text", "text": {"content": text}}]
-                }
-            })
-        
-        # Handle code blocks
-        elif line.startswith('```'):
-            # Simple code block handling
-            blocks.append({
-                "object": "block",
-                "type": "code",
-                "code": {
-                    "rich_text": [{"type": "text", "text": {"content": line[3:]}}],
-                    "language": "plain text"
-                }
-            })
-        
-        # Handle bold text
-        elif '**' in line:
-            # Simple bold text handling
-            text = line.replace('**', '').strip()
-            blocks.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": text},
-                        "annotations": {"bold": True}
-                    }]
-                }
-            })
+    Conversions are cached by content, so re-exports and bulk exports of
+    unchanged summaries skip the conversion.
+    
+    Args:
+        summary (NoteSummary): Summary to convert
         
-        # Default to paragraph
-        else:
-            blocks.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"type": "text", "text": {"content": line}}]
-                }
-            })
+    Returns:
+        list: List of Notion blocks
+    """
+    key = make_cache_key(NOTION_BLOCKS_VERSION, summary.summary_text)
+    entry = cache_get(NOTION_BLOCKS_CACHE, key)
+    if entry is not None:
+        return json.loads(entry.value)
     
+    blocks = markdown_to_notion_blocks(summary.summary_text)
+    cache_set(
+        NOTION_BLOCKS_CACHE, key, json.dumps(blocks, ensure_ascii=False),
+        max_bytes=settings.NOTION_BLOCKS_CACHE_MAX_BYTES,
+        max_age_seconds=settings.SUMMARY_CACHE_MAX_AGE_DAYS * 86400,
+    )
     return blocks
 
 
@@ -296,6 +300,9 @@ def create_notion_page(access_token, title, blocks, parent_id=None):
     """
     Create a new page in Notion.
     
+    The page is created with the first MAX_BLOCKS_PER_REQUEST blocks and
+    the rest are appended in batches, so summaries of any length fit.
+    
     Args:
         access_token (str): Notion access token
         title (str): Page title
@@ -308,35 +315,132 @@ def create_notion_page(access_token, title, blocks, parent_id=None):
     # Validate and fix blocks before sending to Notion
     fixed_blocks = validate_and_fix_notion_blocks(blocks)
     
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Notion-Version': '2022-06-28',
-        'Content-Type': 'application/json'
-    }
+    try:
+        return get_notion_client(access_token).create_page(title, fixed_blocks, parent_id=parent_id)
+    except Exception as e:
+        raise Exception(f"Failed to create Notion page: {str(e)}")
+
+
+def _is_page_gone(error):
+    """Whether a sync failed because the page was deleted or unshared in Notion."""
+    return error.status == 404 or (error.status == 400 and 'archived' in str(error))
+
+
+def export_note_to_notion(note, integration, title, blocks, parent_id=None, new_page=False):
+    """
+    Export blocks to the note's Notion page, creating it on the first export.
     
-    payload = {
-        "properties": {
-            "title": [{"text": {"content": title}}]
-        },
-        "children": fixed_blocks
-    }
+    A note exported before to the same workspace and parent is synced in
+    place: only the blocks whose content hash changed since the last export
+    are updated, inserted or deleted, and blocks left on the page by a sync
+    that failed partway are replaced. A new page is created on the first
+    export, when `new_page` is set, when the workspace or parent changed, or
+    when the old page was deleted in Notion.
     
-    # Set parent
-    if parent_id:
-        payload["parent"] = {"type": "page_id", "page_id": parent_id}
-    else:
-        payload["parent"] = {"type": "workspace", "workspace": True}
+    Args:
+        note: Note model instance
+        integration (NotionIntegration): The user's connected integration
+        title (str): Page title
+        blocks (list): Notion blocks
+        parent_id (str, optional): Parent page ID, defaults to the workspace
+        new_page (bool): Create a new page even if the note was exported before
+        
+    Returns:
+        dict: 'page_id', 'page_url', whether the page was 'created', block
+              counts ('kept', 'updated', 'inserted', 'deleted') and the
+              number of API 'requests'
+    """
+    fixed_blocks = validate_and_fix_notion_blocks(blocks)
+    client = get_notion_client(integration.access_token)
+    workspace_id = integration.workspace_id or ''
+    sync = NotionPageSync.objects.filter(note=note).first()
     
-    response = requests.post(
-        f"{settings.NOTION_API_BASE_URL}/pages",
-        headers=headers,
-        json=payload
+    result = None
+    if sync and not new_page and sync.workspace_id == workspace_id and sync.parent_id == (parent_id or ''):
+        try:
+            if sync.title != title:
+                client.rename_page(sync.page_id, title)
+            entries, counts = client.sync_page(sync.page_id, sync.blocks, fixed_blocks)
+            result = {'page_id': sync.page_id, 'page_url': sync.page_url, 'created': False}
+        except NotionAPIError as e:
+            if not _is_page_gone(e):
+                raise
+            print(f"Notion page {sync.page_id} of note {note.id} is gone, creating a new one: {str(e)}")
+    
+    if result is None:
+        page, ids = client.create_page(title, fixed_blocks, parent_id=parent_id, return_ids=True)
+        entries = [[block_id, block_hash(block), block['type']] for block_id, block in zip(ids, fixed_blocks)]
+        counts = {'kept': 0, 'updated': 0, 'inserted': len(entries), 'deleted': 0}
+        result = {'page_id': page['id'], 'page_url': page.get('url', ''), 'created': True}
+    
+    NotionPageSync.objects.update_or_create(note=note, defaults={
+        'workspace_id': workspace_id,
+        'parent_id': parent_id or '',
+        'page_id': result['page_id'],
+        'page_url': result['page_url'] or '',
+        'title': title,
+        'blocks': entries,
+    })
+    
+    result.update(counts, requests=client.stats['requests'])
+    return result
+
+
+def export_note_summary(note, parent_id=None, new_page=False, blocks=None):
+    """
+    Export a note's summary to its owner's Notion workspace.
+    
+    The note's summary is generated first if it has none, reusing a cached
+    summary of the same text, and its converted blocks come from the blocks
+    cache.
+    
+    Args:
+        note: Note model instance
+        parent_id (str, optional): Parent page ID, defaults to the workspace
+        new_page (bool): Create a new page even if the note was exported before
+        blocks (list, optional): Notion blocks to send instead of the summary's
+        
+    Returns:
+        dict: Export result, as returned by export_note_to_notion
+        
+    Raises:
+        ValueError: If the note's owner has not connected Notion, or the
+                    note's summary is the placeholder of a failed generation
+    """
+    integration = get_user_notion_integration(note.user)
+    if not integration.is_valid():
+        raise ValueError('Notion integration not connected. Please connect your Notion account first.')
+    
+    if not blocks:
+        try:
+            summary = note.summary
+        except NoteSummary.DoesNotExist:
+            summary = process_note_summary(note, raise_errors=True)
+        if is_failed_summary(summary):
+            raise ValueError(f"The summary of note {note.id} failed to generate; regenerate it before exporting.")
+        blocks = get_summary_blocks(summary)
+    
+    return export_note_to_notion(
+        note,
+        integration,
+        title=note.name,
+        blocks=blocks,
+        parent_id=parent_id,
+        new_page=new_page
     )
+
+
+def get_export_concurrency_key(integration):
+    """
+    Get the job concurrency key shared by the Notion exports of a workspace.
     
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(f"Failed to create Notion page: {response.text}")
+    Args:
+        integration (NotionIntegration): Connected integration
+        
+    Returns:
+        str: Key for enqueue_job
+    """
+    return f"notion:{integration.workspace_id or f'user-{integration.user_id}'}"
 
 
 def get_user_notion_integration(user):
@@ -0,0 +1,171 @@
+"""
+Process pool of warm PaddleOCR workers.
+
+Each worker process builds its own PaddleOCR instance once, in the pool
+initializer, and then serves page images for the lifetime of the pool.
+Workers are started with the `spawn` method and never run `django.setup()`,
+so this module must not import Django models or settings.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Shared by the in-process engine in ocr_utils and by the pool workers
+PADDLEOCR_OPTIONS = {
+    'use_doc_orientation_classify': False,
+    'use_doc_unwarping': False,
+    'use_textline_orientation': False,
+}
+
+_worker_ocr = None
+
+_pool = None
+_pool_config = None
+_pool_lock = threading.Lock()
+
+
+def extract_ocr_lines(result):
+    """
+    Collect the recognized lines of a PaddleOCR prediction.
+
+    Args:
+        result: Return value of PaddleOCR.predict
+
+    Returns:
+        dict: Parallel lists 'texts', 'scores' and 'boxes' ([x1, y1, x2, y2]
+              in pixels of the input image)
+    """
+    lines = {'texts': [], 'scores': [], 'boxes': []}
+    for res in result:
+        lines['texts'].extend(str(text) for text in res['rec_texts'])
+        lines['scores'].extend(float(score) for score in res['rec_scores'])
+        lines['boxes'].extend([int(v) for v in box] for box in res['rec_boxes'])
+    return lines
+
+
+def join_line_texts(lines):
+    """
+    Join recognized lines into one string.
+
+    Args:
+        lines (dict): Lines as returned by extract_ocr_lines
+
+    Returns:
+        str: Recognized text, lines separated by spaces
+    """
+    return " ".join(lines['texts']).strip()
+
+
+def join_ocr_text(result):
+    """
+    Join the recognized lines of a PaddleOCR prediction into one string.
+
+    Args:
+        result: Return value of PaddleOCR.predict
+
+    Returns:
+        str: Recognized text, lines separated by spaces
+    """
+    return join_line_texts(extract_ocr_lines(result))
+
+
+def _init_worker(threads):
+    """Pool initializer: pin the thread budget and load PaddleOCR once."""
+    global _worker_ocr
+
+    # Must be set before paddle is imported to take effect
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+
+    from paddleocr import PaddleOCR
+    _worker_ocr = PaddleOCR(cpu_threads=threads, **PADDLEOCR_OPTIONS)
+
+
+def _ocr_image_array(image_array):
+    """Run OCR on one page image inside a worker process."""
+    return extract_ocr_lines(_worker_ocr.predict(image_array))
+
+
+def get_ocr_pool(size, threads):
+    """
+    Get the shared OCR process pool, creating it on first use.
+
+    Args:
+        size (int): Number of worker processes; 0 or 1 disables the pool
+        threads (int): CPU threads each worker's PaddleOCR may use
+
+    Returns:
+        ProcessPoolExecutor or None: The pool, or None if pooling is disabled
+    """
+    global _pool, _pool_config
+
+    if size <= 1:
+        return None
+
+    with _pool_lock:
+        if _pool is not None and _pool_config != (size, threads):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=size,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+            _pool_config = (size, threads)
+
+        return _pool
+
+
+def _worker_pid():
+    """Trivial task used to force worker start-up."""
+    return os.getpid()
+
+
+def warm_up_ocr_pool(pool, size):
+    """
+    Start every worker of the pool so their PaddleOCR instances are loaded.
+
+    Args:
+        pool (ProcessPoolExecutor): Pool from get_ocr_pool
+        size (int): Number of workers in the pool
+
+    Returns:
+        int: Number of distinct worker processes that answered
+    """
+    futures = [pool.submit(_worker_pid) for _ in range(size * 2)]
+    return len({future.result() for future in futures})
+
+
+def reset_ocr_pool():
+    """Shut down the shared pool so the next call to get_ocr_pool starts a fresh one."""
+    global _pool, _pool_config
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_config = None
+
+
+def submit_ocr_image(pool, image_array):
+    """
+    Queue one page image for OCR in the pool.
+
+    Args:
+        pool (ProcessPoolExecutor): Pool from get_ocr_pool
+        image_array (numpy.ndarray): Page image
+
+    Returns:
+        Future: Resolves to the recognized lines of the page (see extract_ocr_lines)
+    """
+    return pool.submit(_ocr_image_array, image_array)
+
+
+atexit.register(reset_ocr_pool)
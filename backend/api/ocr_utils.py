@@ -6,60 +6,731 @@ This is a dummy implementation for demonstration purposes.
 from PIL import Image
 import os
 import fitz  # PyMuPDF
-from pdf2image import convert_from_path
-from .models import OCRResult
-from paddleocr import PaddleOCR  
+from django.db import transaction
+from .models import OCRResult, OCRPage, Job
+from .job_utils import enqueue_job
 import numpy as np
-import pdfplumber
-
-# Initialize PaddleOCR
-ocr = PaddleOCR(
-    use_doc_orientation_classify=False, 
-    use_doc_unwarping=False, 
-    use_textline_orientation=False,
+from collections import deque
+import base64
+import hashlib
+import struct
+import threading
+import zlib
+import math
+from importlib import metadata
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from .cache_utils import make_cache_key, file_sha256, cache_get, cache_set, cache_delete
+from .ocr_pool import (
+    PADDLEOCR_OPTIONS,
+    extract_ocr_lines,
+    join_line_texts,
+    join_ocr_text,
+    get_ocr_pool,
+    reset_ocr_pool,
+    submit_ocr_image,
 )
 
+# In-process PaddleOCR, loaded on first use by get_ocr()
+_ocr = None
+_ocr_lock = threading.Lock()
+
+OCR_FILE_CACHE = 'ocr-file'
+OCR_PAGE_CACHE = 'ocr-page'
+
+def get_ocr():
+    """
+    Get the in-process PaddleOCR instance, loading it on first use.
+    
+    Returns:
+        PaddleOCR: The loaded OCR engine
+    """
+    global _ocr
+    if _ocr is None:
+        with _ocr_lock:
+            if _ocr is None:
+                from paddleocr import PaddleOCR
+                _ocr = PaddleOCR(**PADDLEOCR_OPTIONS)
+    return _ocr
+
+
+def is_ocr_loaded():
+    """Check whether PaddleOCR has been loaded in this process."""
+    return _ocr is not None
+
+
 def extract_text_using_paddleocr(image):
-    result = ocr.predict(np.array(image))
+    result = get_ocr().predict(np.asarray(image))
+    return join_ocr_text(result)
 
-    final_result = ""
-    for res in result:
-        for text in res['rec_texts']:
-            final_result += f"{text} "
 
-    return final_result.strip()
+def ocr_image_lines(image):
+    """
+    Run in-process OCR on one image and keep line boxes and confidences.
+    
+    Args:
+        image: NumPy array or PIL image
+        
+    Returns:
+        dict: Lines as returned by ocr_pool.extract_ocr_lines
+    """
+    return extract_ocr_lines(get_ocr().predict(np.asarray(image)))
 
 
-def extract_text_from_pdf(file_path):
+def render_page_image(page, dpi, clip=None):
+    """
+    Rasterize a PDF page (or part of it) into an RGB NumPy array.
+    
+    Args:
+        page (fitz.Page): The PDF page
+        dpi (int): Rendering resolution
+        clip (fitz.Rect, optional): Area of the page to render, in points
+        
+    Returns:
+        numpy.ndarray: Image of shape (height, width, 3), dtype uint8
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False, clip=clip)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+
+def iter_pdf_page_images(file_path, dpi=100, page_indices=None):
     """
-    Extract text from a PDF file using OCR.
-    First tries to extract text directly, then falls back to OCR if needed.
+    Render the pages of a PDF one at a time.
+    
+    Each page is rasterized by PyMuPDF straight into an RGB NumPy array, so
+    only the pages currently being processed are held in memory and the
+    first page is available before the rest of the document is rendered.
     
     Args:
         file_path (str): Path to the PDF file
+        dpi (int): Rendering resolution
+        page_indices (list, optional): Zero-based pages to render, defaults to all
+        
+    Yields:
+        numpy.ndarray: Page image of shape (height, width, 3), dtype uint8
+    """
+    with fitz.open(file_path) as doc:
+        if page_indices is None:
+            page_indices = range(doc.page_count)
+        for index in page_indices:
+            yield render_page_image(doc[index], dpi)
+
+
+def ocr_page_images(images):
+    """
+    Run OCR on a stream of page images, in parallel when the pool is enabled.
+    
+    Pages are spread across the OCR process pool (OCR_POOL_SIZE workers) and
+    the results come back in page order. At most two pages per worker are in
+    flight, so memory stays flat for long documents. If the pool is disabled
+    or breaks, pages are processed in-process one after another.
+    
+    Args:
+        images (iterable): Page images (NumPy arrays or PIL images)
+        
+    Yields:
+        dict: Recognized lines of each page, in order (see ocr_image_lines)
+    """
+    images = iter(images)
+    pool = get_ocr_pool(settings.OCR_POOL_SIZE, settings.OCR_WORKER_THREADS)
+    if pool is not None:
+        max_pending = settings.OCR_POOL_SIZE * 2
+        # Images stay queued with their future until their text is yielded,
+        # so they can be redone in-process if the pool breaks
+        pending = deque()
+        try:
+            for image in images:
+                pending.append((image, None))
+                pending[-1] = (image, submit_ocr_image(pool, np.asarray(image)))
+                if len(pending) >= max_pending:
+                    yield pending[0][1].result()
+                    pending.popleft()
+            while pending:
+                yield pending[0][1].result()
+                pending.popleft()
+            return
+        except BrokenProcessPool as e:
+            print(f"OCR pool failed, falling back to in-process OCR: {str(e)}")
+            reset_ocr_pool()
+            for image, _ in pending:
+                yield ocr_image_lines(image)
+    
+    for image in images:
+        yield ocr_image_lines(image)
+
+
+OCR_LINES_MAGIC = b'OCL1'
+
+
+def pack_ocr_lines(lines):
+    """
+    Pack OCR lines into a compact binary blob.
+    
+    Layout (little-endian, zlib-compressed): magic, line count (uint32),
+    boxes (float32, count x 4), scores (float32), text byte lengths (uint32),
+    then the UTF-8 texts back to back.
+    
+    Args:
+        lines (dict): Parallel lists 'texts', 'scores' and 'boxes'
         
     Returns:
-        str: Extracted text from the PDF
+        bytes: Packed lines
+    """
+    texts = [text.encode('utf-8') for text in lines['texts']]
+    count = len(texts)
+    boxes = np.asarray(lines['boxes'], dtype='<f4').reshape(count, 4)
+    scores = np.asarray(lines['scores'], dtype='<f4')
+    lengths = np.fromiter((len(text) for text in texts), dtype='<u4', count=count)
+    
+    return zlib.compress(
+        struct.pack('<4sI', OCR_LINES_MAGIC, count)
+        + boxes.tobytes() + scores.tobytes() + lengths.tobytes() + b''.join(texts)
+    )
+
+
+def unpack_ocr_lines(blob):
+    """
+    Unpack a blob produced by pack_ocr_lines.
+    
+    Args:
+        blob (bytes): Packed lines (empty for pages without OCR lines)
+        
+    Returns:
+        dict: Parallel lists 'texts', 'scores' and 'boxes'
+    """
+    if not blob:
+        return {'texts': [], 'scores': [], 'boxes': []}
+    
+    data = zlib.decompress(bytes(blob))
+    magic, count = struct.unpack_from('<4sI', data)
+    if magic != OCR_LINES_MAGIC:
+        raise ValueError("Unknown OCR lines format")
+    
+    offset = struct.calcsize('<4sI')
+    boxes = np.frombuffer(data, dtype='<f4', count=count * 4, offset=offset).reshape(count, 4)
+    offset += boxes.nbytes
+    scores = np.frombuffer(data, dtype='<f4', count=count, offset=offset)
+    offset += scores.nbytes
+    lengths = np.frombuffer(data, dtype='<u4', count=count, offset=offset)
+    offset += lengths.nbytes
+    
+    texts = []
+    for length in lengths.tolist():
+        texts.append(data[offset:offset + length].decode('utf-8'))
+        offset += length
+    
+    return {'texts': texts, 'scores': scores.tolist(), 'boxes': boxes.tolist()}
+
+
+def page_to_cache_meta(page):
+    """Make a page dict JSON-serializable for the cache (packed lines as base64)."""
+    meta = dict(page)
+    meta['lines'] = base64.b64encode(meta.get('lines') or b'').decode('ascii')
+    return meta
+
+
+def page_from_cache_meta(meta):
+    """Reverse page_to_cache_meta."""
+    page = dict(meta)
+    page['lines'] = base64.b64decode(page.get('lines') or '')
+    return page
+
+
+def preprocess_page_image(image):
+    """
+    Prepare a page image for OCR with NumPy only.
+    
+    Near-blank pages (pixel standard deviation below OCR_BLANK_STD_THRESHOLD,
+    or nothing differing from the background by more than
+    OCR_MARGIN_TOLERANCE) are skipped. Otherwise uniform margins are cropped,
+    keeping OCR_MARGIN_PADDING pixels around the content, and images whose
+    longest side exceeds OCR_MAX_IMAGE_SIDE are downscaled by an integer
+    factor with block averaging.
+    
+    Args:
+        image: RGB NumPy array or PIL image
+        
+    Returns:
+        tuple: (image, prep) where image is the array to OCR, or None for a
+               blank page, and prep holds 'blank', 'pixels_in', 'pixels_out'
+               and the 'offset' and 'scale' needed by restore_line_boxes
+    """
+    image = np.atleast_3d(np.asarray(image))
+    height, width = image.shape[:2]
+    prep = {
+        'blank': False,
+        'pixels_in': height * width,
+        'pixels_out': height * width,
+        'offset': [0, 0],
+        'scale': 1.0,
+    }
+    if not settings.OCR_PREPROCESS or not height or not width:
+        return image, prep
+    
+    # Darkest channel, so colored ink on white paper counts as content
+    # (np.minimum over channel planes is much faster than min(axis=2))
+    gray = image[..., 0]
+    for channel in range(1, image.shape[2]):
+        gray = np.minimum(gray, image[..., channel])
+    
+    if gray.std(dtype=np.float32) < settings.OCR_BLANK_STD_THRESHOLD:
+        prep.update(blank=True, pixels_out=0)
+        return None, prep
+    
+    border = np.concatenate([gray[0], gray[-1], gray[:, 0], gray[:, -1]])
+    content = np.abs(gray.astype(np.int16) - int(np.median(border))) > settings.OCR_MARGIN_TOLERANCE
+    rows = np.flatnonzero(content.any(axis=1))
+    cols = np.flatnonzero(content.any(axis=0))
+    if not rows.size:
+        prep.update(blank=True, pixels_out=0)
+        return None, prep
+    
+    pad = settings.OCR_MARGIN_PADDING
+    top, bottom = max(rows[0] - pad, 0), min(rows[-1] + pad + 1, height)
+    left, right = max(cols[0] - pad, 0), min(cols[-1] + pad + 1, width)
+    image = image[top:bottom, left:right]
+    prep['offset'] = [int(left), int(top)]
+    
+    factor = math.ceil(max(image.shape[:2]) / settings.OCR_MAX_IMAGE_SIDE)
+    if factor > 1:
+        h = image.shape[0] // factor * factor
+        w = image.shape[1] // factor * factor
+        blocks = image[:h, :w].reshape(h // factor, factor, w // factor, factor, image.shape[2])
+        image = (blocks.sum(axis=(1, 3), dtype=np.uint32) // (factor * factor)).astype(np.uint8)
+        prep['scale'] = 1 / factor
+    
+    prep['pixels_out'] = image.shape[0] * image.shape[1]
+    return np.ascontiguousarray(image), prep
+
+
+def restore_line_boxes(lines, prep):
+    """
+    Map line boxes found on a pre-processed image back to the original image.
+    
+    Args:
+        lines (dict): Lines recognized on the image from preprocess_page_image
+        prep (dict): Its pre-processing record
+        
+    Returns:
+        dict: The same lines, with boxes in pixels of the original image
+    """
+    (left, top), scale = prep['offset'], prep['scale']
+    if (left, top, scale) != (0, 0, 1.0):
+        lines['boxes'] = [
+            [x1 / scale + left, y1 / scale + top, x2 / scale + left, y2 / scale + top]
+            for x1, y1, x2, y2 in lines['boxes']
+        ]
+    return lines
+
+
+def get_prep_stats(prep):
+    """Per-page pre-processing fields stored with the page."""
+    return {key: prep[key] for key in ('blank', 'pixels_in', 'pixels_out')}
+
+
+def mean_confidence(lines):
+    """
+    Average the recognition scores of OCR lines.
+    
+    Args:
+        lines (dict): Lines as returned by ocr_image_lines
+        
+    Returns:
+        float or None: Mean score, or None when no line was recognized
+    """
+    if not lines['scores']:
+        return None
+    return float(np.mean(lines['scores']))
+
+
+def refine_page_lines(page, lines, base_dpi):
+    """
+    Re-OCR the weak parts of a page at the higher steps of OCR_DPI_STEPS.
+    
+    Lines scoring below OCR_CONFIDENCE_THRESHOLD are re-rendered on their own
+    at the next DPI step and re-OCR'd; the new reading replaces the old one
+    when it scores higher. When more than OCR_PAGE_RERENDER_FRACTION of the
+    lines are weak, or nothing was recognized, the whole page is re-rendered
+    instead. Steps continue until no weak line is left.
+    
+    Args:
+        page (fitz.Page): The PDF page
+        lines (dict): Lines recognized at base_dpi
+        base_dpi (int): DPI the page was first rendered at
+        
+    Returns:
+        tuple: (lines, info) where the line boxes are converted to PDF
+               points, and info holds the highest 'dpi' rendered, whether
+               the page was 'rerendered' and how many 'lines_refined' were
+               replaced
+    """
+    threshold = settings.OCR_CONFIDENCE_THRESHOLD
+    info = {'dpi': base_dpi, 'rerendered': False, 'lines_refined': 0}
+    # DPI that the line boxes are expressed in
+    lines_dpi = base_dpi
+    
+    for dpi in [step for step in settings.OCR_DPI_STEPS if step > base_dpi]:
+        weak = [i for i, score in enumerate(lines['scores']) if score < threshold]
+        if lines['texts'] and not weak:
+            break
+        
+        info['dpi'] = dpi
+        
+        if not lines['texts'] or len(weak) / len(lines['texts']) > settings.OCR_PAGE_RERENDER_FRACTION:
+            candidate = next(ocr_page_images([render_page_image(page, dpi)]))
+            if (mean_confidence(candidate) or 0) > (mean_confidence(lines) or 0):
+                lines = candidate
+                lines_dpi = dpi
+                info['rerendered'] = True
+            continue
+        
+        # Boxes are in pixels of the rendering at lines_dpi; the rendered
+        # pixmap is rotated with the page, so map back to unrotated points
+        scale = 72 / lines_dpi
+        clips = []
+        for i in weak:
+            x1, y1, x2, y2 = lines['boxes'][i]
+            rect = fitz.Rect(x1 - 2, y1 - 2, x2 + 2, y2 + 2) * scale * page.derotation_matrix
+            clips.append(render_page_image(page, dpi, clip=rect & page.rect))
+        
+        for i, clip_lines in zip(weak, ocr_page_images(clips)):
+            score = mean_confidence(clip_lines)
+            if score is not None and score > lines['scores'][i]:
+                lines['texts'][i] = join_line_texts(clip_lines)
+                lines['scores'][i] = score
+                info['lines_refined'] += 1
+    
+    scale = 72 / lines_dpi
+    lines['boxes'] = [[v * scale for v in box] for box in lines['boxes']]
+    return lines, info
+
+
+def finish_ocr_page(page, lines, base_dpi):
+    """
+    Refine the first OCR pass of a PDF page and build its stored fields.
+    
+    Args:
+        page (fitz.Page): The PDF page
+        lines (dict): Lines recognized at base_dpi
+        base_dpi (int): DPI the page was first rendered at
+        
+    Returns:
+        dict: 'text', packed 'lines', 'dpi', 'confidence', 'rerendered'
+              and 'lines_refined'
+    """
+    lines, info = refine_page_lines(page, lines, base_dpi)
+    info['confidence'] = mean_confidence(lines)
+    info['text'] = join_line_texts(lines)
+    info['lines'] = pack_ocr_lines(lines)
+    return info
+
+
+def get_ocr_engine_tag():
+    """
+    Identify the OCR engine and everything that changes its output for a page image.
+    
+    Returns:
+        str: Tag included in every OCR cache key
     """
     try:
-        extracted_text = ""
-        with open(file_path, "rb") as f:
-            with pdfplumber.open(f) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        extracted_text += text + " \n"
+        engine_version = metadata.version('paddleocr')
+    except metadata.PackageNotFoundError:
+        engine_version = 'unknown'
+    
+    return make_cache_key('paddleocr', engine_version, PADDLEOCR_OPTIONS, settings.OCR_CACHE_VERSION)
+
+
+def get_page_ocr_tag():
+    """
+    Identify the OCR engine plus the settings of the DPI cascade and pre-processing.
+    
+    Returns:
+        str: Tag included in page-level OCR cache keys
+    """
+    return make_cache_key(
+        get_ocr_engine_tag(),
+        settings.OCR_DPI_STEPS,
+        settings.OCR_CONFIDENCE_THRESHOLD,
+        settings.OCR_PAGE_RERENDER_FRACTION,
+        settings.OCR_PREPROCESS,
+        settings.OCR_MARGIN_TOLERANCE,
+        settings.OCR_MARGIN_PADDING,
+        settings.OCR_MAX_IMAGE_SIDE,
+    )
+
+
+def get_ocr_settings_tag():
+    """
+    Identify the OCR engine plus the document-level extraction settings.
+    
+    Returns:
+        str: Tag included in file-level OCR cache keys
+    """
+    return make_cache_key(
+        get_page_ocr_tag(),
+        settings.OCR_TEXT_LAYER_MIN_CHARS,
+        settings.OCR_TEXT_LAYER_RICH_CHARS,
+        settings.OCR_IMAGE_COVERAGE_THRESHOLD,
+    )
+
+
+def get_page_cache_key(image, engine_tag):
+    """
+    Build the cache key of a rendered page image.
+    
+    Args:
+        image (numpy.ndarray): Rendered page
+        engine_tag (str): Tag from get_page_ocr_tag
         
-        # If we got meaningful text, return it
-        if extracted_text.strip() and len(extracted_text.strip()) > 10:
-            return extracted_text.strip()
+    Returns:
+        str: Cache key
+    """
+    image = np.ascontiguousarray(image)
+    pixels_hash = hashlib.sha256(memoryview(image).cast('B')).hexdigest()
+    return make_cache_key(engine_tag, image.shape, pixels_hash)
+
+
+def store_ocr_cache(namespace, key, text, meta=None):
+    """Store an OCR result in the cache, applying the OCR cache limits."""
+    cache_set(
+        namespace, key, text, meta=meta,
+        max_bytes=settings.OCR_CACHE_MAX_BYTES,
+        max_age_seconds=settings.OCR_CACHE_MAX_AGE_DAYS * 86400,
+    )
+
+
+def page_needs_ocr(page, text):
+    """
+    Decide whether a PDF page must be OCR'd or can use its text layer.
+    
+    A page goes to OCR when its text layer is (almost) empty, or when images
+    cover most of the page and the text layer only holds a little text, as
+    with a scanned handwriting page that carries a typed caption.
+    
+    Args:
+        page (fitz.Page): The PDF page
+        text (str): Text extracted from the page's text layer
         
-        # If no text was extracted or very little text, use OCR
-        return extract_text_from_pdf_ocr(file_path)
+    Returns:
+        bool: True if the page should be OCR'd
+    """
+    char_count = len(text.strip())
+    if char_count < settings.OCR_TEXT_LAYER_MIN_CHARS:
+        return True
+    
+    if char_count >= settings.OCR_TEXT_LAYER_RICH_CHARS:
+        return False
+    
+    page_area = abs(page.rect)
+    if not page_area:
+        return False
+    
+    image_area = 0
+    for info in page.get_image_info():
+        image_area += abs(fitz.Rect(info['bbox']) & page.rect)
+    
+    return image_area / page_area >= settings.OCR_IMAGE_COVERAGE_THRESHOLD
+
+
+def iter_pages_from_pdf(file_path, use_cache=True):
+    """
+    Extract text from a PDF page by page, yielding each page as soon as it is ready.
+    
+    Pages with a usable text layer keep that text; only image-only or
+    mostly-image pages are rendered, pre-processed by preprocess_page_image
+    (blank pages are skipped) and sent to OCR, first at the lowest step of
+    OCR_DPI_STEPS and then refined by refine_page_lines. Rendered pages
+    whose pixels were already OCR'd with the same settings reuse the cached
+    result. Pages are yielded in page order, so a page is held back
+    only until the OCR of the pages before it has finished.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        use_cache (bool): Look up rendered pages in the page cache
+        
+    Yields:
+        dict: One dict per page with 'page' (1-based), 'source'
+              (OCRPage.SOURCE_TEXT or OCRPage.SOURCE_OCR), 'text', packed
+              'lines', and for OCR'd pages the highest 'dpi' rendered, mean
+              'confidence', 'rerendered', 'lines_refined' and the
+              pre-processing 'blank', 'pixels_in' and 'pixels_out'; pages
+              served from the cache also carry 'cached': True
+    """
+    pages = []
+    with fitz.open(file_path) as doc:
+        for page in doc:
+            text = page.get_text().strip()
+            source = OCRPage.SOURCE_OCR if page_needs_ocr(page, text) else OCRPage.SOURCE_TEXT
+            pages.append({
+                'page': page.number + 1,
+                'source': source,
+                'text': text if source == OCRPage.SOURCE_TEXT else '',
+                'lines': b'',
+                'dpi': None,
+                'confidence': None,
+            })
+    
+    ocr_indices = [i for i, page in enumerate(pages) if page['source'] == OCRPage.SOURCE_OCR]
+    # Index of the next page to yield, and the OCR'd pages that are finished
+    next_index = 0
+    done = set()
+    
+    def ready_pages():
+        nonlocal next_index
+        while next_index < len(pages) and (
+            pages[next_index]['source'] == OCRPage.SOURCE_TEXT or next_index in done
+        ):
+            next_index += 1
+            yield pages[next_index - 1]
+    
+    yield from ready_pages()
+    if not ocr_indices:
+        return
+    
+    base_dpi = settings.OCR_DPI_STEPS[0]
+    page_tag = get_page_ocr_tag()
+    # (page index, cache key, pre-processing) of each image handed to OCR,
+    # in submission order
+    misses = []
+    
+    def uncached_images():
+        images = iter_pdf_page_images(file_path, dpi=base_dpi, page_indices=ocr_indices)
+        for index, image in zip(ocr_indices, images):
+            prepared, prep = preprocess_page_image(image)
+            if prepared is None:
+                pages[index].update(get_prep_stats(prep))
+                done.add(index)
+                continue
+            
+            key = get_page_cache_key(image, page_tag)
+            entry = cache_get(OCR_PAGE_CACHE, key) if use_cache else None
+            if entry is not None:
+                pages[index].update(page_from_cache_meta(entry.meta), text=entry.value, cached=True)
+                done.add(index)
+                continue
+            misses.append((index, key, prep))
+            yield prepared
+    
+    with fitz.open(file_path) as doc:
+        for i, lines in enumerate(ocr_page_images(uncached_images())):
+            index, key, prep = misses[i]
+            info = finish_ocr_page(doc[index], restore_line_boxes(lines, prep), base_dpi)
+            info.update(get_prep_stats(prep))
+            pages[index].update(info)
+            store_ocr_cache(OCR_PAGE_CACHE, key, info.pop('text'), meta=page_to_cache_meta(info))
+            done.add(index)
+            yield from ready_pages()
+    
+    yield from ready_pages()
+
+
+def extract_pages_from_pdf(file_path, use_cache=True):
+    """
+    Extract text from a PDF page by page.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        use_cache (bool): Look up rendered pages in the page cache
+        
+    Returns:
+        list: Page dicts as yielded by iter_pages_from_pdf
+    """
+    return list(iter_pages_from_pdf(file_path, use_cache=use_cache))
+
+
+def format_pages_text(pages):
+    """
+    Join extracted pages into one text with a marker before each page.
+    
+    Args:
+        pages (list): Page dicts as returned by extract_pages_from_pdf
+        
+    Returns:
+        str: Combined text, skipping empty pages
+    """
+    labels = {OCRPage.SOURCE_TEXT: 'Text', OCRPage.SOURCE_OCR: 'OCR'}
+    
+    extracted_text = ""
+    for page in pages:
+        if page['text'].strip():
+            extracted_text += f"\n--- Page {page['page']} ({labels[page['source']]}) ---\n"
+            extracted_text += page['text']
+    
+    return extracted_text.strip()
+
+
+def format_pages_lines(ocr_result):
+    """
+    Join the pages of an OCR result like format_pages_text, one OCR line per line.
+    
+    The stored text of an OCR page joins its recognized lines with spaces;
+    keeping them apart lets the summary input drop running headers, page
+    numbers and hyphenated line breaks.
+    
+    Args:
+        ocr_result: OCRResult model instance
+        
+    Returns:
+        str: Combined text, or the stored text if the result has no pages
+    """
+    pages = []
+    for page in ocr_result.pages.all():
+        text = page.text
+        if page.source == OCRPage.SOURCE_OCR and page.lines:
+            texts = [line.strip() for line in unpack_ocr_lines(page.lines)['texts'] if line.strip()]
+            text = '\n'.join(texts) or text
+        pages.append({'page': page.page_number, 'source': page.source, 'text': text})
+    
+    return format_pages_text(pages) if pages else ocr_result.extracted_text
+
+
+def get_pages_stats(pages):
+    """
+    Count pages by extraction path.
+    
+    Args:
+        pages (list): Page dicts as returned by extract_pages_from_pdf
+        
+    Returns:
+        dict: Statistics about the extraction
+    """
+    confidences = [page['confidence'] for page in pages if page.get('confidence') is not None]
+    
+    return {
+        'pages': len(pages),
+        'pages_text': sum(1 for page in pages if page['source'] == OCRPage.SOURCE_TEXT),
+        'pages_ocr': sum(1 for page in pages if page['source'] == OCRPage.SOURCE_OCR),
+        'pages_cached': sum(1 for page in pages if page.get('cached')),
+        'pages_rerendered': sum(1 for page in pages if page.get('rerendered')),
+        'lines_refined': sum(page.get('lines_refined', 0) for page in pages),
+        'mean_confidence': float(np.mean(confidences)) if confidences else None,
+        'pages_blank': sum(1 for page in pages if page.get('blank')),
+        # Pixels not sent to OCR thanks to pre-processing (cached pages were not OCR'd at all)
+        'pixels_saved': sum(
+            page['pixels_in'] - page['pixels_out']
+            for page in pages if 'pixels_in' in page and not page.get('cached')
+        ),
+    }
+
+
+def extract_text_from_pdf(file_path):
+    """
+    Extract text from a PDF file.
+    Each page uses its text layer when it has enough content and falls back
+    to OCR otherwise.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        
+    Returns:
+        str: Extracted text from the PDF
+    """
+    try:
+        return format_pages_text(extract_pages_from_pdf(file_path))
     
     except Exception as e:
         print(f"Error extracting text from PDF {file_path}: {str(e)}")
-        # Fallback to OCR if direct extraction fails
+        # Fallback to OCR for every page if per-page extraction fails
         try:
             return extract_text_from_pdf_ocr(file_path)
         except Exception as ocr_error:
@@ -68,7 +739,7 @@ def extract_text_from_pdf(file_path):
 
 def extract_text_from_pdf_ocr(file_path):
     """
-    Extract text from PDF using OCR by converting pages to images.
+    Extract text from PDF using OCR by rendering pages to images one at a time.
     
     Args:
         file_path (str): Path to the PDF file
@@ -77,16 +748,25 @@ def extract_text_from_pdf_ocr(file_path):
         str: OCR extracted text from the PDF
     """
     try:
-        # Convert PDF pages to images
-        images = convert_from_path(file_path, dpi=100)
+        # Render PDF pages lazily; OCR starts as soon as the first page is ready
+        images = iter_pdf_page_images(file_path, dpi=settings.OCR_DPI_STEPS[0])
+        # Page numbers of the images handed to OCR; blank pages are skipped
+        numbers = []
+        
+        def prepared_images():
+            for number, image in enumerate(images, start=1):
+                prepared, _ = preprocess_page_image(image)
+                if prepared is not None:
+                    numbers.append(number)
+                    yield prepared
         
         extracted_text = ""
         
-        for i, image in enumerate(images):
-            # Perform OCR on each page
-            page_text = extract_text_using_paddleocr(image)
+        # Perform OCR on each page
+        for i, lines in enumerate(ocr_page_images(prepared_images())):
+            page_text = join_line_texts(lines)
             if page_text.strip():
-                extracted_text += f"\n--- Page {i + 1} (OCR) ---\n"
+                extracted_text += f"\n--- Page {numbers[i]} (OCR) ---\n"
                 extracted_text += page_text
         
         return extracted_text.strip()
@@ -95,6 +775,33 @@ def extract_text_from_pdf_ocr(file_path):
         raise Exception(f"OCR processing failed: {str(e)}")
 
 
+def extract_pages_from_image(file_path):
+    """
+    Extract text from an image file using OCR.
+    
+    Args:
+        file_path (str): Path to the image file
+        
+    Returns:
+        list: A single page dict, as returned by extract_pages_from_pdf
+    """
+    prepared, prep = preprocess_page_image(Image.open(file_path).convert('RGB'))
+    if prepared is None:
+        lines = {'texts': [], 'scores': [], 'boxes': []}
+    else:
+        lines = restore_line_boxes(ocr_image_lines(prepared), prep)
+    
+    return [dict(
+        get_prep_stats(prep),
+        page=1,
+        source=OCRPage.SOURCE_OCR,
+        text=join_line_texts(lines),
+        lines=pack_ocr_lines(lines),
+        dpi=None,
+        confidence=mean_confidence(lines),
+    )]
+
+
 def extract_text_from_image(file_path):
     """
     Extract text from an image file using OCR.
@@ -107,88 +814,256 @@ def extract_text_from_image(file_path):
         str: Extracted text from the image
     """
     try:
-        # Open the image
-        image = Image.open(file_path)
-        
-        # Perform OCR using tesseract
-        extracted_text = extract_text_using_paddleocr(image)
-        
-        return extracted_text.strip()
+        return extract_pages_from_image(file_path)[0]['text']
     
     except Exception as e:
         print(f"Error extracting text from {file_path}: {str(e)}")
         return f"Error processing file: {str(e)}"
 
 
-def process_note_ocr(note):
+def save_ocr_result(note, extracted_text, pages, stats=None):
     """
-    Process OCR for a note and save the result.
+    Create or update the OCR result of a note, replacing its pages.
     
     Args:
         note: Note model instance
+        extracted_text (str): Combined text of the note
+        pages (list): Page dicts as returned by extract_pages_from_pdf
+        stats (dict, optional): Extraction statistics
         
     Returns:
-        OCRResult: The created OCR result object
+        OCRResult: The saved OCR result object
     """
-    try:
-        # Get the file path
-        file_path = note.file.path
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        # Determine file type and extract text accordingly
-        file_extension = os.path.splitext(file_path)[1].lower()
-        
-        if file_extension == '.pdf':
-            extracted_text = extract_text_from_pdf(file_path)
-        elif file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.gif']:
-            extracted_text = extract_text_from_image(file_path)
-        else:
-            extracted_text = f"Unsupported file type: {file_extension}"
-        
-        # Create or update OCR result
+    with transaction.atomic():
         ocr_result, created = OCRResult.objects.get_or_create(
             note=note,
-            defaults={'extracted_text': extracted_text}
+            defaults={'extracted_text': extracted_text, 'stats': stats or {}}
         )
         
         if not created:
             ocr_result.extracted_text = extracted_text
+            ocr_result.stats = stats or {}
             ocr_result.save()
+            ocr_result.pages.all().delete()
+        
+        OCRPage.objects.bulk_create([
+            OCRPage(
+                ocr_result=ocr_result,
+                page_number=page['page'],
+                source=page['source'],
+                text=page['text'],
+                lines=page.get('lines') or b'',
+                dpi=page.get('dpi'),
+                confidence=page.get('confidence')
+            )
+            for page in pages
+        ])
+    
+    return ocr_result
+
+
+def iter_note_ocr(note, force=False):
+    """
+    Process OCR for a note, yielding each page as soon as it is extracted.
+    
+    Identical files (by SHA-256) processed with the same OCR settings reuse
+    the cached result, whoever uploaded them. The OCR result is saved once
+    every page has been extracted.
+    
+    Args:
+        note: Note model instance
+        force (bool): Bypass the OCR caches and recompute every page
         
-        return ocr_result
+    Yields:
+        tuple: ('page', page dict) for every page in order, then
+               ('result', OCRResult) once the result is saved
+    """
+    # Get the file path
+    file_path = note.file.path
+    
+    # Check if file exists
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+    
+    # Determine file type and extract text accordingly
+    file_extension = os.path.splitext(file_path)[1].lower()
+    
+    if file_extension not in get_supported_file_extensions():
+        yield 'result', save_ocr_result(note, f"Unsupported file type: {file_extension}", [])
+        return
+    
+    cache_key = make_cache_key(file_sha256(file_path), get_ocr_settings_tag())
+    entry = None if force else cache_get(OCR_FILE_CACHE, cache_key)
+    
+    if entry is not None:
+        pages = [page_from_cache_meta(page) for page in entry.meta['pages']]
+        for page in pages:
+            yield 'page', page
+        stats = dict(entry.meta['stats'], file_cached=True)
+        yield 'result', save_ocr_result(note, entry.value, pages, stats=stats)
+        return
+    
+    if file_extension == '.pdf':
+        page_iter = iter_pages_from_pdf(file_path, use_cache=not force)
+    else:
+        page_iter = iter(extract_pages_from_image(file_path))
+    
+    pages = []
+    for page in page_iter:
+        pages.append(page)
+        yield 'page', page
+    
+    extracted_text = format_pages_text(pages)
+    stats = get_pages_stats(pages)
+    store_ocr_cache(OCR_FILE_CACHE, cache_key, extracted_text, meta={
+        'pages': [page_to_cache_meta(page) for page in pages],
+        'stats': stats,
+    })
+    
+    # Create or update OCR result
+    yield 'result', save_ocr_result(note, extracted_text, pages, stats=stats)
+
+
+def save_ocr_fallback(note, error):
+    """
+    Store an error message as the note's OCR result, unless it already has one.
+    
+    Args:
+        note: Note model instance
+        error: The exception or message OCR failed with
+        
+    Returns:
+        OCRResult: The note's OCR result
+    """
+    ocr_result, created = OCRResult.objects.get_or_create(
+        note=note,
+        defaults={'extracted_text': f"OCR processing failed: {str(error)}", 'stats': {'error': str(error)}}
+    )
+    return ocr_result
+
+
+def process_note_ocr(note, force=False, raise_errors=False):
+    """
+    Process OCR for a note and save the result.
+    
+    Args:
+        note: Note model instance
+        force (bool): Bypass the OCR caches and recompute every page
+        raise_errors (bool): Raise OCR errors instead of saving a fallback
+                             result, so a job can retry them
+        
+    Returns:
+        OCRResult: The created OCR result object
+    """
+    try:
+        for event, data in iter_note_ocr(note, force=force):
+            if event == 'result':
+                return data
     
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error processing OCR for note {note.id}: {str(e)}")
         # Create a fallback OCR result with error message
-        ocr_result, created = OCRResult.objects.get_or_create(
-            note=note,
-            defaults={'extracted_text': f"OCR processing failed: {str(e)}"}
-        )
-        return ocr_result
+        return save_ocr_fallback(note, e)
+
+
+def rebuild_ocr_text(ocr_result):
+    """
+    Re-derive the combined text and page statistics of an OCR result from its pages.
+    
+    Args:
+        ocr_result: OCRResult model instance
+        
+    Returns:
+        OCRResult: The updated OCR result
+    """
+    pages = [
+        {'page': page.page_number, 'source': page.source, 'text': page.text, 'confidence': page.confidence}
+        for page in ocr_result.pages.all()
+    ]
+    ocr_result.extracted_text = format_pages_text(pages)
+    
+    page_stats = get_pages_stats(pages)
+    ocr_result.stats = dict(
+        ocr_result.stats,
+        pages=page_stats['pages'],
+        pages_text=page_stats['pages_text'],
+        pages_ocr=page_stats['pages_ocr'],
+        mean_confidence=page_stats['mean_confidence'],
+    )
+    ocr_result.save(update_fields=['extracted_text', 'stats'])
+    return ocr_result
+
+
+def reocr_page(note, page_number):
+    """
+    Run OCR again for a single page of a note and update the stored result.
+    
+    The page is always OCR'd, even if it has a text layer, and the page
+    cache is bypassed. PDF pages are pre-processed like in
+    iter_pages_from_pdf, so the fresh result replaces the page cache entry
+    of the rendered image. The note's combined text is re-derived from its
+    pages, and the file cache entry is dropped so the next full OCR of the
+    same file does not bring back the old page.
+    
+    Args:
+        note: Note model instance with an existing OCR result
+        page_number (int): 1-based page number
+        
+    Returns:
+        OCRPage: The updated page
+    """
+    ocr_result = note.ocr_result
+    page_record = ocr_result.pages.get(page_number=page_number)
+    file_path = note.file.path
+    
+    if os.path.splitext(file_path)[1].lower() == '.pdf':
+        base_dpi = settings.OCR_DPI_STEPS[0]
+        with fitz.open(file_path) as doc:
+            page = doc[page_number - 1]
+            image = render_page_image(page, base_dpi)
+            prepared, prep = preprocess_page_image(image)
+            if prepared is None:
+                lines = {'texts': [], 'scores': [], 'boxes': []}
+            else:
+                lines = restore_line_boxes(next(ocr_page_images([prepared])), prep)
+            fields = finish_ocr_page(page, lines, base_dpi)
+            fields.update(get_prep_stats(prep))
+            store_ocr_cache(
+                OCR_PAGE_CACHE,
+                get_page_cache_key(image, get_page_ocr_tag()),
+                fields['text'],
+                meta=page_to_cache_meta({k: v for k, v in fields.items() if k != 'text'})
+            )
+    else:
+        fields = extract_pages_from_image(file_path)[0]
+    
+    cache_delete(OCR_FILE_CACHE, make_cache_key(file_sha256(file_path), get_ocr_settings_tag()))
+    
+    with transaction.atomic():
+        page_record.source = OCRPage.SOURCE_OCR
+        page_record.text = fields['text']
+        page_record.lines = fields['lines']
+        page_record.dpi = fields['dpi']
+        page_record.confidence = fields['confidence']
+        page_record.save()
+        rebuild_ocr_text(ocr_result)
+    
+    return page_record
 
 
 def bulk_process_ocr(notes):
     """
-    Process OCR for multiple notes.
+    Queue OCR for multiple notes.
     
     Args:
         notes: QuerySet or list of Note objects
         
     Returns:
-        list: List of OCRResult objects
+        list: List of queued Job objects
     """
-    results = []
-    for note in notes:
-        try:
-            result = process_note_ocr(note)
-            results.append(result)
-        except Exception as e:
-            print(f"Failed to process OCR for note {note.id}: {str(e)}")
-    
-    return results
+    return [enqueue_job(Job.KIND_OCR, note=note) for note in notes]
 
 
 def get_supported_file_extensions():
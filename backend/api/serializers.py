@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Note, OCRResult, NoteSummary, NotionIntegration
+from .models import Note, OCRResult, OCRPage, NoteSummary, NotionIntegration, Job
 
 
 class NoteSerializer(serializers.ModelSerializer):
@@ -87,14 +87,42 @@ class NoteCreateSerializer(serializers.ModelSerializer):
         return notes
 
 
+class OCRPageSerializer(serializers.ModelSerializer):
+    """Serializer for the per-page extraction path of an OCR result."""
+    
+    class Meta:
+        model = OCRPage
+        fields = ['page_number', 'source', 'dpi', 'confidence']
+        read_only_fields = fields
+
+
+class OCRPageDetailSerializer(serializers.ModelSerializer):
+    """Serializer for a single OCR page with its text and recognized lines."""
+    lines = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = OCRPage
+        fields = ['page_number', 'source', 'dpi', 'confidence', 'text', 'lines']
+        read_only_fields = fields
+    
+    def get_lines(self, obj):
+        """Return the packed lines as a list of {'text', 'score', 'box'} objects."""
+        lines = obj.get_lines()
+        return [
+            {'text': text, 'score': score, 'box': box}
+            for text, score, box in zip(lines['texts'], lines['scores'], lines['boxes'])
+        ]
+
+
 class OCRResultSerializer(serializers.ModelSerializer):
     """Serializer for OCR results."""
     note_name = serializers.CharField(source='note.name', read_only=True)
+    pages = OCRPageSerializer(many=True, read_only=True)
     
     class Meta:
         model = OCRResult
-        fields = ['id', 'note', 'note_name', 'extracted_text', 'processed_at']
-        read_only_fields = ['id', 'processed_at']
+        fields = ['id', 'note', 'note_name', 'extracted_text', 'pages', 'stats', 'processed_at']
+        read_only_fields = ['id', 'pages', 'stats', 'processed_at']
 
 
 class NoteSummarySerializer(serializers.ModelSerializer):
@@ -103,7 +131,7 @@ class NoteSummarySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = NoteSummary
-        fields = ['id', 'note', 'note_name', 'summary_text', 'generated_at']
+        fields = ['id', 'note', 'note_name', 'summary_text', 'stats', 'model_name', 'generated_at']
         read_only_fields = ['id', 'generated_at']
 
 
@@ -119,3 +147,16 @@ class NotionIntegrationSerializer(serializers.ModelSerializer):
     def get_is_connected(self, obj):
         """Check if the integration is connected."""
         return obj.is_valid() if obj else False
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs."""
+    note_name = serializers.CharField(source='note.name', read_only=True, default=None)
+    
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'note', 'note_name', 'result', 'error',
+            'attempts', 'max_attempts', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
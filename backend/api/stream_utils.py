@@ -0,0 +1,58 @@
+"""
+Server-Sent Events utility functions.
+
+Streaming endpoints return a `StreamingHttpResponse` whose body is produced by
+a generator of SSE frames, so clients see partial results (OCR pages, summary
+tokens) while the rest is still being computed.
+"""
+
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept `Accept: text/event-stream`.
+
+    Streaming views return their own StreamingHttpResponse, so this renderer
+    is only used for error responses raised before the stream starts.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_sse('error', data)
+
+
+def format_sse(event, data):
+    """
+    Format one Server-Sent Events frame.
+
+    Args:
+        event (str): Event name
+        data: JSON-serializable payload
+
+    Returns:
+        str: The frame, terminated by a blank line
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(frames):
+    """
+    Wrap a generator of SSE frames in a streaming response.
+
+    Args:
+        frames: Iterable of strings from format_sse
+
+    Returns:
+        StreamingHttpResponse: Response that is not buffered by proxies
+    """
+    response = StreamingHttpResponse(frames, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Disable response buffering in nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -4,21 +4,488 @@ This is a dummy implementation for demonstration purposes.
 """
 
 import re
-from .models import NoteSummary, OCRResult
-from llama_cpp import Llama
+import threading
+import time
+from collections import OrderedDict
+from .models import NoteSummary, OCRResult, Job
+from .job_utils import enqueue_job
+from .cache_utils import make_cache_key, cache_get, cache_set
+from .llm_batch import BatchEngine
+from .llm_pool import RemoteEngine, parse_pool_address, request_pool_stats
+from .llm_scheduler import LLMScheduler, LocalEngine
+from .markdown_utils import RULES_ENGINE, is_simple_note, transform_to_markdown
 from pathlib import Path
 from django.conf import settings
+from django.db import connections
 
-MODEL_PATH = settings.BASE_DIR / "api" / "models" / "mistral-7b-instruct-v0.1.Q4_K_M.gguf"
+# GGUF files of the LLM_MODELS registry
+MODELS_DIR = settings.BASE_DIR / "api" / "models"
 
-# Initialize LLaMA model (load once)
 #ADJUST THESE VALUES BASED ON YOUR SYSTEM CAPABILITIES
-llm = Llama(
-    model_path=str(MODEL_PATH),
-    n_ctx=8192,
-    n_threads=16,
-    n_gpu_layers=50
-)
+N_CTX = 8192  # Context size of registry models that do not set n_ctx
+WEIGHTS_ONLY_N_CTX = 256  # Own context of a model whose generations all run in the batch engine
+N_THREADS = 16  # Shared by the LLM_WORKERS contexts of this process
+N_GPU_LAYERS = 50
+
+# Bump when the prompts change so cached outputs are not reused
+PROMPT_VERSION = 1
+
+LLM_ENGINE = 'llm'
+# Values of SUMMARY_ENGINE and of the `engine` request option
+SUMMARY_ENGINES = ('auto', LLM_ENGINE, RULES_ENGINE)
+
+SUMMARY_CACHE = 'summary'
+SUMMARY_CHUNK_CACHE = 'summary-chunk'
+
+# Sampling parameters of every generation (max_tokens is SUMMARY_MAX_TOKENS)
+SAMPLING_PARAMS = {
+    'stop': ["</s>"],
+}
+
+MARKDOWN_PROMPT = """
+        You are a Markdown generator.
+        Ensure that you take into account what is actually present in the input if there are no tables don't create tables forcefully etc,
+        make sure you stick to the input while converting.
+        Convert the following plain text to a rich Markdown document with:
+        - Proper headings
+        - Task lists
+        - Tables
+        - Links
+        - Images
+        - Quotes
+        - Footnotes
+        - Math formatting
+        - Code blocks
+        Use **bold** and *italic* where appropriate.
+
+        Input:
+        \"\"\"
+        {text}
+        \"\"\"
+
+        Markdown Output:
+    """
+
+MERGE_PROMPT = """
+        You are a Markdown editor.
+        The following Markdown sections were converted one after another from consecutive parts of the same note.
+        Merge them into one consistent Markdown document: keep every piece of content and its order,
+        make heading levels consistent, and remove headings or lines duplicated where one section ends and the next begins.
+
+        Input:
+        \"\"\"
+        {text}
+        \"\"\"
+
+        Markdown Output:
+    """
+
+# Split levels tried in order when a text is over the chunk budget, with the
+# separator used to join pieces back together
+CHUNK_SEPARATORS = [
+    (re.compile(r'\n(?=--- Page \d+ \()'), '\n'),  # Page markers written by format_pages_text
+    (re.compile(r'\n{3}'), '\n\n\n'),  # Pages of compact_text output
+    (re.compile(r'\n\s*\n'), '\n\n'),  # Paragraphs
+    (re.compile(r'\n'), '\n'),  # Lines
+    (re.compile(r'(?<=[.!?])\s+'), ' '),  # Sentences
+    (re.compile(r'\s+'), ' '),  # Words
+]
+
+# Input compaction: page markers written by format_pages_text, and the lines at
+# the top and bottom of each page checked for repeated headers and footers
+PAGE_MARKER_RE = re.compile(r'^--- Page \d+ \([^)]*\) ---$', re.M)
+# Replaces the page markers; normalized text never has two blank lines in a row
+COMPACT_PAGE_SEPARATOR = '\n\n\n'
+COMPACT_EDGE_LINES = 3
+PAGE_NUMBER_RE = re.compile(r'^(?:page\s*)?[-–]?\s*\d{1,4}\s*[-–]?(?:\s*(?:/|of)\s*\d{1,4})?$', re.I)
+HYPHEN_BREAK_RE = re.compile(r'(\w)-\n[ \t]*([a-z])')
+RUN_RE = re.compile(r'([.\-_=*·•~])\1{3,}')
+
+# Runtime state of each loaded model ('llm', 'scheduler', 'batch'), least
+# recently used first; guarded by _llm_lock
+_runtimes = OrderedDict()
+_llm_lock = threading.RLock()
+
+# Vocabulary-only models used to count tokens without loading the weights
+_tokenizers = {}
+_tokenizer_lock = threading.Lock()
+
+
+def get_model_spec(name=None):
+    """
+    Look up a model of the LLM_MODELS registry.
+    
+    Args:
+        name (str, optional): Model name, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        dict: The registry entry, with defaults filled in and the 'path' of
+              its GGUF file
+        
+    Raises:
+        ValueError: If no model has that name
+    """
+    name = name or settings.LLM_DEFAULT_MODEL
+    for entry in settings.LLM_MODELS:
+        if entry['name'] == name:
+            return {
+                'n_ctx': N_CTX,
+                'quantization': '',
+                'tier': 'quality',
+                'max_input_tokens': None,
+                **entry,
+                'path': MODELS_DIR / entry['file'],
+            }
+    raise ValueError(f"Unknown LLM model: {name}")
+
+
+def get_model_tiers():
+    """Quality tiers available in the LLM_MODELS registry."""
+    return {get_model_spec(entry['name'])['tier'] for entry in settings.LLM_MODELS}
+
+
+def select_model(token_count, tier=None):
+    """
+    Choose the model for a summary input.
+    
+    Models are tried in registry order; the first one whose max_input_tokens
+    covers the input wins, so short notes go to small models. When no model
+    covers the input, the last one is used and the input is chunked.
+    
+    Args:
+        token_count (int): Input tokens, as counted by count_tokens
+        tier (str, optional): Only consider models of this tier
+        
+    Returns:
+        dict: Model spec from get_model_spec
+        
+    Raises:
+        ValueError: If no model has the requested tier
+    """
+    models = [get_model_spec(entry['name']) for entry in settings.LLM_MODELS]
+    if tier:
+        models = [model for model in models if model['tier'] == tier]
+        if not models:
+            raise ValueError(f"No LLM model of tier '{tier}'")
+    
+    for model in models:
+        if model['max_input_tokens'] is None or token_count <= model['max_input_tokens']:
+            return model
+    return models[-1]
+
+
+def select_engine(text, engine=None, tier=None):
+    """
+    Choose between the LLM and the rule-based engine for a summary input.
+    
+    Args:
+        text (str): Normalized text to summarize
+        engine (str, optional): One of SUMMARY_ENGINES, defaults to SUMMARY_ENGINE
+        tier (str, optional): Requested LLM tier; asking for one selects the LLM
+        
+    Returns:
+        str: LLM_ENGINE or RULES_ENGINE
+    """
+    engine = engine or settings.SUMMARY_ENGINE
+    if engine != 'auto':
+        return engine
+    if tier:
+        return LLM_ENGINE
+    if is_simple_note(text, settings.SUMMARY_RULES_MAX_WORDS, settings.SUMMARY_RULES_MIN_STRUCTURE):
+        return RULES_ENGINE
+    return LLM_ENGINE
+
+
+def get_llama_kwargs(n_threads, model=None, n_ctx=None):
+    """
+    Build the arguments for one Llama context.
+    
+    The model file is memory-mapped read-only and never locked, so every
+    context in every process on the machine shares one copy of the weights
+    through the page cache.
+    
+    Args:
+        n_threads (int): CPU threads for this context
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        n_ctx (int, optional): Context size, defaults to the model's n_ctx
+        
+    Returns:
+        dict: Keyword arguments for Llama()
+    """
+    model = model or get_model_spec()
+    return {
+        'model_path': str(model['path']),
+        'n_ctx': n_ctx or model['n_ctx'],
+        'n_threads': max(1, n_threads),
+        'n_gpu_layers': N_GPU_LAYERS,
+        'use_mmap': True,
+        'use_mlock': False,
+    }
+
+
+def _load_llm(model, n_ctx=None):
+    """Load one Llama context; its share of N_THREADS depends on LLM_WORKERS."""
+    from llama_cpp import Llama
+    
+    return Llama(**get_llama_kwargs(N_THREADS // settings.LLM_WORKERS, model, n_ctx=n_ctx))
+
+
+def _get_runtime(name):
+    """Runtime state of a model, marked as most recently used (call with _llm_lock held)."""
+    runtime = _runtimes.get(name)
+    if runtime is None:
+        runtime = _runtimes[name] = {'llm': None, 'scheduler': None, 'batch': None}
+    _runtimes.move_to_end(name)
+    return runtime
+
+
+def _get_model_size_mb(model):
+    """Size of a model's weights, approximated by its file size."""
+    path = Path(model['path'])
+    return path.stat().st_size / (1024 * 1024) if path.exists() else 0
+
+
+def _is_idle(runtime):
+    """Check that no generation is running, queued or about to be queued on a model."""
+    scheduler = runtime['scheduler']
+    if scheduler is None:
+        return True
+    stats = scheduler.get_stats()
+    return not (stats['busy'] or stats['queue_depth'] or stats['in_flight'])
+
+
+def _unload_model(name):
+    """Stop a model's scheduler and free its contexts (call with _llm_lock held)."""
+    runtime = _runtimes.pop(name)
+    if runtime['scheduler'] is not None:
+        runtime['scheduler'].close()
+    if runtime['batch'] is not None:
+        runtime['batch'].close()
+    if runtime['llm'] is not None and hasattr(runtime['llm'], 'close'):
+        runtime['llm'].close()
+
+
+def _make_room_for(model):
+    """
+    Evict least recently used idle models until `model` fits in LLM_MEMORY_BUDGET_MB.
+    
+    Call with _llm_lock held. Models with generations running or queued are
+    never evicted, so the budget can be exceeded for a while.
+    """
+    budget = settings.LLM_MEMORY_BUDGET_MB
+    if not budget:
+        return
+    
+    needed = _get_model_size_mb(model)
+    loaded = [name for name, runtime in _runtimes.items() if runtime['llm'] is not None and name != model['name']]
+    used = sum(_get_model_size_mb(get_model_spec(name)) for name in loaded)
+    
+    for name in loaded:
+        if used + needed <= budget:
+            break
+        if _is_idle(_runtimes[name]):
+            used -= _get_model_size_mb(get_model_spec(name))
+            _unload_model(name)
+            print(f"Unloaded LLM {name} to make room for {model['name']}")
+    
+    if used + needed > budget:
+        print(f"LLM memory budget exceeded: {model['name']} needs {needed:.0f} MB with {used:.0f} MB in use")
+
+
+def get_llm(model=None):
+    """
+    Get the main Llama context of a model, loading it on first use.
+    
+    Loading is guarded by a lock so concurrent first requests load the
+    model only once. Before loading, least recently used models are evicted
+    while the loaded models would exceed LLM_MEMORY_BUDGET_MB. With
+    LLM_BATCH_SIZE > 1 the model only lends its weights and tokenizer to the
+    batch engine, so its own context is WEIGHTS_ONLY_N_CTX cells.
+    
+    Args:
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        Llama: The loaded model
+    """
+    model = model or get_model_spec()
+    with _llm_lock:
+        runtime = _get_runtime(model['name'])
+        if runtime['llm'] is None:
+            _make_room_for(model)
+            batched = settings.LLM_BATCH_SIZE > 1 and not _uses_pool(model)
+            runtime['llm'] = _load_llm(model, n_ctx=WEIGHTS_ONLY_N_CTX if batched else None)
+        return runtime['llm']
+
+
+def is_llm_loaded():
+    """Check whether an LLM has been loaded in this process."""
+    with _llm_lock:
+        return any(runtime['llm'] is not None for runtime in _runtimes.values())
+
+
+def get_pool_authkey():
+    """Shared secret of the LLM pool, as bytes."""
+    return settings.LLM_POOL_AUTHKEY.encode('utf-8')
+
+
+def get_batch_engine(model=None):
+    """
+    Get the batched decoding engine of a model, creating it on first use.
+    
+    The engine decodes up to LLM_BATCH_SIZE generations together in
+    LLM_BATCH_CTX cells of KV cache, on the weights of get_llm(), whose
+    own context is kept minimal in that mode. Batched sequences share no
+    KV cache, so LLM_PREFIX_CACHE does not apply to them.
+    
+    Args:
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        BatchEngine: The engine
+    """
+    model = model or get_model_spec()
+    with _llm_lock:
+        llm = get_llm(model)
+        runtime = _get_runtime(model['name'])
+        if runtime['batch'] is None:
+            if settings.LLM_PREFIX_CACHE:
+                print(f"LLM_PREFIX_CACHE has no effect with LLM_BATCH_SIZE > 1: {model['name']} evaluates every prompt in full")
+            runtime['batch'] = BatchEngine(
+                llm,
+                n_seq=settings.LLM_BATCH_SIZE,
+                n_ctx=settings.LLM_BATCH_CTX,
+                n_threads=N_THREADS
+            )
+        return runtime['batch']
+
+
+def _uses_pool(model):
+    """The LLM pool serves LLM_DEFAULT_MODEL; other models run in-process."""
+    return bool(settings.LLM_POOL_ADDRESS) and model['name'] == settings.LLM_DEFAULT_MODEL
+
+
+def _load_worker_llm(model, index):
+    """
+    Scheduler loader for worker `index` of a model.
+    
+    When the model runs in the LLM pool every worker is a connection to the
+    pool; with LLM_BATCH_SIZE > 1 all workers share the batch engine;
+    otherwise the first worker uses get_llm() and the others their own context.
+    """
+    if _uses_pool(model):
+        return RemoteEngine(parse_pool_address(settings.LLM_POOL_ADDRESS), get_pool_authkey())
+    if settings.LLM_BATCH_SIZE > 1:
+        return get_batch_engine(model)
+    return LocalEngine(get_llm(model) if index == 0 else _load_llm(model))
+
+
+def get_scheduler(model=None):
+    """
+    Get the LLM scheduler of a model, creating it on first use.
+    
+    All generations go through the scheduler, which runs them on
+    LLM_WORKERS Llama contexts. llama.cpp memory-maps the model file, so
+    extra contexts share the weights and only add their own KV cache.
+    When the model runs in the LLM pool (LLM_POOL_ADDRESS), the scheduler
+    instead keeps up to LLM_POOL_PROCESSES generations running in the pool
+    at once; with LLM_BATCH_SIZE > 1, up to LLM_BATCH_SIZE generations in
+    the batch engine.
+    
+    Args:
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        LLMScheduler: The scheduler
+    """
+    model = model or get_model_spec()
+    with _llm_lock:
+        runtime = _get_runtime(model['name'])
+        if runtime['scheduler'] is None:
+            if _uses_pool(model):
+                workers = settings.LLM_POOL_PROCESSES
+            elif settings.LLM_BATCH_SIZE > 1:
+                workers = settings.LLM_BATCH_SIZE
+            else:
+                workers = settings.LLM_WORKERS
+            runtime['scheduler'] = LLMScheduler(lambda index: _load_worker_llm(model, index), workers=workers)
+        return runtime['scheduler']
+
+
+def get_scheduler_stats():
+    """
+    Queue metrics of the LLM schedulers, with batch decoding counters.
+    
+    Returns:
+        dict or None: Stats per model name (plus 'loaded', whether its
+                      weights are in memory), or None before first use
+    """
+    with _llm_lock:
+        runtimes = list(_runtimes.items())
+    
+    stats = {}
+    for name, runtime in runtimes:
+        if runtime['scheduler'] is None:
+            continue
+        stats[name] = runtime['scheduler'].get_stats()
+        stats[name]['loaded'] = runtime['llm'] is not None
+        if runtime['batch'] is not None:
+            stats[name]['batch'] = runtime['batch'].get_stats()
+    return stats or None
+
+
+def get_pool_stats():
+    """
+    Ask the LLM pool for its queue metrics.
+    
+    Returns:
+        dict or None: The pool's scheduler metrics, {'error': ...} if the pool
+                      cannot be reached, or None if LLM_POOL_ADDRESS is not set
+    """
+    if not settings.LLM_POOL_ADDRESS:
+        return None
+    
+    try:
+        return request_pool_stats(parse_pool_address(settings.LLM_POOL_ADDRESS), get_pool_authkey())
+    except Exception as e:
+        print(f"Error reaching LLM pool: {str(e)}")
+        return {'error': str(e)}
+
+
+def get_tokenizer(model=None):
+    """
+    Get a vocabulary-only model for token counting, loading it on first use.
+    
+    Args:
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        Llama: Model that can tokenize but not generate
+    """
+    model = model or get_model_spec()
+    tokenizer = _tokenizers.get(model['name'])
+    if tokenizer is None:
+        with _tokenizer_lock:
+            tokenizer = _tokenizers.get(model['name'])
+            if tokenizer is None:
+                from llama_cpp import Llama
+                tokenizer = Llama(model_path=str(model['path']), vocab_only=True, verbose=False)
+                _tokenizers[model['name']] = tokenizer
+    return tokenizer
+
+
+def count_tokens(text, model=None):
+    """
+    Count the model tokens of a text.
+    
+    Args:
+        text (str): Text to count
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        int: Number of tokens, without the BOS token
+    """
+    return len(get_tokenizer(model).tokenize(text.encode('utf-8'), add_bos=False))
 
 
 def clean_text(text):
@@ -43,6 +510,424 @@ def clean_text(text):
     return text.strip()
 
 
+def split_text_into_chunks(text, max_tokens, level=0, model=None):
+    """
+    Split a text into chunks of at most max_tokens tokens.
+    
+    Pages are kept together when they fit, then paragraphs, lines and
+    sentences; a chunk only breaks inside a word when one word is over the
+    budget. Consecutive pieces are packed greedily into each chunk.
+    
+    Args:
+        text (str): Text to split
+        max_tokens (int): Token budget per chunk
+        level (int): First index of CHUNK_SEPARATORS to split on
+        model (dict, optional): Model whose tokenizer counts the tokens
+        
+    Returns:
+        list: Chunks in reading order
+    """
+    text = text.strip()
+    if not text:
+        return []
+    
+    if count_tokens(text, model) <= max_tokens:
+        return [text]
+    
+    if level == len(CHUNK_SEPARATORS):
+        middle = len(text) // 2
+        return (
+            split_text_into_chunks(text[:middle], max_tokens, level, model) +
+            split_text_into_chunks(text[middle:], max_tokens, level, model)
+        )
+    
+    separator, joiner = CHUNK_SEPARATORS[level]
+    pieces = [piece.strip() for piece in separator.split(text) if piece.strip()]
+    
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        tokens = count_tokens(piece, model)
+        # Pieces over the budget are split further and packed like any other
+        parts = [(piece, tokens)] if tokens <= max_tokens else [
+            (part, count_tokens(part, model))
+            for part in split_text_into_chunks(piece, max_tokens, level + 1, model)
+        ]
+        
+        for part, part_tokens in parts:
+            # One extra token per piece covers the joiner
+            if current and current_tokens + part_tokens + 1 > max_tokens:
+                chunks.append(joiner.join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens + 1
+    
+    if current:
+        chunks.append(joiner.join(current))
+    
+    return chunks
+
+
+def get_chunk_token_budget(model=None):
+    """
+    Get the input token budget of one chunk.
+    
+    The prompt, the chunk and SUMMARY_MAX_TOKENS generated tokens must fit
+    in the model's context window.
+    
+    Args:
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        int: Token budget per chunk
+    """
+    model = model or get_model_spec()
+    prompt_tokens = count_tokens(MARKDOWN_PROMPT.format(text=''), model)
+    return max(1, min(settings.SUMMARY_CHUNK_TOKENS, model['n_ctx'] - settings.SUMMARY_MAX_TOKENS - prompt_tokens - 16))
+
+
+def get_llm_tag(model=None):
+    """
+    Identify the model and sampling parameters.
+    
+    Args:
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        str: Tag included in every summary cache key
+    """
+    model = model or get_model_spec()
+    model_path = Path(model['path'])
+    model_size = model_path.stat().st_size if model_path.exists() else None
+    return make_cache_key(
+        model_path.name,
+        model_size,
+        model['n_ctx'],
+        settings.SUMMARY_MAX_TOKENS,
+        SAMPLING_PARAMS,
+        PROMPT_VERSION,
+    )
+
+
+def normalize_summary_input(text):
+    """
+    Normalize whitespace that does not change the summary input.
+    
+    Args:
+        text (str): Text to summarize
+        
+    Returns:
+        str: Text with trailing spaces and runs of blank lines removed
+    """
+    lines = [line.rstrip() for line in (text or '').strip().splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
+
+
+def _line_signature(line):
+    """Compare header and footer lines ignoring case and spacing."""
+    return re.sub(r'\s+', ' ', line.lower()).strip()
+
+
+def compact_text(text):
+    """
+    Remove OCR noise that costs prompt tokens without carrying content.
+    
+    Page markers are dropped, though pages stay separated by two blank lines,
+    which split_text_into_chunks still splits on first. Also dropped are
+    lines repeated at the top or bottom of at least half of the pages
+    (running headers and footers), page numbers on the first or last line
+    of a page and lines without any letter or digit. Words hyphenated across
+    line breaks are joined, runs of dots or dashes are shortened and spacing
+    is collapsed.
+    
+    Args:
+        text (str): Normalized note text, one OCR line per line
+        
+    Returns:
+        str: Compacted text
+    """
+    pages = [HYPHEN_BREAK_RE.sub(r'\1\2', page) for page in PAGE_MARKER_RE.split(text) if page.strip()]
+    pages = [[line.strip() for line in page.split('\n')] for page in pages]
+    
+    repeated = set()
+    if len(pages) > 1:
+        counts = {}
+        for lines in pages:
+            content = [line for line in lines if line]
+            edges = content[:COMPACT_EDGE_LINES] + content[-COMPACT_EDGE_LINES:]
+            for signature in {_line_signature(line) for line in edges}:
+                counts[signature] = counts.get(signature, 0) + 1
+        threshold = max(2, (len(pages) + 1) // 2)
+        repeated = {signature for signature, count in counts.items() if count >= threshold and len(signature) >= 4}
+    
+    compacted = []
+    for lines in pages:
+        kept = []
+        for line in lines:
+            line = RUN_RE.sub(r'\1\1\1', re.sub(r'[ \t]+', ' ', line))
+            if line and (not re.search(r'[^\W_]', line) or _line_signature(line) in repeated):
+                continue
+            kept.append(line)
+        # A number alone is a page number only at the top or bottom of the page
+        content = [i for i, line in enumerate(kept) if line]
+        for i in {content[0], content[-1]} if content else ():
+            if PAGE_NUMBER_RE.match(kept[i]):
+                kept[i] = ''
+        page = re.sub(r'\n{3,}', '\n\n', '\n'.join(kept)).strip()
+        if page:
+            compacted.append(page)
+    
+    return COMPACT_PAGE_SEPARATOR.join(compacted)
+
+
+def prepare_summary_input(text):
+    """
+    Normalize a summary input and compact it when SUMMARY_COMPACT_INPUT is on.
+    
+    Args:
+        text (str): OCR text of a note
+        
+    Returns:
+        str: Text handed to the summary engines
+    """
+    text = normalize_summary_input(text)
+    return compact_text(text) if settings.SUMMARY_COMPACT_INPUT else text
+
+
+def get_summary_cache_key(text, model=None):
+    """
+    Build the cache key of a whole summary.
+    
+    Args:
+        text (str): Normalized text to summarize
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        str: Key covering the input, prompt version, model file, sampling
+             parameters and chunking settings
+    """
+    return make_cache_key(get_llm_tag(model), settings.SUMMARY_CHUNK_TOKENS, settings.SUMMARY_MERGE_PASS, text)
+
+
+def clean_markdown_output(raw_string):
+    """Strip the generated Markdown and drop empty lines."""
+    lines = raw_string.strip().split('\n')
+    cleaned_lines = [line.strip() for line in lines if line.strip()]
+    return '\n'.join(cleaned_lines)
+
+
+def submit_markdown_prompt(template, text, model=None):
+    """
+    Queue one prompt on the LLM scheduler of a model.
+    
+    Args:
+        template (str): MARKDOWN_PROMPT or MERGE_PROMPT
+        text (str): Text to place in the prompt
+        model (dict, optional): Model spec, defaults to LLM_DEFAULT_MODEL
+        
+    Returns:
+        LLMRequest: Handle yielding the generated tokens
+    """
+    prompt = template.format(text=text.strip())
+    # Everything up to the line holding the note text is the same for every
+    # request; ending on a newline keeps its tokenization stable
+    prefix = template[:template.index('{text}')].rstrip(' ') if settings.LLM_PREFIX_CACHE else None
+    # Submitting under the lock keeps the model from being evicted meanwhile
+    with _llm_lock:
+        return get_scheduler(model).submit(prompt, prefix=prefix, max_tokens=settings.SUMMARY_MAX_TOKENS, **SAMPLING_PARAMS)
+
+
+def store_summary_cache(namespace, key, text, meta=None):
+    """Store a summary output in the cache, applying the summary cache limits."""
+    cache_set(
+        namespace, key, text, meta=meta,
+        max_bytes=settings.SUMMARY_CACHE_MAX_BYTES,
+        max_age_seconds=settings.SUMMARY_CACHE_MAX_AGE_DAYS * 86400,
+    )
+
+
+def iter_markdown(text, use_cache=True, model=None):
+    """
+    Convert a note's text to Markdown, yielding tokens as they are generated.
+    
+    The input is first compacted by prepare_summary_input. Unless a model is
+    given, select_model picks one by the input's length. The text is split
+    with split_text_into_chunks and every chunk gets its own Markdown pass.
+    Whole summaries are cached by input text, prompt version, model and
+    sampling parameters (shared by all users), and a hit is returned as a
+    single token. All uncached chunks are queued on the LLM scheduler at
+    once, so they run concurrently when LLM_WORKERS is above 1; tokens are
+    still yielded in chunk order, the current chunk live and later chunks
+    from their buffers. Chunk outputs are cached by chunk text, prompt
+    version and model, so a re-run only recomputes the chunks whose text
+    changed. With SUMMARY_MERGE_PASS, multi-chunk outputs that fit in one
+    generation are stitched together by one more pass, announced by a
+    'restart' event.
+    
+    Args:
+        text (str): Text to convert
+        use_cache (bool): Reuse cached summaries and chunk outputs
+        model (dict, optional): Model spec from get_model_spec or select_model
+        
+    Yields:
+        tuple: ('token', str) for generated (or cached) text, ('restart',
+               None) before the merge pass, then ('result', (markdown,
+               stats)) where stats counts the prompt input before and after
+               compaction ('input_tokens_raw', 'input_tokens'), 'chunks',
+               'chunks_cached', generated 'tokens', whether the 'merged'
+               pass ran, the 'ttft_seconds' (time to first token), the
+               longest 'queue_wait_seconds', the prompt evaluation skipped
+               thanks to the prefix cache ('prefix_seconds_saved'), total
+               'seconds', the 'engine' and the 'model' name; cached
+               summaries carry 'cached': True
+    """
+    start = time.monotonic()
+    raw_text = normalize_summary_input(text)
+    text = prepare_summary_input(text)
+    model = model or select_model(count_tokens(text))
+    summary_key = get_summary_cache_key(text, model)
+    
+    entry = cache_get(SUMMARY_CACHE, summary_key) if use_cache else None
+    if entry is not None:
+        elapsed = round(time.monotonic() - start, 3)
+        yield 'token', entry.value
+        yield 'result', (entry.value, dict(
+            entry.meta.get('stats', {}),
+            cached=True,
+            tokens=0,
+            ttft_seconds=elapsed,
+            queue_wait_seconds=None,
+            prefix_seconds_saved=0.0,
+            seconds=elapsed,
+        ))
+        return
+    
+    chunks = split_text_into_chunks(text, get_chunk_token_budget(model), model=model)
+    llm_tag = get_llm_tag(model)
+    keys = [make_cache_key(llm_tag, chunk) for chunk in chunks]
+    
+    outputs = [None] * len(chunks)
+    if use_cache:
+        for i, key in enumerate(keys):
+            entry = cache_get(SUMMARY_CHUNK_CACHE, key)
+            if entry is not None:
+                outputs[i] = entry.value
+    
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    stats = {
+        'engine': LLM_ENGINE,
+        'model': model['name'],
+        'input_tokens_raw': count_tokens(raw_text, model),
+        'input_tokens': count_tokens(text, model),
+        'chunks': len(chunks),
+        'chunks_cached': len(chunks) - len(missing),
+        'tokens': 0,
+        'merged': False,
+        'ttft_seconds': None,
+        'queue_wait_seconds': None,
+        'prefix_seconds_saved': 0.0,
+    }
+    
+    def first_visible():
+        if stats['ttft_seconds'] is None:
+            stats['ttft_seconds'] = round(time.monotonic() - start, 3)
+    
+    def generated(request, raw):
+        """Yield the request's tokens, counting them and collecting them in raw."""
+        for token in request.tokens():
+            stats['tokens'] += 1
+            first_visible()
+            raw.append(token)
+            yield token
+        stats['queue_wait_seconds'] = max(stats['queue_wait_seconds'] or 0, round(request.wait_seconds or 0, 3))
+        stats['prefix_seconds_saved'] = round(stats['prefix_seconds_saved'] + request.prefix_seconds_saved, 3)
+    
+    requests = {i: submit_markdown_prompt(MARKDOWN_PROMPT, chunks[i], model) for i in missing}
+    try:
+        for i in range(len(chunks)):
+            if i:
+                yield 'token', '\n\n'
+            
+            if outputs[i] is not None:
+                first_visible()
+                yield 'token', outputs[i]
+                continue
+            
+            raw = []
+            for token in generated(requests[i], raw):
+                yield 'token', token
+            
+            outputs[i] = clean_markdown_output(''.join(raw))
+            store_summary_cache(SUMMARY_CHUNK_CACHE, keys[i], outputs[i])
+    finally:
+        # Stop queued chunks if the caller went away
+        for request in requests.values():
+            request.cancel()
+    
+    markdown = '\n\n'.join(outputs)
+    
+    if settings.SUMMARY_MERGE_PASS and len(chunks) > 1:
+        merge_tokens = count_tokens(markdown, model)
+        prompt_tokens = count_tokens(MERGE_PROMPT.format(text=''), model)
+        if merge_tokens <= settings.SUMMARY_MAX_TOKENS and prompt_tokens + 2 * merge_tokens < model['n_ctx']:
+            yield 'restart', None
+            request = submit_markdown_prompt(MERGE_PROMPT, markdown, model)
+            raw = []
+            try:
+                for token in generated(request, raw):
+                    yield 'token', token
+            finally:
+                request.cancel()
+            markdown = clean_markdown_output(''.join(raw))
+            stats['merged'] = True
+    
+    stats['seconds'] = round(time.monotonic() - start, 3)
+    store_summary_cache(SUMMARY_CACHE, summary_key, markdown, meta={'stats': stats})
+    yield 'result', (markdown, stats)
+
+
+def iter_rules_markdown(text):
+    """
+    Convert a note's text to Markdown with the rule-based engine.
+    
+    Args:
+        text (str): Text to convert
+        
+    Yields:
+        tuple: ('token', markdown), then ('result', (markdown, stats)) with
+               the same timing keys as iter_markdown
+    """
+    start = time.monotonic()
+    markdown = transform_to_markdown(prepare_summary_input(text)).strip()
+    elapsed = round(time.monotonic() - start, 3)
+    yield 'token', markdown
+    yield 'result', (markdown, {
+        'engine': RULES_ENGINE,
+        'model': RULES_ENGINE,
+        'tokens': 0,
+        'ttft_seconds': elapsed,
+        'seconds': elapsed,
+    })
+
+
+def generate_markdown(text, use_cache=True, model=None):
+    """
+    Convert a note's text to Markdown, chunk by chunk when it is long.
+    
+    Args:
+        text (str): Text to convert
+        use_cache (bool): Reuse cached summaries and chunk outputs
+        model (dict, optional): Model spec, chosen by select_model if omitted
+        
+    Returns:
+        tuple: (markdown, stats) as produced by iter_markdown
+    """
+    for event, data in iter_markdown(text, use_cache=use_cache, model=model):
+        if event == 'result':
+            return data
+
+
 def generate_advanced_summary(text):
     """
     Generate a more detailed summary with key points.
@@ -53,101 +938,167 @@ def generate_advanced_summary(text):
     Returns:
         str: Detailed summary with structure
     """
-    prompt = f"""
-        You are a Markdown generator.
-        Ensure that you take into account what is actually present in the input if there are no tables don't create tables forcefully etc,
-        make sure you stick to the input while converting.
-        Convert the following plain text to a rich Markdown document with:
-        - Proper headings
-        - Task lists
-        - Tables
-        - Links
-        - Images
-        - Quotes
-        - Footnotes
-        - Math formatting
-        - Code blocks
-        Use **bold** and *italic* where appropriate.
+    return generate_markdown(text)[0]
 
-        Input:
-        \"\"\"
-        {text.strip()}
-        \"\"\"
 
-        Markdown Output:
+def save_note_summary(note, summary_text, stats=None, model_name=''):
     """
+    Create or update the summary of a note.
+    
+    Args:
+        note: Note model instance
+        summary_text (str): Generated Markdown
+        stats (dict, optional): Generation statistics
+        model_name (str, optional): LLM_MODELS entry that generated it
+        
+    Returns:
+        NoteSummary: The saved summary object
+    """
+    summary, created = NoteSummary.objects.get_or_create(
+        note=note,
+        defaults={'summary_text': summary_text, 'stats': stats or {}, 'model_name': model_name}
+    )
+    
+    if not created:
+        summary.summary_text = summary_text
+        summary.stats = stats or {}
+        summary.model_name = model_name
+        summary.save()
+    
+    return summary
 
-    response = llm(prompt, max_tokens=1024, stop=["</s>"])
-    raw_string = response["choices"][0]["text"].strip()
 
-    lines = raw_string.split('\n')
-    cleaned_lines = [line.strip() for line in lines if line.strip()]
-    return '\n'.join(cleaned_lines)
+def _generate_note_summary(note, text, use_cache, model):
+    """Single-flight producer: generate and save the summary, then release the DB connection."""
+    try:
+        for event, data in iter_markdown(text, use_cache=use_cache, model=model):
+            if event == 'result':
+                summary_text, stats = data
+                yield 'result', save_note_summary(note, summary_text, stats, model_name=model['name'])
+            else:
+                yield event, data
+    finally:
+        # Runs in a scheduler thread, whose connections Django does not close
+        connections.close_all()
+
 
+def _rules_note_summary(note, text):
+    """Convert and save the summary with the rule-based engine."""
+    for event, data in iter_rules_markdown(text):
+        if event == 'result':
+            summary_text, stats = data
+            yield 'result', save_note_summary(note, summary_text, stats, model_name=RULES_ENGINE)
+        else:
+            yield event, data
 
-def process_note_summary(note):
+
+def iter_note_summary(note, use_cache=True, tier=None, engine=None):
+    """
+    Generate the summary of a note, yielding tokens as they are generated.
+    
+    select_engine decides whether the note goes to the rule-based engine,
+    which answers at once, or to the LLM. The model is chosen by
+    select_model from the length of the note's text and the requested tier.
+    Requests for the same note, input text and model that arrive while a
+    generation is running join it instead of starting another one, and all
+    of them receive every event. The generation runs in the background, so
+    it completes and is saved even if the caller stops reading.
+    
+    Args:
+        note: Note model instance
+        use_cache (bool): Reuse cached summaries and chunk outputs
+        tier (str, optional): Only use models of this tier
+        engine (str, optional): One of SUMMARY_ENGINES, defaults to SUMMARY_ENGINE
+        
+    Yields:
+        tuple: The 'token' and 'restart' events of iter_markdown, then
+               ('result', NoteSummary) once the summary is saved
+    """
+    # Get or create OCR result first
+    ocr_result = getattr(note, 'ocr_result', None)
+    if not ocr_result:
+        # Import here to avoid circular imports
+        from .ocr_utils import process_note_ocr
+        ocr_result = process_note_ocr(note, raise_errors=True)
+    if ocr_result.stats.get('error'):
+        raise ValueError(f"OCR failed for note {note.id}: {ocr_result.stats['error']}")
+    
+    from .ocr_utils import format_pages_lines
+    text = format_pages_lines(ocr_result)
+    prepared = prepare_summary_input(text)
+    if select_engine(prepared, engine, tier) == RULES_ENGINE:
+        return _rules_note_summary(note, text)
+    
+    model = select_model(count_tokens(prepared), tier=tier)
+    key = make_cache_key('note-summary', note.id, text, use_cache, model['name'])
+    return get_scheduler(model).single_flight(key, lambda: _generate_note_summary(note, text, use_cache, model))
+
+
+def save_summary_fallback(note, error):
+    """
+    Store an error message as the note's summary, unless it already has one.
+    
+    Args:
+        note: Note model instance
+        error: The exception or message generation failed with
+        
+    Returns:
+        NoteSummary: The note's summary
+    """
+    summary, created = NoteSummary.objects.get_or_create(
+        note=note,
+        defaults={'summary_text': f"Summary generation failed: {str(error)}", 'stats': {'error': str(error)}}
+    )
+    return summary
+
+
+def is_failed_summary(summary):
+    """Check whether a summary is a fallback saved after generation failed."""
+    return bool(summary.stats.get('error')) or summary.summary_text.startswith('Summary generation failed:')
+
+
+def process_note_summary(note, force=False, tier=None, engine=None, raise_errors=False):
     """
     Generate summary for a note based on its OCR result.
     
+    Identical OCR texts summarized with the same prompt version, model and
+    sampling parameters reuse the cached summary, whoever uploaded them.
+    
     Args:
         note: Note model instance
+        force (bool): Bypass the summary caches and generate again
+        tier (str, optional): Only use models of this tier
+        engine (str, optional): One of SUMMARY_ENGINES, defaults to SUMMARY_ENGINE
+        raise_errors (bool): Raise generation errors instead of saving a
+                             fallback summary, so a job can retry them
         
     Returns:
         NoteSummary: The created summary object
     """
     try:
-        # Get or create OCR result first
-        ocr_result = getattr(note, 'ocr_result', None)
-        if not ocr_result:
-            # Import here to avoid circular imports
-            from .ocr_utils import process_note_ocr
-            ocr_result = process_note_ocr(note)
-        
-        # Generate summary from OCR text
-        summary_text = generate_advanced_summary(ocr_result.extracted_text)
-        print(summary_text)  # Debug output
-        
-        # Create or update summary
-        summary, created = NoteSummary.objects.get_or_create(
-            note=note,
-            defaults={'summary_text': summary_text}
-        )
-        
-        if not created:
-            summary.summary_text = summary_text
-            summary.save()
-        
-        return summary
+        for event, data in iter_note_summary(note, use_cache=not force, tier=tier, engine=engine):
+            if event == 'result':
+                return data
     
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error generating summary for note {note.id}: {str(e)}")
         # Create a fallback summary with error message
-        summary, created = NoteSummary.objects.get_or_create(
-            note=note,
-            defaults={'summary_text': f"Summary generation failed: {str(e)}"}
-        )
-        return summary
+        return save_summary_fallback(note, e)
 
 
 def bulk_process_summaries(notes):
     """
-    Generate summaries for multiple notes.
+    Queue summary generation for multiple notes.
     
     Args:
         notes: QuerySet or list of Note objects
         
     Returns:
-        list: List of NoteSummary objects
+        list: List of queued Job objects
     """
-    results = []
-    for note in notes:
-        try:
-            result = process_note_summary(note)
-            results.append(result)
-        except Exception as e:
-            print(f"Failed to generate summary for note {note.id}: {str(e)}")
-    
-    return results
+    return [enqueue_job(Job.KIND_SUMMARY, note=note) for note in notes]
 
 
 def get_summary_statistics(text):
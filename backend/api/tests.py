@@ -1,3 +1,315 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .cache_utils import cache_get, cache_set, evict_cache
+from .job_utils import JOB_FALLBACKS, JOB_HANDLERS, claim_job, enqueue_job, fail_abandoned_jobs, fail_job, run_job
+from .markdown_utils import is_simple_note
+from .models import CacheEntry, Job
+from .notion_client import MAX_BLOCKS_PER_REQUEST, block_hash, plan_block_sync, split_nested_children
+from .notion_markdown import to_rich_text
+from .ocr_utils import pack_ocr_lines, unpack_ocr_lines
+from .summary_utils import compact_text, split_text_into_chunks
+
+
+class CompactTextTests(SimpleTestCase):
+    """compact_text on note text with one OCR line per line."""
+
+    def test_removes_running_headers_page_numbers_and_hyphen_breaks(self):
+        pages = [
+            "CS101 Lecture Notes\nSorting algo-\nrithms compare keys\nFall 2024\n1",
+            "CS101 Lecture Notes\nMerge sort splits the input\nFall 2024\n2",
+            "CS101 Lecture Notes\nQuick sort picks a pivot\nFall 2024\n3",
+        ]
+        text = "\n".join(
+            f"--- Page {number} (OCR) ---\n{page}" for number, page in enumerate(pages, 1)
+        )
+
+        self.assertEqual(
+            compact_text(text),
+            "Sorting algorithms compare keys\n\n\n"
+            "Merge sort splits the input\n\n\n"
+            "Quick sort picks a pivot"
+        )
+
+    def test_keeps_numbers_inside_a_page(self):
+        text = (
+            "--- Page 1 (Text) ---\n"
+            "Answer to the question\n42\nYear of the survey\n2024\nEnd of the page"
+        )
+
+        self.assertEqual(
+            compact_text(text),
+            "Answer to the question\n42\nYear of the survey\n2024\nEnd of the page"
+        )
+
+    def test_removes_page_numbers_on_edge_lines_and_noise(self):
+        text = "--- Page 7 (OCR) ---\nPage 7\nIntroduction ........ 3\n-----\n___\n7 / 12"
+
+        self.assertEqual(compact_text(text), "Introduction ... 3")
+
+    @mock.patch('api.summary_utils.count_tokens', lambda text, model=None: len(text.split()))
+    def test_compacted_pages_still_split_on_page_boundaries(self):
+        pages = [
+            "The first page holds one paragraph of eight words",
+            "Second page here",
+            "Third page opens\n\nand then ends with a longer paragraph",
+        ]
+        text = "\n".join(
+            f"--- Page {number} (Text) ---\n{page}" for number, page in enumerate(pages, 1)
+        )
+
+        # Packing paragraphs would put the start of page 3 with page 2
+        self.assertEqual(split_text_into_chunks(compact_text(text), 12), pages)
+
+
+class SimpleNoteRoutingTests(SimpleTestCase):
+    """is_simple_note on OCR text with one printed line per line."""
+
+    def is_simple(self, text):
+        return is_simple_note(text, settings.SUMMARY_RULES_MAX_WORDS, settings.SUMMARY_RULES_MIN_STRUCTURE)
+
+    def test_wrapped_prose_goes_to_the_llm(self):
+        text = (
+            "--- Page 1 (OCR) ---\n"
+            "The mitochondria is the part\n"
+            "of the cell that turns food\n"
+            "into energy the cell can use\n"
+            "and it has its own DNA which\n"
+            "suggests it was once a separate\n"
+            "organism living inside others."
+        )
+
+        self.assertFalse(self.is_simple(text))
+
+    def test_lists_and_headings_go_to_the_rules_engine(self):
+        text = (
+            "--- Page 1 (OCR) ---\n"
+            "# Groceries\n"
+            "- milk\n"
+            "- eggs and bread\n"
+            "Errands:\n"
+            "1. post office\n"
+            "2. pick up the dry cleaning\n"
+            "TODO call the plumber"
+        )
+
+        self.assertTrue(self.is_simple(text))
+
+
+class InlineEmphasisTests(SimpleTestCase):
+    """to_rich_text on single-star emphasis."""
+
+    def runs(self, text):
+        return [(part['text']['content'], part['annotations']['italic']) for part in to_rich_text(text)]
+
+    def test_stars_inside_words_stay_literal(self):
+        self.assertEqual(self.runs('2*3*4 = 24'), [('2*3*4 = 24', False)])
+
+    def test_stars_at_word_boundaries_are_italic(self):
+        self.assertEqual(self.runs('an *italic* word'), [('an ', False), ('italic', True), (' word', False)])
+
+
+def list_item(text, children=None):
+    block = {'type': 'bulleted_list_item', 'bulleted_list_item': {'rich_text': [{'text': {'content': text}}]}}
+    if children:
+        block['bulleted_list_item']['children'] = children
+    return block
+
+
+class SplitNestedChildrenTests(SimpleTestCase):
+    """split_nested_children against Notion's per-request limits."""
+
+    def test_flat_block_is_sent_as_is(self):
+        block = list_item('a', [list_item('b')])
+
+        self.assertEqual(split_nested_children(block), (block, []))
+
+    def test_children_below_two_levels_are_deferred(self):
+        deepest = [list_item('d')]
+        block = list_item('a', [list_item('b', [list_item('c', deepest)]), list_item('e')])
+
+        sent, deferred = split_nested_children(block)
+
+        self.assertEqual(sent, list_item('a', [list_item('b', [list_item('c')]), list_item('e')]))
+        self.assertEqual(deferred, [((0, 0), deepest)])
+        self.assertIsNot(sent, block)
+        self.assertIn('children', block['bulleted_list_item']['children'][0]['bulleted_list_item']['children'][0]['bulleted_list_item'])
+
+    def test_children_over_the_limit_are_deferred_per_level(self):
+        children = [list_item(str(i)) for i in range(MAX_BLOCKS_PER_REQUEST + 5)]
+        block = list_item('a', [list_item('b', children)])
+
+        sent, deferred = split_nested_children(block)
+
+        self.assertEqual(sent, list_item('a', [list_item('b', children[:MAX_BLOCKS_PER_REQUEST])]))
+        self.assertEqual(deferred, [((0,), children[MAX_BLOCKS_PER_REQUEST:])])
+
+
+def paragraph(text):
+    return {'object': 'block', 'type': 'paragraph', 'paragraph': {'rich_text': [{'text': {'content': text}}]}}
+
+
+class PlanBlockSyncTests(SimpleTestCase):
+    """plan_block_sync between the blocks on a page and new blocks."""
+
+    def old_entries(self, blocks):
+        return [[f'id-{i}', block_hash(block), block['type']] for i, block in enumerate(blocks)]
+
+    def test_unchanged_page_keeps_every_block(self):
+        blocks = [paragraph('a'), paragraph('b')]
+
+        self.assertEqual(plan_block_sync(self.old_entries(blocks), blocks), [('keep', 0, 0), ('keep', 1, 1)])
+
+    def test_changed_blocks_are_updated_inserted_and_deleted(self):
+        old = [paragraph('intro'), paragraph('old text'), list_item('gone')]
+        new = [paragraph('intro'), paragraph('new text'), {'object': 'block', 'type': 'divider', 'divider': {}}]
+
+        self.assertEqual(
+            plan_block_sync(self.old_entries(old), new),
+            [('keep', 0, 0), ('update', 1, 1), ('insert', None, 2), ('delete', 2, None)]
+        )
+
+
+class OcrLinesPackingTests(SimpleTestCase):
+    """pack_ocr_lines / unpack_ocr_lines round trip."""
+
+    def test_round_trip(self):
+        lines = {
+            'texts': ['Grocery list', 'crème brûlée', ''],
+            'scores': [0.98, 0.5, 0.25],
+            'boxes': [[0, 0, 100, 20], [0, 25, 80.5, 45], [1, 2, 3, 4]],
+        }
+
+        unpacked = unpack_ocr_lines(pack_ocr_lines(lines))
+
+        self.assertEqual(unpacked['texts'], lines['texts'])
+        for score, expected in zip(unpacked['scores'], lines['scores']):
+            self.assertAlmostEqual(score, expected, places=6)
+        self.assertEqual(unpacked['boxes'], lines['boxes'])
+
+    def test_empty_blob_has_no_lines(self):
+        self.assertEqual(unpack_ocr_lines(b''), {'texts': [], 'scores': [], 'boxes': []})
+
+
+class CacheEvictionTests(TestCase):
+    """evict_cache by size and by age."""
+
+    def store(self, key, minutes_ago, namespace='test'):
+        cache_set(namespace, key, 'x' * 100)
+        CacheEntry.objects.filter(namespace=namespace, key=key).update(
+            last_used_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+
+    def test_least_recently_used_entries_go_first(self):
+        self.store('old', 30)
+        self.store('older', 60)
+        self.store('new', 1)
+        size = CacheEntry.objects.get(key='new').size_bytes
+
+        deleted = evict_cache('test', max_bytes=2 * size)
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(set(CacheEntry.objects.values_list('key', flat=True)), {'old', 'new'})
+
+    def test_cache_get_refreshes_last_use(self):
+        self.store('a', 90)
+        self.store('b', 60)
+        cache_get('test', 'a')
+
+        evict_cache('test', max_age_seconds=45 * 60)
+
+        self.assertEqual(list(CacheEntry.objects.values_list('key', flat=True)), ['a'])
+
+    def test_other_namespaces_are_left_alone(self):
+        self.store('a', 90)
+        self.store('b', 60, namespace='other')
+        size = CacheEntry.objects.get(key='b').size_bytes
+
+        cache_set('other', 'c', 'x' * 100, max_bytes=size)
+
+        self.assertTrue(CacheEntry.objects.filter(namespace='test', key='a').exists())
+        self.assertEqual(list(CacheEntry.objects.filter(namespace='other').values_list('key', flat=True)), ['c'])
+
+
+class JobQueueTests(TestCase):
+    """claim_job, fail_job and fail_abandoned_jobs on the database queue."""
+
+    def test_claims_respect_the_concurrency_limit(self):
+        first = enqueue_job(Job.KIND_SUMMARY, concurrency_key='llm', concurrency_limit=1)
+        second = enqueue_job(Job.KIND_SUMMARY, concurrency_key='llm', concurrency_limit=1)
+        free = enqueue_job(Job.KIND_OCR)
+
+        self.assertEqual(claim_job('worker-1').id, first.id)
+        self.assertEqual(claim_job('worker-2').id, free.id)
+        self.assertIsNone(claim_job('worker-3'))
+
+        Job.objects.filter(id=first.id).update(status=Job.STATUS_DONE)
+        self.assertEqual(claim_job('worker-3').id, second.id)
+
+    def test_expired_lease_frees_the_concurrency_slot(self):
+        first = enqueue_job(Job.KIND_SUMMARY, concurrency_key='llm', concurrency_limit=1)
+        second = enqueue_job(Job.KIND_SUMMARY, concurrency_key='llm', concurrency_limit=1)
+        claim_job('worker-1')
+        Job.objects.filter(id=first.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        claimed = claim_job('worker-2')
+
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.attempts, 2)
+        self.assertIsNone(claim_job('worker-3'))
+        self.assertEqual(Job.objects.get(id=second.id).status, Job.STATUS_QUEUED)
+
+    def test_failed_attempt_is_requeued_with_backoff(self):
+        enqueue_job(Job.KIND_OCR)
+        job = claim_job('worker-1')
+
+        self.assertTrue(fail_job(job, 'worker-1', 'boom'))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertEqual(job.error, 'boom')
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertIsNone(claim_job('worker-1'))
+
+        Job.objects.filter(id=job.id).update(available_at=timezone.now())
+        self.assertEqual(claim_job('worker-1').attempts, 2)
+
+    def test_last_attempt_fails_for_good_and_runs_the_fallback(self):
+        job = enqueue_job(Job.KIND_OCR)
+        Job.objects.filter(id=job.id).update(attempts=job.max_attempts - 1)
+        job = claim_job('worker-1')
+        handler = mock.Mock(side_effect=RuntimeError('boom'))
+        fallback = mock.Mock()
+
+        with mock.patch.dict(JOB_HANDLERS, {Job.KIND_OCR: handler}), \
+                mock.patch.dict(JOB_FALLBACKS, {Job.KIND_OCR: fallback}):
+            self.assertFalse(run_job(job, 'worker-1'))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIsNotNone(job.finished_at)
+        fallback.assert_called_once()
+
+    def test_fail_after_losing_the_lease_is_ignored(self):
+        enqueue_job(Job.KIND_OCR)
+        job = claim_job('worker-1')
+
+        self.assertFalse(fail_job(job, 'worker-2', 'boom'))
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.STATUS_RUNNING)
+
+    def test_abandoned_jobs_fail_after_the_last_attempt(self):
+        retried = enqueue_job(Job.KIND_OCR)
+        abandoned = enqueue_job(Job.KIND_OCR)
+        expired = timezone.now() - timedelta(seconds=1)
+        Job.objects.filter(id=retried.id).update(status=Job.STATUS_RUNNING, attempts=1, lease_expires_at=expired)
+        Job.objects.filter(id=abandoned.id).update(
+            status=Job.STATUS_RUNNING, attempts=abandoned.max_attempts, lease_expires_at=expired
+        )
+
+        self.assertEqual(fail_abandoned_jobs(), 1)
+        self.assertEqual(Job.objects.get(id=abandoned.id).status, Job.STATUS_FAILED)
+        self.assertEqual(Job.objects.get(id=retried.id).status, Job.STATUS_RUNNING)
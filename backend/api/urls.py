@@ -13,18 +13,30 @@ urlpatterns = [
     
     # OCR and summary endpoints
     path('get-ocr/<int:note_id>/', views.get_note_ocr, name='get-note-ocr'),
+    path('get-ocr/<int:note_id>/pages/<int:page_number>/', views.get_note_ocr_page, name='get-note-ocr-page'),
+    path('stream-ocr/<int:note_id>/', views.stream_note_ocr, name='stream-note-ocr'),
     path('get-summary/<int:note_id>/', views.get_note_summary, name='get-note-summary'),
+    path('stream-summary/<int:note_id>/', views.stream_note_summary, name='stream-note-summary'),
     
     # Regeneration endpoints
     path('regenerate-ocr/<int:note_id>/', views.regenerate_ocr, name='regenerate-ocr'),
+    path('regenerate-ocr/<int:note_id>/pages/<int:page_number>/', views.regenerate_ocr_page, name='regenerate-ocr-page'),
     path('regenerate-summary/<int:note_id>/', views.regenerate_summary, name='regenerate-summary'),
     
+    # Background job endpoints
+    path('jobs/<int:job_id>/', views.get_job_status, name='job-status'),
+    
+    # Health endpoints
+    path('health/models/', views.model_readiness, name='model-readiness'),
+    
     # Notion integration endpoints (using regular Django views for OAuth)
     path('notion/authorize/', views.notion_authorize, name='notion-authorize'),
     path('notion/callback/', views.notion_callback, name='notion-callback'),
     path('notion/test-callback/', views.test_callback, name='test-callback'),
     path('notion/status/', views.notion_status, name='notion-status'),
     path('notion/complete/', views.complete_notion_integration, name='complete-notion-integration'),
+    path('notion/export/', views.bulk_export_to_notion, name='bulk-export-to-notion'),
+    path('notion/export/batches/<uuid:batch_id>/', views.get_notion_export_batch, name='notion-export-batch'),
     path('notion/export/<int:note_id>/', views.export_to_notion, name='export-to-notion'),
     path('notion/disconnect/', views.disconnect_notion, name='disconnect-notion'),
 ]
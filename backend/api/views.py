@@ -1,5 +1,6 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
@@ -13,23 +14,29 @@ from rest_framework.views import APIView
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from urllib.parse import quote
+import uuid
 
-from .models import Note, OCRResult, NoteSummary, NotionIntegration
+from .models import Note, OCRResult, NoteSummary, NotionIntegration, Job
 from .serializers import (
     NoteSerializer, 
     NoteCreateSerializer, 
     OCRResultSerializer, 
     NoteSummarySerializer,
-    NotionIntegrationSerializer
+    NotionIntegrationSerializer,
+    JobSerializer,
+    OCRPageDetailSerializer
 )
-from .ocr_utils import process_note_ocr
-from .summary_utils import process_note_summary
+from .ocr_utils import iter_note_ocr
+from .stream_utils import EventStreamRenderer, format_sse, sse_response
+from .summary_utils import iter_note_summary, get_model_tiers, SUMMARY_ENGINES
+from .job_utils import enqueue_job, get_active_job
+from .model_utils import get_model_status
 from .notion_utils import (
     get_notion_authorization_url,
     exchange_code_for_token,
     get_notion_workspace_info,
-    markdown_to_notion_blocks,
-    create_notion_page,
+    export_note_summary,
+    get_export_concurrency_key,
     get_user_notion_integration
 )
 
@@ -38,7 +45,8 @@ class NoteUploadView(generics.CreateAPIView):
     """
     Upload multiple PDF notes with names.
     Supports multiple file upload with corresponding names.
-    OCR processing happens synchronously for proof of concept.
+    OCR is queued as a background job per note; each returned note
+    carries the `job_id` to poll at `jobs/<job_id>/`.
     """
     serializer_class = NoteCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -49,16 +57,16 @@ class NoteUploadView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         notes = serializer.save()
         
-        # Process OCR synchronously for each uploaded note (proof of concept)
-        for note in notes:
-            try:
-                process_note_ocr(note)
-            except Exception as e:
-                print(f"Failed to process OCR for note {note.id}: {str(e)}")
+        # Queue OCR for each uploaded note; a worker picks it up
+        jobs = [enqueue_job(Job.KIND_OCR, note=note) for note in notes]
         
-        # Return serialized note data
+        # Return serialized note data along with the job handling each note
         response_serializer = NoteSerializer(notes, many=True, context={'request': request})
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        data = response_serializer.data
+        for note_data, job in zip(data, jobs):
+            note_data['job_id'] = job.id
+            note_data['job_status'] = job.status
+        return Response(data, status=status.HTTP_202_ACCEPTED)
 
 
 class NoteListView(generics.ListAPIView):
@@ -173,7 +181,8 @@ class NotesSearchView(generics.ListAPIView):
 def get_note_ocr(request, note_id):
     """
     Get OCR results for a specific note.
-    If OCR hasn't been processed yet, trigger processing.
+    If OCR hasn't been processed yet, returns 202 with the note's queued or
+    running OCR job, queueing one if there is none.
     """
     try:
         note = get_object_or_404(Note, id=note_id, user=request.user)
@@ -182,8 +191,10 @@ def get_note_ocr(request, note_id):
         try:
             ocr_result = note.ocr_result
         except OCRResult.DoesNotExist:
-            # Process OCR if not already done
-            ocr_result = process_note_ocr(note)
+            # OCR runs in the job worker, never in the request
+            job = get_active_job(note, Job.KIND_OCR) or enqueue_job(Job.KIND_OCR, note=note)
+            serializer = JobSerializer(job, context={'request': request})
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         
         serializer = OCRResultSerializer(ocr_result, context={'request': request})
         return Response(serializer.data)
@@ -200,12 +211,89 @@ def get_note_ocr(request, note_id):
         )
 
 
+def ocr_page_event(page):
+    """Page data sent to streaming clients (packed lines are left out)."""
+    return {
+        'page_number': page['page'],
+        'source': page['source'],
+        'text': page['text'],
+        'dpi': page.get('dpi'),
+        'confidence': page.get('confidence'),
+        'cached': page.get('cached', False),
+        'blank': page.get('blank', False),
+    }
+
+
+@api_view(['GET'])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+@permission_classes([permissions.IsAuthenticated])
+def stream_note_ocr(request, note_id):
+    """
+    Stream OCR results for a specific note as Server-Sent Events.
+    Each page is sent as a `page` event as soon as it is extracted; a `done`
+    event follows once the result has been saved. An existing result is
+    replayed unless `force` is set in the query string.
+    """
+    note = get_object_or_404(Note, id=note_id, user=request.user)
+    force = request.query_params.get('force', '').lower() in ('1', 'true', 'yes')
+    
+    def frames():
+        try:
+            ocr_result = None if force else OCRResult.objects.filter(note=note).first()
+            if ocr_result is not None:
+                for page in ocr_result.pages.all():
+                    yield format_sse('page', {
+                        'page_number': page.page_number,
+                        'source': page.source,
+                        'text': page.text,
+                        'dpi': page.dpi,
+                        'confidence': page.confidence,
+                        'cached': True,
+                    })
+            else:
+                for event, data in iter_note_ocr(note, force=force):
+                    if event == 'page':
+                        yield format_sse('page', ocr_page_event(data))
+                    else:
+                        ocr_result = data
+            
+            yield format_sse('done', {'id': ocr_result.id, 'stats': ocr_result.stats})
+        
+        except Exception as e:
+            print(f"Error streaming OCR for note {note.id}: {str(e)}")
+            yield format_sse('error', {'error': f'Failed to process OCR: {str(e)}'})
+    
+    return sse_response(frames())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_note_ocr_page(request, note_id, page_number):
+    """
+    Get the text and recognized lines of one page of a note's OCR result.
+    """
+    note = get_object_or_404(Note, id=note_id, user=request.user)
+    
+    try:
+        ocr_result = note.ocr_result
+    except OCRResult.DoesNotExist:
+        return Response(
+            {'error': 'OCR has not been processed for this note'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    page = get_object_or_404(ocr_result.pages, page_number=page_number)
+    serializer = OCRPageDetailSerializer(page, context={'request': request})
+    return Response(serializer.data)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_note_summary(request, note_id):
     """
     Get summary for a specific note.
-    If summary hasn't been generated yet, trigger generation.
+    If summary hasn't been generated yet, returns 202 with the note's queued
+    or running summary job, queueing one if there is none.
     """
     try:
         note = get_object_or_404(Note, id=note_id, user=request.user)
@@ -214,8 +302,10 @@ def get_note_summary(request, note_id):
         try:
             summary = note.summary
         except NoteSummary.DoesNotExist:
-            # Generate summary if not already done
-            summary = process_note_summary(note)
+            # Summaries run in the job worker, never in the request
+            job = get_active_job(note, Job.KIND_SUMMARY) or enqueue_job(Job.KIND_SUMMARY, note=note)
+            serializer = JobSerializer(job, context={'request': request})
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         
         serializer = NoteSummarySerializer(summary, context={'request': request})
         return Response(serializer.data)
@@ -232,26 +322,73 @@ def get_note_summary(request, note_id):
         )
 
 
+@api_view(['GET'])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+@permission_classes([permissions.IsAuthenticated])
+def stream_note_summary(request, note_id):
+    """
+    Stream summary generation for a specific note as Server-Sent Events.
+    Generated text is sent as `token` events while the model produces it; a
+    `done` event with the saved summary follows. An existing summary is
+    replayed unless `force` is set in the query string. `tier` restricts
+    the models the note can be routed to; `engine` picks the LLM, the
+    rule-based engine or automatic routing.
+    """
+    note = get_object_or_404(Note, id=note_id, user=request.user)
+    force = request.query_params.get('force', '').lower() in ('1', 'true', 'yes')
+    tier = request.query_params.get('tier') or None
+    if tier and tier not in get_model_tiers():
+        return Response(
+            {'error': f'Unknown tier: {tier}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    engine = request.query_params.get('engine') or None
+    if engine and engine not in SUMMARY_ENGINES:
+        return Response(
+            {'error': f'Unknown engine: {engine}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    def frames():
+        try:
+            summary = None if force else NoteSummary.objects.filter(note=note).first()
+            if summary is not None:
+                yield format_sse('token', {'text': summary.summary_text})
+            else:
+                for event, data in iter_note_summary(note, use_cache=not force, tier=tier, engine=engine):
+                    if event == 'token':
+                        yield format_sse('token', {'text': data})
+                    elif event == 'restart':
+                        yield format_sse('restart', {})
+                    else:
+                        summary = data
+            
+            serializer = NoteSummarySerializer(summary, context={'request': request})
+            yield format_sse('done', serializer.data)
+        
+        except Exception as e:
+            print(f"Error streaming summary for note {note.id}: {str(e)}")
+            yield format_sse('error', {'error': f'Failed to generate summary: {str(e)}'})
+    
+    return sse_response(frames())
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def regenerate_ocr(request, note_id):
     """
     Regenerate OCR for a specific note.
+    The existing result stays readable until the queued job replaces it.
+    Cached OCR output is reused unless `force` is set in the request body.
     """
     try:
         note = get_object_or_404(Note, id=note_id, user=request.user)
         
-        # Delete existing OCR result if it exists
-        try:
-            note.ocr_result.delete()
-        except OCRResult.DoesNotExist:
-            pass
-        
-        # Process OCR again
-        ocr_result = process_note_ocr(note)
+        force = str(request.data.get('force', '')).lower() in ('1', 'true', 'yes')
+        job = enqueue_job(Job.KIND_OCR, note=note, payload={'force': force})
         
-        serializer = OCRResultSerializer(ocr_result, context={'request': request})
-        return Response(serializer.data)
+        serializer = JobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
     
     except Note.DoesNotExist:
         return Response(
@@ -265,26 +402,61 @@ def regenerate_ocr(request, note_id):
         )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def regenerate_ocr_page(request, note_id, page_number):
+    """
+    Run OCR again for one page of a note, bypassing the text layer and the cache.
+    The note's combined text is rebuilt from its pages when the job finishes.
+    """
+    note = get_object_or_404(Note, id=note_id, user=request.user)
+    
+    try:
+        ocr_result = note.ocr_result
+    except OCRResult.DoesNotExist:
+        return Response(
+            {'error': 'OCR has not been processed for this note'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    get_object_or_404(ocr_result.pages, page_number=page_number)
+    
+    job = enqueue_job(Job.KIND_OCR_PAGE, note=note, payload={'page_number': page_number})
+    serializer = JobSerializer(job, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def regenerate_summary(request, note_id):
     """
     Regenerate summary for a specific note.
+    The existing summary stays readable until the queued job replaces it.
+    A cached summary of the same OCR text, prompt version and model is reused
+    unless `force` is set in the request body. `tier` restricts the models
+    the note can be routed to; `engine` picks the LLM, the rule-based engine
+    or automatic routing.
     """
     try:
         note = get_object_or_404(Note, id=note_id, user=request.user)
         
-        # Delete existing summary if it exists
-        try:
-            note.summary.delete()
-        except NoteSummary.DoesNotExist:
-            pass
-        
-        # Generate summary again
-        summary = process_note_summary(note)
+        force = str(request.data.get('force', '')).lower() in ('1', 'true', 'yes')
+        tier = request.data.get('tier') or None
+        if tier and tier not in get_model_tiers():
+            return Response(
+                {'error': f'Unknown tier: {tier}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        engine = request.data.get('engine') or None
+        if engine and engine not in SUMMARY_ENGINES:
+            return Response(
+                {'error': f'Unknown engine: {engine}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        job = enqueue_job(Job.KIND_SUMMARY, note=note, payload={'force': force, 'tier': tier, 'engine': engine})
         
-        serializer = NoteSummarySerializer(summary, context={'request': request})
-        return Response(serializer.data)
+        serializer = JobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
     
     except Note.DoesNotExist:
         return Response(
@@ -298,6 +470,29 @@ def regenerate_summary(request, note_id):
         )
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_job_status(request, job_id):
+    """
+    Get the status of a background job owned by the user.
+    """
+    job = get_object_or_404(Job, id=job_id, user=request.user)
+    serializer = JobSerializer(job, context={'request': request})
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def model_readiness(request):
+    """
+    Report which models are loaded in this process.
+    Returns 503 while a requested start-up warm-up is still running or failed.
+    """
+    model_status = get_model_status()
+    http_status = status.HTTP_200_OK if model_status['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return Response(model_status, status=http_status)
+
+
 # Notion Integration Views
 
 @csrf_exempt
@@ -505,17 +700,13 @@ def complete_notion_integration(request):
 def export_to_notion(request, note_id):
     """
     Export a note's summary to Notion, or use provided Notion blocks from frontend.
+    A note exported before is updated in place, sending only the blocks that
+    changed, unless `new_page` is set.
     """
     try:
         # Get the note and ensure it belongs to the user
         note = get_object_or_404(Note, id=note_id, user=request.user)
         
-        # Get or create summary
-        try:
-            summary = note.summary
-        except NoteSummary.DoesNotExist:
-            summary = process_note_summary(note)
-        
         # Get user's Notion integration
         integration = get_user_notion_integration(request.user)
         if not integration.is_valid():
@@ -524,32 +715,28 @@ def export_to_notion(request, note_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Use blocks from frontend if provided, else convert markdown
-        blocks = request.data.get('blocks')
-        if not blocks:
-            # Convert markdown to Notion blocks (legacy fallback)
-            blocks = markdown_to_notion_blocks(summary.summary_text)
-        
-        # Create page title
-        page_title = f"{note.name}"
-        
         # Get parent_id from request if provided
         parent_id = request.data.get('parent_id')
-        
-        # Create Notion page
-        page_data = create_notion_page(
-            access_token=integration.access_token,
-            title=page_title,
-            blocks=blocks,
-            parent_id=parent_id
+        new_page = str(request.data.get('new_page', '')).lower() in ('1', 'true', 'yes')
+        
+        # Create the Notion page, or sync the one exported before. Blocks from
+        # the frontend are used if provided, else the summary is converted
+        export = export_note_summary(
+            note,
+            parent_id=parent_id,
+            new_page=new_page,
+            blocks=request.data.get('blocks')
         )
         
         return Response({
             'success': True,
             'message': 'Successfully exported to Notion',
-            'page_id': page_data.get('id'),
-            'page_url': page_data.get('url'),
-            'note_name': note.name
+            'page_id': export['page_id'],
+            'page_url': export['page_url'],
+            'note_name': note.name,
+            'created': export['created'],
+            'blocks': {key: export[key] for key in ('kept', 'updated', 'inserted', 'deleted')},
+            'requests': export['requests']
         })
         
     except Note.DoesNotExist:
@@ -564,6 +751,138 @@ def export_to_notion(request, note_id):
         )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_export_to_notion(request):
+    """
+    Export many notes to Notion in the background.
+    The notes are picked by `note_ids`, or by upload date with `start_date`
+    and `end_date` (YYYY-MM-DD). One job is queued per note, and at most
+    NOTION_EXPORT_CONCURRENCY of them run at once per Notion workspace.
+    Notes with an export already queued or running are skipped; if all of
+    them are, nothing is queued and 400 is returned. Progress is reported by
+    the batch endpoint.
+    """
+    integration = get_user_notion_integration(request.user)
+    if not integration.is_valid():
+        return Response(
+            {'error': 'Notion integration not connected. Please connect your Notion account first.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    notes = Note.objects.filter(user=request.user)
+    note_ids = request.data.get('note_ids')
+    start_date = request.data.get('start_date')
+    end_date = request.data.get('end_date')
+    if note_ids:
+        if not isinstance(note_ids, list) or not all(str(note_id).isdigit() for note_id in note_ids):
+            return Response(
+                {'error': 'note_ids must be a list of note IDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        note_ids = [int(note_id) for note_id in note_ids]
+        notes = notes.filter(id__in=note_ids)
+        missing = sorted(set(note_ids) - set(notes.values_list('id', flat=True)))
+        if missing:
+            return Response(
+                {'error': f'Notes not found: {missing}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    elif start_date or end_date:
+        try:
+            if start_date:
+                notes = notes.filter(uploaded_at__date__gte=datetime.strptime(start_date, '%Y-%m-%d').date())
+            if end_date:
+                notes = notes.filter(uploaded_at__date__lte=datetime.strptime(end_date, '%Y-%m-%d').date())
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Dates must use the YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    else:
+        return Response(
+            {'error': 'Provide note_ids, or start_date and/or end_date'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    notes = list(notes.order_by('uploaded_at'))
+    if not notes:
+        return Response(
+            {'error': 'No notes to export'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(notes) > settings.NOTION_EXPORT_MAX_NOTES:
+        return Response(
+            {'error': f'At most {settings.NOTION_EXPORT_MAX_NOTES} notes can be exported at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    batch_id = str(uuid.uuid4())
+    payload = {
+        'batch_id': batch_id,
+        'parent_id': request.data.get('parent_id'),
+        'new_page': str(request.data.get('new_page', '')).lower() in ('1', 'true', 'yes'),
+    }
+    concurrency_key = get_export_concurrency_key(integration)
+    jobs, skipped = [], []
+    for note in notes:
+        active = get_active_job(note, Job.KIND_NOTION_EXPORT)
+        if active is not None:
+            skipped.append({'note': note.id, 'job': active.id})
+            continue
+        jobs.append(enqueue_job(
+            Job.KIND_NOTION_EXPORT,
+            note=note,
+            payload=payload,
+            concurrency_key=concurrency_key,
+            concurrency_limit=settings.NOTION_EXPORT_CONCURRENCY
+        ))
+    
+    if not jobs:
+        return Response(
+            {'error': 'Every note already has an export queued or running', 'skipped': skipped},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({
+        'batch_id': batch_id,
+        'total': len(jobs),
+        'skipped': skipped,
+        'jobs': JobSerializer(jobs, many=True, context={'request': request}).data
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_notion_export_batch(request, batch_id):
+    """
+    Get the progress of a bulk Notion export.
+    Each job's result holds the page and block counts of its note's export.
+    """
+    jobs = list(Job.objects.filter(
+        user=request.user,
+        kind=Job.KIND_NOTION_EXPORT,
+        payload__batch_id=str(batch_id)
+    ).select_related('note').order_by('id'))
+    if not jobs:
+        return Response(
+            {'error': 'Export batch not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    counts = {value: 0 for value, _ in Job.STATUS_CHOICES}
+    for job in jobs:
+        counts[job.status] += 1
+    
+    return Response({
+        'batch_id': str(batch_id),
+        'total': len(jobs),
+        'finished': counts[Job.STATUS_DONE] + counts[Job.STATUS_FAILED] == len(jobs),
+        'counts': counts,
+        'jobs': JobSerializer(jobs, many=True, context={'request': request}).data
+    })
+
+
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def disconnect_notion(request):
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from dotenv import load_dotenv
 
@@ -87,6 +88,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Job threads (`run_worker --concurrency`) and scheduler threads write
+        # concurrently; take the write lock up front and wait for it instead
+        # of failing with "database is locked"
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -192,7 +200,12 @@ NOTION_CLIENT_SECRET = os.getenv("NOTION_CLIENT_SECRET")
 NOTION_REDIRECT_URI = "https://memoir-7665.onrender.com/api/notion/callback/"  # Change to the url of your backend
 NOTION_AUTHORIZATION_URL = "https://api.notion.com/v1/oauth/authorize"
 NOTION_TOKEN_URL = "https://api.notion.com/v1/oauth/token"
-NOTION_API_BASE_URL = "https://api.notion.com/v1"
+NOTION_API_BASE_URL = os.getenv("NOTION_API_BASE_URL", "https://api.notion.com/v1")  # Point at a local stand-in server to test exports
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))  # Requests per second per integration (Notion's average limit)
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))  # Retries after 429 and transient errors
+NOTION_EXPORT_CONCURRENCY = int(os.getenv("NOTION_EXPORT_CONCURRENCY", "2"))  # Background exports running at once per workspace
+NOTION_EXPORT_MAX_NOTES = int(os.getenv("NOTION_EXPORT_MAX_NOTES", "500"))  # Notes per bulk export request
+NOTION_BLOCKS_CACHE_MAX_BYTES = int(os.getenv("NOTION_BLOCKS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # Converted summaries kept for re-exports
 
 # Frontend URL for OAuth redirects
 FRONTEND_URL = os.getenv("FRONTEND_URL")
@@ -203,3 +216,98 @@ SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
+
+# Background job queue (drained by `python manage.py run_worker`)
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))  # How long a claimed job stays leased without a heartbeat
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = int(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))  # Multiplied by the attempt number
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+
+# OCR process pool: each worker process keeps its own warm PaddleOCR instance.
+# 0 or 1 runs OCR in-process, one page after another.
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "0"))
+OCR_WORKER_THREADS = int(os.getenv("OCR_WORKER_THREADS", "2"))  # CPU threads per OCR worker
+
+# Per-page PDF extraction: a page keeps its text layer unless it is (almost) empty,
+# or images cover most of the page and the text layer is short.
+OCR_TEXT_LAYER_MIN_CHARS = int(os.getenv("OCR_TEXT_LAYER_MIN_CHARS", "20"))
+OCR_TEXT_LAYER_RICH_CHARS = int(os.getenv("OCR_TEXT_LAYER_RICH_CHARS", "200"))
+OCR_IMAGE_COVERAGE_THRESHOLD = float(os.getenv("OCR_IMAGE_COVERAGE_THRESHOLD", "0.5"))
+
+# Content-addressed OCR cache (shared by all users). Bump OCR_CACHE_VERSION to
+# invalidate every cached result, e.g. after changing OCR models.
+OCR_CACHE_VERSION = os.getenv("OCR_CACHE_VERSION", "1")
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+OCR_CACHE_MAX_AGE_DAYS = int(os.getenv("OCR_CACHE_MAX_AGE_DAYS", "90"))
+
+# Models are loaded lazily on first use. List the models to load in a background
+# thread when the app starts (e.g. "ocr,llm" for inference workers); empty disables.
+MODEL_WARMUP_ON_READY = [m.strip() for m in os.getenv("MODEL_WARMUP_ON_READY", "").split(",") if m.strip()]
+
+# OCR DPI cascade: pages are OCR'd at the first DPI step; lines scoring below the
+# threshold are re-rendered and re-OCR'd at the following steps. When more than
+# OCR_PAGE_RERENDER_FRACTION of a page's lines are weak the whole page is re-rendered.
+OCR_DPI_STEPS = [int(dpi) for dpi in os.getenv("OCR_DPI_STEPS", "100,200").split(",")]
+OCR_CONFIDENCE_THRESHOLD = float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "0.8"))
+OCR_PAGE_RERENDER_FRACTION = float(os.getenv("OCR_PAGE_RERENDER_FRACTION", "0.5"))
+
+# OCR image pre-processing (NumPy only): near-blank pages are skipped, uniform
+# margins are cropped and the longest side is capped before OCR.
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "True").lower() == "true"
+OCR_BLANK_STD_THRESHOLD = float(os.getenv("OCR_BLANK_STD_THRESHOLD", "3.0"))  # Pixel standard deviation below which a page is blank
+OCR_MARGIN_TOLERANCE = int(os.getenv("OCR_MARGIN_TOLERANCE", "24"))  # Gray-level distance from the background that counts as content
+OCR_MARGIN_PADDING = int(os.getenv("OCR_MARGIN_PADDING", "16"))  # Pixels kept around the content when cropping
+OCR_MAX_IMAGE_SIDE = int(os.getenv("OCR_MAX_IMAGE_SIDE", "2560"))
+
+# LLM model registry. GGUF files live in backend/api/models/. A note goes to the first
+# model, in this order, whose tier matches the requested one (any tier if none was
+# requested) and whose max_input_tokens covers the note (None = no limit), so list
+# small models first. Override with a JSON list in LLM_MODELS.
+LLM_MODELS = json.loads(os.getenv("LLM_MODELS", "null")) or [
+    {
+        'name': 'mistral-7b',
+        'file': 'mistral-7b-instruct-v0.1.Q4_K_M.gguf',
+        'quantization': 'Q4_K_M',
+        'n_ctx': 8192,
+        'tier': 'quality',
+        'max_input_tokens': None,
+    },
+]
+LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", LLM_MODELS[-1]['name'])  # Counts tokens for routing and runs in the LLM pool
+LLM_MEMORY_BUDGET_MB = int(os.getenv("LLM_MEMORY_BUDGET_MB", "0"))  # Model files loaded per process, least recently used evicted first; 0 = no limit
+
+# Summary engine: 'llm', 'rules' (line rules from Memoir_ML/MarkdownMaker.ipynb,
+# no LLM) or 'auto', which sends notes of at most SUMMARY_RULES_MAX_WORDS words
+# whose lines are mostly headings, lists and tasks to the rules engine.
+SUMMARY_ENGINE = os.getenv("SUMMARY_ENGINE", "auto")
+SUMMARY_RULES_MAX_WORDS = int(os.getenv("SUMMARY_RULES_MAX_WORDS", "300"))
+SUMMARY_RULES_MIN_STRUCTURE = float(os.getenv("SUMMARY_RULES_MIN_STRUCTURE", "0.8"))  # Share of structured lines
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")  # Tags lines for the rules engine; regex rules only if missing
+
+# Summary generation. Notes longer than SUMMARY_CHUNK_TOKENS are split on page and
+# paragraph boundaries and each chunk is converted separately, LLM_WORKERS chunks
+# at a time (each worker is its own Llama context over the same mmap'd weights).
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "1"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1536"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "2048"))  # Generated tokens per chunk
+SUMMARY_MERGE_PASS = os.getenv("SUMMARY_MERGE_PASS", "False").lower() == "true"  # Stitch chunk outputs with one more LLM pass
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "True").lower() == "true"  # Evaluate the constant prompt prefix once per LLM context (not with LLM_BATCH_SIZE > 1)
+# Batched decoding: with LLM_BATCH_SIZE > 1, up to that many generations (chunks of a
+# note, or notes run together by `run_worker --concurrency`) are decoded in one
+# llama.cpp batch sharing LLM_BATCH_CTX cells of KV cache. Replaces LLM_WORKERS.
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "1"))
+LLM_BATCH_CTX = int(os.getenv("LLM_BATCH_CTX", "16384"))
+# Optional LLM pool (`manage.py run_llm_pool`): LLM_POOL_PROCESSES inference processes
+# map the same model file and serve every web and job worker. When LLM_POOL_ADDRESS
+# is set, generations run in the pool instead of in-process.
+LLM_POOL_ADDRESS = os.getenv("LLM_POOL_ADDRESS", "")  # host:port or Unix socket path, e.g. 127.0.0.1:8765
+LLM_POOL_AUTHKEY = os.getenv("LLM_POOL_AUTHKEY", SECRET_KEY)  # Shared secret between the pool and its clients
+LLM_POOL_PROCESSES = int(os.getenv("LLM_POOL_PROCESSES", "2"))
+LLM_POOL_THREADS = int(os.getenv("LLM_POOL_THREADS", "0"))  # CPU threads per pool process, 0 = N_THREADS split evenly
+# Strip page markers, repeated page headers/footers, page numbers and symbol-only
+# lines and join hyphenated words before summarizing, to save prompt tokens
+SUMMARY_COMPACT_INPUT = os.getenv("SUMMARY_COMPACT_INPUT", "True").lower() == "true"
+# Summaries and chunk outputs are cached by input text, prompt version and model,
+# shared by all users; each cache is evicted least recently used first.
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+SUMMARY_CACHE_MAX_AGE_DAYS = int(os.getenv("SUMMARY_CACHE_MAX_AGE_DAYS", "90"))
@@ -191,24 +191,36 @@ class ApiService {
     const ocrUrl = `${this.baseURL}/api/get-ocr/${noteId}/`;
     console.log('🔍 Getting OCR from:', ocrUrl);
 
-    const response = await fetch(ocrUrl, {
-      method: 'GET',
-      headers: this.getAuthHeaders(),
-    });
-
-    return this.handleResponse(response);
+    return this.getWhenReady(ocrUrl);
   }
 
   async getSummary(noteId) {
     const summaryUrl = `${this.baseURL}/api/get-summary/${noteId}/`;
     console.log('📝 Getting summary from:', summaryUrl);
 
-    const response = await fetch(summaryUrl, {
-      method: 'GET',
-      headers: this.getAuthHeaders(),
-    });
+    return this.getWhenReady(summaryUrl);
+  }
 
-    return this.handleResponse(response);
+  // GET a result that a background job produces: the server answers 202
+  // with the job until the result exists, so poll until it does
+  async getWhenReady(url, intervalMs = 2000) {
+    for (;;) {
+      const response = await fetch(url, {
+        method: 'GET',
+        headers: this.getAuthHeaders(),
+      });
+
+      if (response.status !== 202) {
+        return this.handleResponse(response);
+      }
+
+      const job = await response.json();
+      console.log(`⏳ Job ${job.id} (${job.kind}) is ${job.status}`);
+      if (job.status === 'failed') {
+        throw new Error(job.error || `${job.kind} job failed`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
   }
 
   async regenerateOCR(noteId) {
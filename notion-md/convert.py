@@ -1,6 +1,30 @@
-import subprocess
+"""
+Convert Markdown to Notion blocks and rich text with @tryfabric/martian.
+
+`convert_markdown_to_notion` starts one node process per document. For many
+documents, `BatchConverter` keeps one `node markdown_to_notion.js --batch`
+process alive, sends it JSON-lines requests and matches the responses to
+their callers, so node starts and loads martian only once. It is safe to
+call from several threads, and restarts node if the process dies.
+
+    python convert.py                          # example.md -> notion_blocks.json, notion_richtext.json
+    python convert.py notes/ --out converted/  # every .md file under notes/ -> converted/*.json
+"""
+
+import argparse
+import itertools
 import json
+import subprocess
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+SCRIPT = HERE / "markdown_to_notion.js"
+
 
 def convert_markdown_to_notion(input_md_path):
     result = subprocess.run(
@@ -12,13 +36,259 @@ def convert_markdown_to_notion(input_md_path):
     data = json.loads(result.stdout)
     return data["blocks"], data["richText"]
 
-if __name__ == "__main__":
-    blocks, richtext = convert_markdown_to_notion("example.md")
 
-    with open("notion_blocks.json", "w", encoding="utf-8") as f:
-        json.dump(blocks, f, indent=2, ensure_ascii=False)
+class ConversionError(Exception):
+    """A document could not be converted, or the converter process died."""
+
+
+class BatchConverter:
+    """
+    One long-lived node converter shared by any number of threads.
+
+    Args:
+        node (str): node executable
+        timeout (float): Seconds to wait for each document
+        retries (int): Times a document that crashed node is sent again
+    """
+
+    def __init__(self, node="node", timeout=60, retries=2):
+        self.node = node
+        self.timeout = timeout
+        self.retries = retries
+        self.restarts = 0
+        self._ids = itertools.count(1)
+        self._process = None
+        self._started = False
+        # Serializes process starts and writes to stdin
+        self._write_lock = threading.RLock()
+        # id -> [future, request, attempts, process]; held briefly, never while writing
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        """Start the node process; the caller holds the write lock."""
+        try:
+            process = subprocess.Popen(
+                [self.node, str(SCRIPT), "--batch"],
+                cwd=HERE,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+            )
+        except OSError as e:
+            raise ConversionError(f"cannot start node converter: {e}")
+        if self._started:
+            self.restarts += 1
+        self._started = True
+        threading.Thread(target=self._read, args=(process,), daemon=True).start()
+        self._process = process
+        return process
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        """Set a future's outcome unless its caller gave up on it."""
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _read(self, process):
+        """Reader thread of one process: resolve futures, then handle its exit."""
+        for line in process.stdout:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            with self._pending_lock:
+                entry = self._pending.pop(response.get("id"), None)
+            if entry is None:
+                continue
+            if "error" in response:
+                self._resolve(entry[0], error=ConversionError(response["error"]))
+            else:
+                self._resolve(entry[0], (response["blocks"], response["richText"]))
+
+        code = process.wait()
+        with self._write_lock:
+            if self._process is process:
+                self._process = None
+            with self._pending_lock:
+                lost = sorted(key for key, entry in self._pending.items() if entry[3] is process)
+                entries = [self._pending.pop(key) for key in lost]
+
+        # node converts in request order, so the oldest unanswered document is
+        # the one that crashed it; only that one uses up a retry
+        for index, (future, request, attempts, _) in enumerate(entries):
+            if future.done():
+                continue
+            if index == 0:
+                attempts += 1
+            if self._closed or attempts > self.retries:
+                self._resolve(future, error=ConversionError(f"node converter exited with code {code}"))
+                continue
+            try:
+                self._send(future, request, attempts)
+            except ConversionError as e:
+                self._resolve(future, error=e)
+
+    def _send(self, future, request, attempts=0):
+        with self._write_lock:
+            # A dead process that is still registered is handled by its reader
+            process = self._process or self._start()
+            with self._pending_lock:
+                self._pending[request["id"]] = [future, request, attempts, process]
+            try:
+                process.stdin.write(json.dumps(request) + "\n")
+                process.stdin.flush()
+            except OSError:
+                # The process died; its reader thread sends the request again
+                pass
+
+    def submit(self, markdown=None, path=None):
+        """
+        Queue a document without waiting for it.
+
+        Args:
+            markdown (str, optional): Markdown text
+            path (str, optional): Markdown file, read by node
 
-    with open("notion_richtext.json", "w", encoding="utf-8") as f:
-        json.dump(richtext, f, indent=2, ensure_ascii=False)
+        Returns:
+            Future: Resolves to (blocks, rich_text)
+        """
+        if self._closed:
+            raise ConversionError("converter is closed")
+        request = {"id": next(self._ids)}
+        if markdown is not None:
+            request["markdown"] = markdown
+        else:
+            request["path"] = str(Path(path).resolve())
+        future = Future()
+        future.request_id = request["id"]
+        self._send(future, request)
+        return future
 
-    print("✅ Saved blocks and rich text JSON")
+    def result(self, future):
+        """
+        Wait for a submitted document.
+
+        Returns:
+            tuple: (blocks, rich_text)
+
+        Raises:
+            ConversionError: If the document failed, or node did not answer in time
+        """
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            with self._pending_lock:
+                entry = self._pending.get(future.request_id)
+            if entry is not None:
+                # A stuck process: kill it so the other documents are retried
+                entry[3].kill()
+            raise ConversionError(f"no response from node converter within {self.timeout}s")
+
+    def convert(self, markdown):
+        """Convert Markdown text; returns (blocks, rich_text)."""
+        return self.result(self.submit(markdown=markdown))
+
+    def convert_file(self, path):
+        """Convert a Markdown file; returns (blocks, rich_text)."""
+        return self.result(self.submit(path=path))
+
+    def close(self):
+        """Let node finish the queued documents, then stop it."""
+        self._closed = True
+        with self._write_lock:
+            process = self._process
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+
+
+def convert_directory(source, out, window=64):
+    """
+    Convert every .md file under a directory to <out>/<relative path>.json.
+
+    Up to `window` documents are in flight at once in one node process.
+
+    Returns:
+        tuple: (converted count, {path: error} of the failed files)
+    """
+    source, out = Path(source), Path(out)
+    paths = sorted(source.rglob("*.md"))
+    failed = {}
+    converted = 0
+    in_flight = deque()
+
+    def finish(path, future):
+        nonlocal converted
+        try:
+            blocks, rich_text = converter.result(future)
+        except ConversionError as e:
+            failed[str(path)] = str(e)
+            return
+        target = (out / path.relative_to(source)).with_suffix(".json")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump({"blocks": blocks, "richText": rich_text}, f, indent=2, ensure_ascii=False)
+        converted += 1
+
+    with BatchConverter() as converter:
+        for path in paths:
+            if len(in_flight) >= window:
+                finish(*in_flight.popleft())
+            in_flight.append((path, converter.submit(path=path)))
+        while in_flight:
+            finish(*in_flight.popleft())
+
+    return converted, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert Markdown files to Notion blocks and rich text.")
+    parser.add_argument("source", nargs="?", help="Directory of .md files; without it, converts example.md")
+    parser.add_argument("--out", help="Output directory (default: <source>-notion)")
+    parser.add_argument("--window", type=int, default=64, help="Documents in flight at once (default: 64)")
+    args = parser.parse_args()
+
+    if args.source is None:
+        blocks, richtext = convert_markdown_to_notion("example.md")
+
+        with open("notion_blocks.json", "w", encoding="utf-8") as f:
+            json.dump(blocks, f, indent=2, ensure_ascii=False)
+
+        with open("notion_richtext.json", "w", encoding="utf-8") as f:
+            json.dump(richtext, f, indent=2, ensure_ascii=False)
+
+        print("✅ Saved blocks and rich text JSON")
+        return
+
+    out = args.out or f"{Path(args.source).resolve()}-notion"
+    start = time.perf_counter()
+    converted, failed = convert_directory(args.source, out, window=max(1, args.window))
+    seconds = time.perf_counter() - start
+    for path, error in failed.items():
+        print(f"❌ {path}: {error}", file=sys.stderr)
+    print(f"✅ Converted {converted} file(s) to {out} in {seconds:.1f}s ({len(failed)} failed)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,15 +9,48 @@
 // console.log(JSON.stringify(blocks, null, 2));
 
 //both richtext and blocks
+//
+// node markdown_to_notion.js example.md   -> one document, pretty-printed JSON
+// node markdown_to_notion.js --batch      -> long-lived converter (see below)
 import { markdownToBlocks, markdownToRichText } from "@tryfabric/martian";
 import fs from "fs";
+import readline from "readline";
 
-const inputPath = process.argv[2];
-const md = fs.readFileSync(inputPath, "utf8");
+function convert(md) {
+  return {
+    blocks: markdownToBlocks(md),
+    richText: markdownToRichText(md),
+  };
+}
 
-const blocks = markdownToBlocks(md);
-const richText = markdownToRichText(md);
+if (process.argv[2] === "--batch") {
+  // One JSON request per stdin line:   {"id": 1, "markdown": "..."} or {"id": 1, "path": "notes/a.md"}
+  // One JSON response per stdout line: {"id": 1, "blocks": [...], "richText": [...]} or {"id": 1, "error": "..."}
+  // Responses keep the request order. The process runs until stdin is closed.
+  const lines = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
 
-// Output both as JSON (or separated by newline, etc)
-console.log(JSON.stringify({ blocks, richText }, null, 2));
+  lines.on("line", (line) => {
+    if (!line.trim()) return;
 
+    let id = null;
+    let response;
+    try {
+      const request = JSON.parse(line);
+      id = request.id ?? null;
+      const md = typeof request.markdown === "string"
+        ? request.markdown
+        : fs.readFileSync(request.path, "utf8");
+      response = { id, ...convert(md) };
+    } catch (error) {
+      // A bad document only fails its own request
+      response = { id, error: error?.message || String(error) };
+    }
+    process.stdout.write(JSON.stringify(response) + "\n");
+  });
+} else {
+  const inputPath = process.argv[2];
+  const md = fs.readFileSync(inputPath, "utf8");
+
+  // Output both as JSON (or separated by newline, etc)
+  console.log(JSON.stringify(convert(md), null, 2));
+}